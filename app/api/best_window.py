@@ -0,0 +1,169 @@
+"""Best production windows for load shifting, computed from the forecast's `watts`."""
+
+import hashlib
+import json
+from datetime import time as dtime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Query, Response
+
+from app.api.common import error_response, stale_payload, unavailable_response
+from app.core.config import settings
+from app.models.schemas import ForecastResponse, Message
+from app.models.site import parse_planes
+from app.models.spec import ForecastSpec
+from app.services.admission import Overloaded, admitted
+from app.services.cache import get_cached, get_cached_entry, get_etag, make_key, make_stale_key, set_cached
+from app.services.forecast_engine import spec_fingerprint, to_payload
+from app.services.history_store import issue_forecast
+from app.services.pubsub import stream_topic
+from app.services.warmup import track_spec
+from app.services.windows import best_windows, parse_duration
+from app.util.timeindex import parse_resolution
+
+
+router = APIRouter()
+
+MAX_DURATIONS = 8
+TIME_OF_DAY_PATTERN = r"^([01]\d|2[0-3]):[0-5]\d$"
+
+
+@router.get("/{lat}/{lon}/{declination}/{azimuth}/{kwp}", response_model=ForecastResponse)
+def best_window(
+    lat: float,
+    lon: float,
+    declination: float,
+    azimuth: float,
+    kwp: float,
+    response: Response,
+    duration: List[str] = Query(default=["2h"], description="Window length(s), e.g. 2h, 90m; repeatable"),
+    top: int = Query(default=1, ge=1, le=24, description="Non-overlapping windows per duration (per day with per_day)"),
+    per_day: bool = Query(default=False, description="Pick the top windows for each local day"),
+    earliest: Optional[str] = Query(default=None, description="Earliest window start (HH:MM)", pattern=TIME_OF_DAY_PATTERN),
+    latest: Optional[str] = Query(default=None, description="Latest window end (HH:MM)", pattern=TIME_OF_DAY_PATTERN),
+    time: Optional[str] = Query(default="60m", description="Cadence, e.g. 15m, 30m, 60m", pattern=r"^(5|10|15|30|60)m$"),
+    source: Optional[str] = Query(
+        default="clearsky",
+        description="Data source: 'clearsky' or 'open-meteo'",
+        pattern=r"^(clearsky|open-meteo)$",
+    ),
+):
+    return _best_window(
+        response, lat, lon, declination, azimuth, kwp,
+        planes="", duration=duration, top=top, per_day=per_day, earliest=earliest, latest=latest,
+        time=time, source=source,
+    )
+
+
+@router.get("/{lat}/{lon}/{declination}/{azimuth}/{kwp}/{planes:path}", response_model=ForecastResponse)
+def best_window_planes(
+    lat: float,
+    lon: float,
+    declination: float,
+    azimuth: float,
+    kwp: float,
+    planes: str,
+    response: Response,
+    duration: List[str] = Query(default=["2h"], description="Window length(s), e.g. 2h, 90m; repeatable"),
+    top: int = Query(default=1, ge=1, le=24, description="Non-overlapping windows per duration (per day with per_day)"),
+    per_day: bool = Query(default=False, description="Pick the top windows for each local day"),
+    earliest: Optional[str] = Query(default=None, description="Earliest window start (HH:MM)", pattern=TIME_OF_DAY_PATTERN),
+    latest: Optional[str] = Query(default=None, description="Latest window end (HH:MM)", pattern=TIME_OF_DAY_PATTERN),
+    time: Optional[str] = Query(default="60m", description="Cadence, e.g. 15m, 30m, 60m", pattern=r"^(5|10|15|30|60)m$"),
+    source: Optional[str] = Query(
+        default="clearsky",
+        description="Data source: 'clearsky' or 'open-meteo'",
+        pattern=r"^(clearsky|open-meteo)$",
+    ),
+):
+    """Multi-plane variant: further `{declination}/{azimuth}/{kwp}` triples follow the first plane."""
+    return _best_window(
+        response, lat, lon, declination, azimuth, kwp,
+        planes=planes, duration=duration, top=top, per_day=per_day, earliest=earliest, latest=latest,
+        time=time, source=source,
+    )
+
+
+def _window_key(key: str, etag: str, params: list) -> str:
+    # Keyed on the forecast's ETag, so a refreshed forecast is never answered with older windows
+    digest = hashlib.sha256(json.dumps([etag, params]).encode()).hexdigest()[:16]
+    return f"{key}:bw:{digest}"
+
+
+def _best_window(
+    response, lat, lon, declination, azimuth, kwp, *, planes, duration, top, per_day, earliest, latest, time, source
+):
+    try:
+        if len(duration) > MAX_DURATIONS:
+            raise ValueError(f"at most {MAX_DURATIONS} durations per request")
+        durations = [parse_duration(d) for d in duration]
+        spec = ForecastSpec(
+            endpoint="estimate",
+            lat=lat,
+            lon=lon,
+            tilt=declination,
+            azimuth=azimuth,
+            kwp=kwp,
+            resolution=time or settings.default_resolution,
+            source=source or "clearsky",
+            planes=parse_planes(planes),
+        )
+        key = make_key(**spec.model_dump())
+        params = [[d.value for d in durations], top, per_day, earliest, latest]
+        response.headers["Cache-Control"] = f"public, max-age={settings.cache_ttl_seconds}"
+
+        etag = get_etag(key)
+        cached = get_cached(_window_key(key, etag, params), base_key=key) if etag else None
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            track_spec(key, spec)
+            return ForecastResponse(result=cached, message=Message())
+
+        # Windows only need the forecast's watts: reuse the cached /estimate body when present
+        payload, etag = get_cached_entry(key)
+        stale = False
+        if payload is None:
+            try:
+                with admitted():
+                    fingerprint = spec_fingerprint(spec)
+                    arrays = issue_forecast(spec)
+            except Overloaded as e:
+                payload = stale_payload(spec, e)
+                if payload is None:
+                    return unavailable_response(e)
+                stale = True
+        if payload is None:
+            etag = set_cached(
+                key,
+                to_payload(arrays),
+                topic=stream_topic(spec),
+                fingerprint=fingerprint,
+                stale_key=make_stale_key(**spec.model_dump()),
+            )
+            index, watts = arrays.index.tz_localize(None), arrays.watts
+        else:
+            index = pd.DatetimeIndex(list(payload["watts"]))
+            watts = np.fromiter(payload["watts"].values(), dtype=float, count=len(index))
+        track_spec(key, spec)
+
+        result = best_windows(
+            index,
+            watts,
+            pd.Timedelta(parse_resolution(spec.resolution)),
+            durations,
+            top=top,
+            per_day=per_day,
+            earliest=dtime.fromisoformat(earliest) if earliest else None,
+            latest=dtime.fromisoformat(latest) if latest else None,
+        )
+        if stale:
+            response.headers["Cache-Control"] = "no-cache"
+            response.headers["X-Cache"] = "STALE"
+            return ForecastResponse(result=result, message=Message())
+        set_cached(_window_key(key, etag, params), result, base_key=key)
+        response.headers["X-Cache"] = "MISS"
+        return ForecastResponse(result=result, message=Message())
+    except ValueError as e:
+        return error_response(400, str(e))
@@ -0,0 +1,49 @@
+"""Telemetry ingest for per-site calibration profiles."""
+
+from typing import List
+
+import numpy as np
+from fastapi import APIRouter, Depends
+
+from app.api.common import error_response
+from app.core.security import require_calibration_token
+from app.models.schemas import CalibrationBatch, ForecastResponse, Message
+from app.services import calibration
+from app.services.cache import make_site_id
+
+
+router = APIRouter()
+
+
+@router.post("", response_model=ForecastResponse, dependencies=[Depends(require_calibration_token)])
+def calibrate(batches: List[CalibrationBatch]):
+    """Fold telemetry batches into the sites' profiles; `/estimate` applies them.
+
+    ``predicted`` must be the uncalibrated forecast, see ``CalibrationBatch``.
+    """
+    if not calibration.enabled():
+        return error_response(503, "calibration disabled (set CALIBRATION_DB_PATH)")
+    if any(len(b.predicted) != len(b.measured) for b in batches):
+        return error_response(400, "predicted and measured must have the same length")
+
+    ids = [
+        make_site_id(lat=b.lat, lon=b.lon, tilt=b.declination, azimuth=b.azimuth, kwp=b.kwp, planes=b.planes)
+        for b in batches
+    ]
+    sizes = [len(b.predicted) for b in batches]
+    pnom = [1000.0 * (b.kwp + sum(k for _, _, k in b.planes)) for b in batches]
+    profiles = calibration.ingest(
+        np.repeat(np.array(ids, dtype=object), sizes),
+        np.fromiter((v for b in batches for v in b.predicted), dtype=float),
+        np.fromiter((v for b in batches for v in b.measured), dtype=float),
+        np.repeat(pnom, sizes),
+    )
+    return ForecastResponse(
+        result={
+            "profiles": [
+                {"site": site, "gain": p.gain, "curvature": p.curvature, "samples": p.samples}
+                for site, p in profiles.items()
+            ]
+        },
+        message=Message(),
+    )
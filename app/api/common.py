@@ -0,0 +1,176 @@
+"""Request handling shared by the `/estimate` and `/clearsky` routers."""
+
+from __future__ import annotations
+
+import json
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import admission_shed_total, cache_hits_total
+from app.models.schemas import ForecastResponse, Message
+from app.models.spec import ForecastSpec
+from app.services.cache import (
+    make_key,
+    make_etag,
+    get_cached,
+    get_cached_entry,
+    get_cached_raw,
+    get_etag,
+    make_stale_key,
+    set_cached,
+    set_cached_raw,
+)
+from app.services.admission import Overloaded, admitted
+from app.services.forecast_engine import slice_payload, spec_dates, spec_fingerprint, to_payload
+from app.services.formats import MEDIA_TYPES, render
+from app.services.history_store import issue_forecast
+from app.services.pubsub import stream_topic
+from app.services.warmup import track_spec
+
+
+FORMAT_PATTERN = r"^(json|columnar|csv|msgpack)$"
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+
+def error_response(code: int, text: str) -> ForecastResponse:
+    return ForecastResponse(
+        result={"watts": {}, "watt_hours": {}, "watt_hours_day": {}},
+        message=Message(type="error", code=code, text=text),
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix on either side is ignored
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def stale_payload(spec: ForecastSpec, exc: Overloaded) -> Optional[dict]:
+    """Last good JSON result of a spec whose computation was shed, if one is kept."""
+    payload = get_cached(make_stale_key(**spec.model_dump()))
+    if payload is not None:
+        admission_shed_total.labels(reason=exc.reason, response="stale").inc()
+    return payload
+
+
+def unavailable_response(exc: Overloaded) -> JSONResponse:
+    admission_shed_total.labels(reason=exc.reason, response="unavailable").inc()
+    return JSONResponse(
+        status_code=503,
+        content=error_response(503, "forecast computation is overloaded, retry later").model_dump(),
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def shed_response(spec: ForecastSpec, exc: Overloaded) -> Response:
+    """Serve the spec's stale copy, else a 503 with Retry-After."""
+    stale_key = make_stale_key(**spec.model_dump())
+    if spec.fmt == "json":
+        payload, etag = get_cached_entry(stale_key)
+        body = payload and json.dumps({"result": payload, "message": Message().model_dump()}).encode()
+    else:
+        body, etag = get_cached_raw(stale_key)
+    if not body:
+        return unavailable_response(exc)
+    admission_shed_total.labels(reason=exc.reason, response="stale").inc()
+    headers = {"Cache-Control": "no-cache", "X-Cache": "STALE", "ETag": etag}
+    return Response(content=body, media_type=MEDIA_TYPES[spec.fmt], headers=headers)
+
+
+_RANGE_FIELDS = {"days": None, "start_date": None, "end_date": None}
+
+
+def serve_forecast(spec: ForecastSpec, request: Request, response: Response):
+    dates = spec_dates(spec)
+    if dates is None:
+        # A range covering the whole horizon shares the full forecast's cache entry
+        spec = spec.model_copy(update=_RANGE_FIELDS)
+    key = make_key(**spec.model_dump())
+    cache_control = f"public, max-age={settings.cache_ttl_seconds}"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Answer revalidations from the stored ETag before the body is loaded
+        etag = get_etag(key)
+        if etag_matches(if_none_match, etag):
+            cache_hits_total.labels(endpoint=spec.endpoint).inc()
+            track_spec(key, spec)
+            return not_modified(etag, cache_control)
+
+    if spec.fmt != "json":
+        return _serve_rendered(spec, key, if_none_match, cache_control)
+
+    response.headers["Cache-Control"] = cache_control
+    cached, etag = get_cached_entry(key)
+    if cached:
+        response.headers["X-Cache"] = "HIT"
+        response.headers["ETag"] = etag
+        cache_hits_total.labels(endpoint=spec.endpoint).inc()
+        track_spec(key, spec)
+        return ForecastResponse(result=cached, message=Message())
+
+    if dates is not None:
+        # Partial horizon: cut a cached full-horizon forecast instead of computing
+        full, _ = get_cached_entry(make_key(**spec.model_copy(update=_RANGE_FIELDS).model_dump()))
+        if full:
+            result = slice_payload(full, dates)
+            etag = make_etag(key, json.dumps(result))
+            cache_hits_total.labels(endpoint=spec.endpoint).inc()
+            track_spec(key, spec)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, cache_control)
+            response.headers["X-Cache"] = "HIT"
+            response.headers["ETag"] = etag
+            return ForecastResponse(result=result, message=Message())
+
+    try:
+        with admitted():
+            # Stored with the value so the refresher's first pass can skip an unchanged forecast
+            fingerprint = spec_fingerprint(spec)
+            arrays = issue_forecast(spec)
+    except Overloaded as e:
+        return shed_response(spec, e)
+    result = to_payload(arrays)
+    etag = set_cached(
+        key, result, topic=stream_topic(spec), fingerprint=fingerprint, stale_key=make_stale_key(**spec.model_dump())
+    )
+    track_spec(key, spec)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+    response.headers["X-Cache"] = "MISS"
+    response.headers["ETag"] = etag
+    return ForecastResponse(result=result, message=Message())
+
+
+def _serve_rendered(spec: ForecastSpec, key: str, if_none_match: Optional[str], cache_control: str) -> Response:
+    # Compact formats are cached as ready-to-send bytes under their own key
+    body, etag = get_cached_raw(key)
+    headers = {"Cache-Control": cache_control}
+    if body:
+        headers["X-Cache"] = "HIT"
+        cache_hits_total.labels(endpoint=spec.endpoint).inc()
+    else:
+        try:
+            with admitted():
+                fingerprint = spec_fingerprint(spec)
+                arrays = issue_forecast(spec)
+        except Overloaded as e:
+            return shed_response(spec, e)
+        body = render(arrays, spec.fmt)
+        etag = set_cached_raw(key, body, fingerprint=fingerprint, stale_key=make_stale_key(**spec.model_dump()))
+        headers["X-Cache"] = "MISS"
+    track_spec(key, spec)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+    headers["ETag"] = etag
+    return Response(content=body, media_type=MEDIA_TYPES[spec.fmt], headers=headers)
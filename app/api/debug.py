@@ -0,0 +1,64 @@
+"""Admin-only profiling endpoints; mounted only when `DEBUG_TOKEN` is set."""
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+
+from app.core.config import settings
+from app.core.security import require_token
+from app.services import profiling
+
+
+router = APIRouter(dependencies=[Depends(require_token)])
+
+
+@router.get("/profile")
+async def profile(
+    seconds: float = Query(default=10, gt=0, description="Capture duration"),
+    interval_ms: float = Query(default=5, ge=1, le=100, description="Sampling interval"),
+    fmt: str = Query(default="collapsed", alias="format", pattern=r"^(collapsed|pstats|prof)$"),
+    sort: str = Query(default="cumulative", pattern=r"^(cumulative|tottime|ncalls)$"),
+    limit: int = Query(default=50, ge=1, le=1000),
+    idle: bool = Query(default=False, description="Keep threads that wait for work"),
+):
+    """Sample all threads of this worker for `seconds`: collapsed stacks, a pstats report or a .prof dump."""
+    if seconds > settings.debug_profile_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {settings.debug_profile_max_seconds}")
+    try:
+        samples, interval = await asyncio.to_thread(profiling.sample, seconds, interval_ms / 1000.0, idle)
+    except profiling.CaptureBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if fmt == "prof":
+        return Response(
+            content=profiling.stats_dump(samples, interval),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="profile.prof"'},
+        )
+    if fmt == "pstats":
+        return PlainTextResponse(profiling.stats_report(samples, interval, sort, limit))
+    return PlainTextResponse(profiling.collapsed(samples))
+
+
+@router.post("/tracemalloc/start")
+def tracemalloc_start(frames: int = Query(default=10, ge=1, le=100)):
+    started = profiling.tracemalloc_start(frames)
+    return {"tracing": True, "started": started}
+
+
+@router.post("/tracemalloc/stop")
+def tracemalloc_stop():
+    profiling.tracemalloc_stop()
+    return {"tracing": False}
+
+
+@router.get("/tracemalloc/snapshot", response_class=PlainTextResponse)
+def tracemalloc_snapshot(
+    group_by: str = Query(default="lineno", pattern=r"^(lineno|filename|traceback)$"),
+    limit: int = Query(default=30, ge=1, le=500),
+    diff: bool = Query(default=False, description="Growth since the previous snapshot"),
+):
+    try:
+        return profiling.tracemalloc_report(group_by, limit, diff)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -1,13 +1,12 @@
-from fastapi import APIRouter, Query, Response
+from fastapi import APIRouter, Query, Request, Response
 from typing import Optional
 
-from app.models.schemas import ForecastResponse, Message
-from app.services.forecast_engine import compute_forecast
-from app.services.cache import make_key, get_cached, set_cached
+from app.api.common import DATE_PATTERN, FORMAT_PATTERN, error_response, serve_forecast
+from app.models.schemas import ForecastResponse
 from app.core.config import settings
-from app.core.metrics import cache_hits_total
+from app.models.site import parse_planes
 from app.models.spec import ForecastSpec
-from app.services.warmup import track_spec
+from app.services.formats import negotiate_format
 
 
 router = APIRouter()
@@ -23,6 +22,8 @@ def estimate(
     declination: float,
     azimuth: float,
     kwp: float,
+    request: Request,
+    response: Response,
     time: Optional[str] = Query(
         default="60m",
         description="Cadence, e.g. 15m, 30m, 60m",
@@ -33,10 +34,106 @@ def estimate(
         description="Data source: 'clearsky' or 'open-meteo'",
         pattern=r"^(clearsky|open-meteo)$",
     ),
+    quantiles: bool = Query(
+        default=False,
+        description="Add p10/p50/p90 bands from ensemble weather (source=open-meteo only)",
+    ),
+    days: Optional[int] = Query(
+        default=None,
+        ge=1,
+        description="Only the first N local days of the horizon (1 = today)",
+    ),
+    start: Optional[str] = Query(
+        default=None,
+        description="First local date (YYYY-MM-DD) of a partial horizon",
+        pattern=DATE_PATTERN,
+    ),
+    end: Optional[str] = Query(
+        default=None,
+        description="Last local date (YYYY-MM-DD) of a partial horizon",
+        pattern=DATE_PATTERN,
+    ),
+    fmt: Optional[str] = Query(
+        default=None,
+        alias="format",
+        description="Response format: json (default), columnar, csv or msgpack",
+        pattern=FORMAT_PATTERN,
+    ),
+):
+    return _estimate(
+        request, response, lat, lon, declination, azimuth, kwp,
+        planes="", time=time, source=source, per_plane=False, quantiles=quantiles,
+        days=days, start=start, end=end, fmt=fmt,
+    )
+
+
+@router.get(
+    "/{lat}/{lon}/{declination}/{azimuth}/{kwp}/{planes:path}",
+    response_model=ForecastResponse,
+)
+def estimate_planes(
+    lat: float,
+    lon: float,
+    declination: float,
+    azimuth: float,
+    kwp: float,
+    planes: str,
+    request: Request,
     response: Response,
+    time: Optional[str] = Query(
+        default="60m",
+        description="Cadence, e.g. 15m, 30m, 60m",
+        pattern=r"^(5|10|15|30|60)m$",
+    ),
+    source: Optional[str] = Query(
+        default="clearsky",
+        description="Data source: 'clearsky' or 'open-meteo'",
+        pattern=r"^(clearsky|open-meteo)$",
+    ),
+    per_plane: bool = Query(
+        default=False,
+        description="Include a per-plane breakdown in the result (debugging)",
+    ),
+    quantiles: bool = Query(
+        default=False,
+        description="Add p10/p50/p90 bands from ensemble weather (source=open-meteo only)",
+    ),
+    days: Optional[int] = Query(
+        default=None,
+        ge=1,
+        description="Only the first N local days of the horizon (1 = today)",
+    ),
+    start: Optional[str] = Query(
+        default=None,
+        description="First local date (YYYY-MM-DD) of a partial horizon",
+        pattern=DATE_PATTERN,
+    ),
+    end: Optional[str] = Query(
+        default=None,
+        description="Last local date (YYYY-MM-DD) of a partial horizon",
+        pattern=DATE_PATTERN,
+    ),
+    fmt: Optional[str] = Query(
+        default=None,
+        alias="format",
+        description="Response format: json (default), columnar, csv or msgpack",
+        pattern=FORMAT_PATTERN,
+    ),
+):
+    """Multi-plane forecast: further `{declination}/{azimuth}/{kwp}` triples follow the first plane."""
+    return _estimate(
+        request, response, lat, lon, declination, azimuth, kwp,
+        planes=planes, time=time, source=source, per_plane=per_plane, quantiles=quantiles,
+        days=days, start=start, end=end, fmt=fmt,
+    )
+
+
+def _estimate(
+    request, response, lat, lon, declination, azimuth, kwp,
+    *, planes, time, source, per_plane, quantiles, days, start, end, fmt,
 ):
     try:
-        key = make_key(
+        spec = ForecastSpec(
             endpoint="estimate",
             lat=lat,
             lon=lon,
@@ -45,55 +142,14 @@ def estimate(
             kwp=kwp,
             resolution=time or settings.default_resolution,
             source=source or "clearsky",
+            planes=parse_planes(planes),
+            per_plane=per_plane,
+            quantiles=quantiles and source == "open-meteo",
+            days=days,
+            start_date=start,
+            end_date=end,
+            fmt=negotiate_format(fmt, request.headers.get("accept")),
         )
-        cached = get_cached(key)
-        if cached:
-            response.headers["X-Cache"] = "HIT"
-            response.headers["Cache-Control"] = f"public, max-age={settings.cache_ttl_seconds}"
-            cache_hits_total.labels(endpoint="estimate").inc()
-            track_spec(
-                key,
-                ForecastSpec(
-                    endpoint="estimate",
-                    lat=lat,
-                    lon=lon,
-                    tilt=declination,
-                    azimuth=azimuth,
-                    kwp=kwp,
-                    resolution=time or settings.default_resolution,
-                    source=source or "clearsky",
-                ),
-            )
-            return ForecastResponse(result=cached, message=Message())
-
-        result = compute_forecast(
-            lat=lat,
-            lon=lon,
-            tilt=declination,
-            azimuth_convention=azimuth,
-            kwp=kwp,
-            resolution=time,
-            source=source or "clearsky",
-        )
-        set_cached(key, result)
-        response.headers["X-Cache"] = "MISS"
-        response.headers["Cache-Control"] = f"public, max-age={settings.cache_ttl_seconds}"
-        track_spec(
-            key,
-            ForecastSpec(
-                endpoint="estimate",
-                lat=lat,
-                lon=lon,
-                tilt=declination,
-                azimuth=azimuth,
-                kwp=kwp,
-                resolution=time or settings.default_resolution,
-                source=source or "clearsky",
-            ),
-        )
-        return ForecastResponse(result=result, message=Message())
+        return serve_forecast(spec, request, response)
     except ValueError as e:
-        return ForecastResponse(
-            result={"watts": {}, "watt_hours": {}, "watt_hours_day": {}},
-            message=Message(type="error", code=400, text=str(e)),
-        )
+        return error_response(400, str(e))
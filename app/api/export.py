@@ -0,0 +1,148 @@
+"""Streaming NDJSON bulk export of forecasts for many sites."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import AsyncIterator, Iterable, List, Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.common import stale_payload
+from app.core.config import settings
+from app.core.metrics import admission_shed_total
+from app.core.security import charge_rate_limit, require_token
+from app.models.schemas import ExportSite
+from app.models.spec import ForecastSpec
+from app.services.admission import Overloaded, admitted
+from app.services.cache import get_cached_raw, make_key, make_stale_key, set_cached, set_cached_raw
+from app.services.forecast_engine import spec_fingerprint, to_payload
+from app.services.formats import render
+from app.services.history_store import issue_forecast
+from app.services.pubsub import stream_topic
+from app.services.warmup import list_specs
+
+
+router = APIRouter()
+
+NDJSON = "application/x-ndjson"
+
+
+def _export_line(spec: ForecastSpec, site_id: Optional[str]) -> bytes:
+    site = {"id": site_id, **spec.model_dump(include={"lat", "lon", "tilt", "azimuth", "kwp", "planes"})}
+    head = b'{"site":' + json.dumps(site, separators=(",", ":")).encode()
+    try:
+        # Cache first; cached bodies are spliced into the line without re-parsing
+        key = make_key(**spec.model_dump())
+        body, _ = get_cached_raw(key)
+        if not body:
+            stale_key = make_stale_key(**spec.model_dump())
+            # Misses take a compute slot like single-site requests
+            with admitted():
+                fingerprint = spec_fingerprint(spec)
+                arrays = issue_forecast(spec)
+            if spec.fmt == "json":
+                result = to_payload(arrays)
+                set_cached(key, result, topic=stream_topic(spec), fingerprint=fingerprint, stale_key=stale_key)
+                body = json.dumps(result).encode()
+            else:
+                body = render(arrays, spec.fmt)
+                set_cached_raw(key, body, fingerprint=fingerprint, stale_key=stale_key)
+        return head + b',"result":' + body + b"}\n"
+    except Overloaded as e:
+        return head + _shed_tail(spec, e)
+    except Exception as e:
+        return head + b',"error":' + json.dumps(str(e)).encode() + b"}\n"
+
+
+def _shed_tail(spec: ForecastSpec, exc: Overloaded) -> bytes:
+    """The last good result of a shed site, else an error with the suggested retry delay."""
+    if spec.fmt == "json":
+        payload = stale_payload(spec, exc)
+        if payload is not None:
+            return b',"result":' + json.dumps(payload).encode() + b',"stale":true}\n'
+    else:
+        body, _ = get_cached_raw(make_stale_key(**spec.model_dump()))
+        if body:
+            admission_shed_total.labels(reason=exc.reason, response="stale").inc()
+            return b',"result":' + body + b',"stale":true}\n'
+    admission_shed_total.labels(reason=exc.reason, response="unavailable").inc()
+    return b',"error":' + json.dumps(str(exc)).encode() + b',"retry_after":%d}\n' % exc.retry_after
+
+
+async def stream_export(
+    items: Iterable[tuple[ForecastSpec, Optional[str]]], concurrency: int
+) -> AsyncIterator[bytes]:
+    """Yield one NDJSON line per site in completion order.
+
+    At most ``concurrency`` sites are in flight, and new work is only started
+    once a finished line has been handed to the (possibly slow) client, so
+    memory stays bounded by the window rather than the site count.
+    """
+    it = iter(items)
+    pending: set[asyncio.Future] = set()
+
+    def fill() -> None:
+        while len(pending) < concurrency:
+            item = next(it, None)
+            if item is None:
+                return
+            pending.add(asyncio.ensure_future(asyncio.to_thread(_export_line, *item)))
+
+    fill()
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+            fill()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _spec_for(site: ExportSite, fmt: str) -> ForecastSpec:
+    return ForecastSpec(
+        endpoint="estimate",
+        lat=site.lat,
+        lon=site.lon,
+        tilt=site.declination,
+        azimuth=site.azimuth,
+        kwp=site.kwp,
+        resolution=site.time,
+        source=site.source,
+        planes=site.planes,
+        fmt=fmt,
+    )
+
+
+def _export_response(items: Iterable[tuple[ForecastSpec, Optional[str]]]) -> StreamingResponse:
+    concurrency = max(1, settings.export_concurrency)
+    return StreamingResponse(stream_export(items, concurrency), media_type=NDJSON)
+
+
+@router.post("")
+def export_sites(
+    request: Request,
+    sites: List[ExportSite],
+    fmt: str = Query(default="json", alias="format", pattern=r"^(json|columnar)$"),
+):
+    """Stream forecasts for an uploaded site list, one NDJSON line per site.
+
+    Each site counts against the caller's rate limit like a single request.
+    """
+    # The request itself was already charged one
+    limited = charge_rate_limit(request, len(sites) - 1)
+    if limited is not None:
+        return limited
+    return _export_response((_spec_for(site, fmt), site.id) for site in sites)
+
+
+@router.get("", dependencies=[Depends(require_token)])
+def export_registry(
+    fmt: str = Query(default="json", alias="format", pattern=r"^(json|columnar)$"),
+):
+    """Stream forecasts for every site spec tracked by the refresher; admin-only (`DEBUG_TOKEN`)."""
+    specs = list_specs(max_age_seconds=settings.cache_ttl_seconds)
+    return _export_response((spec.model_copy(update={"fmt": fmt}), None) for spec in specs)
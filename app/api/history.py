@@ -0,0 +1,93 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Query
+
+from app.api.common import DATE_PATTERN, error_response
+from app.core.config import settings
+from app.models.schemas import ForecastResponse, Message
+from app.models.site import parse_planes
+from app.models.spec import ForecastSpec
+from app.services import history_store
+
+
+router = APIRouter()
+
+
+@router.get(
+    "/{lat}/{lon}/{declination}/{azimuth}/{kwp}",
+    response_model=ForecastResponse,
+)
+def history(
+    lat: float,
+    lon: float,
+    declination: float,
+    azimuth: float,
+    kwp: float,
+    start: Optional[str] = Query(default=None, description="First day (YYYY-MM-DD), default 30 days ago", pattern=DATE_PATTERN),
+    end: Optional[str] = Query(default=None, description="Last day (YYYY-MM-DD), default today", pattern=DATE_PATTERN),
+    source: Optional[str] = Query(
+        default="clearsky",
+        description="Data source the forecasts were issued with: 'clearsky' or 'open-meteo'",
+        pattern=r"^(clearsky|open-meteo)$",
+    ),
+    calibrated: bool = Query(default=False, description="Forecasts issued with the site's calibration profile (`/estimate`)"),
+):
+    return _history(
+        lat, lon, declination, azimuth, kwp, planes="", start=start, end=end, source=source, calibrated=calibrated
+    )
+
+
+@router.get(
+    "/{lat}/{lon}/{declination}/{azimuth}/{kwp}/{planes:path}",
+    response_model=ForecastResponse,
+)
+def history_planes(
+    lat: float,
+    lon: float,
+    declination: float,
+    azimuth: float,
+    kwp: float,
+    planes: str,
+    start: Optional[str] = Query(default=None, description="First day (YYYY-MM-DD), default 30 days ago", pattern=DATE_PATTERN),
+    end: Optional[str] = Query(default=None, description="Last day (YYYY-MM-DD), default today", pattern=DATE_PATTERN),
+    source: Optional[str] = Query(
+        default="clearsky",
+        description="Data source the forecasts were issued with: 'clearsky' or 'open-meteo'",
+        pattern=r"^(clearsky|open-meteo)$",
+    ),
+    calibrated: bool = Query(default=False, description="Forecasts issued with the site's calibration profile (`/estimate`)"),
+):
+    """Multi-plane history: further `{declination}/{azimuth}/{kwp}` triples follow the first plane."""
+    return _history(
+        lat, lon, declination, azimuth, kwp, planes=planes, start=start, end=end, source=source, calibrated=calibrated
+    )
+
+
+def _history(lat, lon, declination, azimuth, kwp, *, planes, start, end, source, calibrated):
+    """Daily Wh of previously issued forecasts; nothing is recomputed."""
+    if not history_store.enabled():
+        return error_response(503, "history store disabled (set HISTORY_DB_PATH)")
+    try:
+        default_start, default_end = history_store.default_range()
+        start, end = start or default_start, end or default_end
+        if date.fromisoformat(start) > date.fromisoformat(end):
+            raise ValueError("start must not be after end")
+        spec = ForecastSpec(
+            endpoint="history",
+            lat=lat,
+            lon=lon,
+            tilt=declination,
+            azimuth=azimuth,
+            kwp=kwp,
+            resolution=settings.default_resolution,
+            source=source,
+            planes=parse_planes(planes),
+        )
+        days = history_store.daily_history(spec, start, end, calibrated)
+    except ValueError as e:
+        return error_response(400, str(e))
+    return ForecastResponse(
+        result={"watts": {}, "watt_hours": {}, "watt_hours_day": days},
+        message=Message(),
+    )
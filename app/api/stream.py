@@ -0,0 +1,117 @@
+"""Server-Sent Events stream of a site's forecast, pushed whenever it is rewritten."""
+
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Path, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.common import error_response, stale_payload, unavailable_response
+from app.core.config import settings
+from app.models.spec import ForecastSpec
+from app.services.admission import Overloaded, admitted
+from app.services.cache import get_cached_entry, make_etag, make_key, make_stale_key, set_cached
+from app.services.forecast_engine import spec_fingerprint, to_payload
+from app.services.history_store import issue_forecast
+from app.services.pubsub import stream_topic, subscribe
+from app.services.warmup import track_spec
+
+
+router = APIRouter()
+
+EVENT_STREAM = "text/event-stream"
+
+
+def _event(etag: str, body: str) -> bytes:
+    return f"event: forecast\nid: {etag}\ndata: {body}\n\n".encode()
+
+
+def _current(spec: ForecastSpec, key: str) -> tuple[str, str]:
+    cached, etag = get_cached_entry(key)
+    if cached is None:
+        with admitted():
+            fingerprint = spec_fingerprint(spec)
+            payload = to_payload(issue_forecast(spec))
+        etag = set_cached(
+            key, payload, topic=stream_topic(spec), fingerprint=fingerprint, stale_key=make_stale_key(**spec.model_dump())
+        )
+        return etag, _dumps(payload)
+    return etag, _dumps(cached)
+
+
+def _dumps(payload) -> str:
+    # Same serialization as the cache write, so pushed and initial events look alike
+    return json.dumps(payload)
+
+
+@router.get("/{endpoint}/{lat}/{lon}/{declination}/{azimuth}/{kwp}")
+async def stream(
+    request: Request,
+    lat: float,
+    lon: float,
+    declination: float,
+    azimuth: float,
+    kwp: float,
+    endpoint: str = Path(description="Forecast to follow: estimate or clearsky", pattern=r"^(estimate|clearsky)$"),
+    time: Optional[str] = Query(
+        default="60m",
+        description="Cadence, e.g. 15m, 30m, 60m",
+        pattern=r"^(5|10|15|30|60)m$",
+    ),
+    source: Optional[str] = Query(
+        default="clearsky",
+        description="Data source for /estimate: 'clearsky' or 'open-meteo'",
+        pattern=r"^(clearsky|open-meteo)$",
+    ),
+):
+    """Send the current forecast, then one `forecast` event per refresh (`id` is the ETag)."""
+    try:
+        spec = ForecastSpec(
+            endpoint=endpoint,
+            lat=lat,
+            lon=lon,
+            tilt=declination,
+            azimuth=azimuth,
+            kwp=kwp,
+            resolution=time or settings.default_resolution,
+            source=(source or "clearsky") if endpoint == "estimate" else "clearsky",
+        )
+        key = make_key(**spec.model_dump())
+        try:
+            initial = await asyncio.to_thread(_current, spec, key)
+        except Overloaded as e:
+            # Start from the last good forecast; the next refresh pushes a current one
+            stale = stale_payload(spec, e)
+            if stale is None:
+                return unavailable_response(e)
+            body = _dumps(stale)
+            initial = make_etag(key, body), body
+    except ValueError as e:
+        return error_response(400, str(e))
+    track_spec(key, spec)
+    last_id = request.headers.get("last-event-id")
+
+    async def events() -> AsyncIterator[bytes]:
+        nonlocal last_id
+        async with subscribe(stream_topic(spec)) as queue:
+            if initial[0] != last_id:
+                last_id = initial[0]
+                yield _event(*initial)
+            while not await request.is_disconnected():
+                try:
+                    etag, body = await asyncio.wait_for(queue.get(), timeout=settings.stream_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    # Keep intermediaries from closing the idle connection; also keeps the spec refreshed
+                    track_spec(make_key(**spec.model_dump()), spec)
+                    yield b": keepalive\n\n"
+                    continue
+                if etag != last_id:
+                    last_id = etag
+                    yield _event(etag, body)
+
+    return StreamingResponse(
+        events(),
+        media_type=EVENT_STREAM,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
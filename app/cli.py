@@ -0,0 +1,256 @@
+"""Command-line tools.
+
+``python -m app.cli forecast sites.csv -o out.parquet`` computes forecasts for
+a site list without the HTTP layer: sites are split into chunks that run on
+a process pool, and each finished chunk is appended to the CSV or Parquet
+output in input order, so memory stays bounded by the in-flight chunks.
+
+The site CSV has the columns ``lat``, ``lon``, ``declination``, ``azimuth``
+and ``kwp``; ``id``, ``time``, ``source`` and ``planes`` (further planes as
+``declination/azimuth/kwp/...``) are optional. Clear-sky runs need no network.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, IO, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.models.schemas import ExportSite
+from app.models.site import parse_planes
+from app.services.forecast_engine import forecast_arrays, round_values
+
+
+Chunk = Tuple[Any, int, List[Tuple[str, str]]]  # (CSV bytes or DataFrame, sites ok, [(site, error)])
+
+
+def read_sites(stream: IO[str]) -> List[ExportSite]:
+    sites = []
+    for n, row in enumerate(csv.DictReader(stream), start=1):
+        row = {k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+        try:
+            planes = parse_planes(row.pop("planes", ""))
+            sites.append(ExportSite(id=row.pop("id", str(n)), planes=planes, **row))
+        except ValueError as e:
+            raise ValueError(f"row {n}: {e}")
+    return sites
+
+
+def _csv_field(value: str) -> str:
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _site_columns(site: ExportSite, daily: bool) -> Dict[str, Any]:
+    arrays = forecast_arrays(
+        lat=site.lat,
+        lon=site.lon,
+        tilt=site.declination,
+        azimuth_convention=site.azimuth,
+        kwp=site.kwp,
+        resolution=site.time,
+        source=site.source,
+        planes=site.planes,
+    )
+    if daily:
+        return {"day": np.asarray(arrays.days), "watt_hours": arrays.watt_hours_day}
+    return {"timestamp": arrays.index, "watts": arrays.watts, "watt_hours": arrays.watt_hours}
+
+
+def forecast_chunk(sites: Sequence[ExportSite], daily: bool, fmt: str) -> Chunk:
+    """Worker: forecasts for one chunk, as CSV bytes (rendered in the worker) or a DataFrame.
+
+    Sites are computed one after another; the parallelism is across chunks
+    running in separate processes, not vectorized across sites.
+    """
+    parts: List[Tuple[str, Dict[str, Any]]] = []
+    errors = []
+    for site in sites:
+        try:
+            parts.append((site.id, _site_columns(site, daily)))
+        except Exception as e:
+            errors.append((site.id, str(e)))
+    if fmt == "csv":
+        buf = io.StringIO()
+        for site_id, cols in parts:
+            keys = cols["day"] if daily else cols["timestamp"].strftime("%Y-%m-%dT%H:%M:%S%z")
+            values = [round_values(v) for name, v in cols.items() if name not in ("day", "timestamp")]
+            line = "%s,%s" + ",%r" * len(values) + "\n"
+            site = _csv_field(site_id)
+            for row in zip(keys, *values):
+                buf.write(line % (site, *row))
+        return buf.getvalue().encode(), len(parts), errors
+    frames = [pd.DataFrame({"site": site_id, **cols}) for site_id, cols in parts]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(), len(parts), errors
+
+
+class _CsvWriter:
+    def __init__(self, out: IO[bytes], daily: bool):
+        self.out = out
+        out.write(b"site,day,watt_hours\n" if daily else b"site,timestamp,watts,watt_hours\n")
+
+    def write(self, body: bytes) -> None:
+        self.out.write(body)
+
+    def close(self) -> None:
+        self.out.flush()
+
+
+class _ParquetWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install 'solar-forecast-local[parquet]')")
+        self.path = path
+        self.writer = None
+
+    def write(self, frame: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if frame.empty:
+            return
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        # one row group per chunk
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _chunks(sites: Sequence[ExportSite], size: int) -> Iterator[Sequence[ExportSite]]:
+    for i in range(0, len(sites), size):
+        yield sites[i : i + size]
+
+
+def run_forecast(
+    sites: Sequence[ExportSite],
+    writer: Any,
+    *,
+    executor: Executor,
+    workers: int,
+    chunk_size: int,
+    daily: bool,
+    fmt: str,
+    progress: Optional[IO[str]] = None,
+) -> Tuple[int, List[Tuple[str, str]]]:
+    """Forecast all sites on ``executor`` and write chunks in input order; returns (ok, errors)."""
+    pending: Deque[Future] = deque()
+    chunks = _chunks(sites, chunk_size)
+    done = ok = 0
+    errors: List[Tuple[str, str]] = []
+    t0 = time.perf_counter()
+
+    def submit() -> None:
+        # Bounded window: at most two chunks per worker in flight or waiting to be written
+        while len(pending) < 2 * workers:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            pending.append(executor.submit(forecast_chunk, chunk, daily, fmt))
+
+    submit()
+    while pending:
+        body, n_ok, chunk_errors = pending.popleft().result()
+        writer.write(body)
+        ok += n_ok
+        errors += chunk_errors
+        done += n_ok + len(chunk_errors)
+        submit()
+        if progress is not None:
+            rate = done / max(time.perf_counter() - t0, 1e-9)
+            progress.write(f"\r{done}/{len(sites)} sites, {rate:.1f} sites/s")
+            progress.flush()
+    writer.close()
+    return ok, errors
+
+
+def _forecast_command(args: argparse.Namespace) -> int:
+    with (sys.stdin if args.sites == "-" else open(args.sites, newline="")) as f:
+        try:
+            sites = read_sites(f)
+        except ValueError as e:
+            print(f"invalid site list: {e}", file=sys.stderr)
+            return 2
+    overrides = {k: v for k, v in (("time", args.time), ("source", args.source)) if v}
+    if overrides:
+        sites = [s.model_copy(update=overrides) for s in sites]
+
+    fmt = args.format or ("parquet" if (args.output or "").endswith(".parquet") else "csv")
+    if fmt == "parquet" and not args.output:
+        print("Parquet output needs --output", file=sys.stderr)
+        return 2
+    out = None
+    if fmt == "parquet":
+        writer: Any = _ParquetWriter(args.output)
+    else:
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        writer = _CsvWriter(out, args.daily)
+
+    workers = args.workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            ok, errors = run_forecast(
+                sites,
+                writer,
+                executor=executor,
+                workers=workers,
+                chunk_size=args.chunk_size,
+                daily=args.daily,
+                fmt=fmt,
+                progress=None if args.quiet else sys.stderr,
+            )
+    finally:
+        if out is not None and out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    if not args.quiet:
+        print(file=sys.stderr)  # end the progress line
+    for site_id, error in errors:
+        print(f"site {site_id}: {error.splitlines()[0] if error else error}", file=sys.stderr)
+    print(
+        f"{ok} sites ({len(errors)} failed) in {elapsed:.1f} s, {ok / max(elapsed, 1e-9):.1f} sites/s",
+        file=sys.stderr,
+    )
+    return 1 if errors else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fc = commands.add_parser("forecast", help="forecast every site of a CSV site list")
+    fc.add_argument("sites", help="site CSV file, or - for stdin")
+    fc.add_argument("-o", "--output", help="output file (default: CSV on stdout)")
+    fc.add_argument("--format", choices=("csv", "parquet"), help="output format (default: from the file extension)")
+    fc.add_argument("--daily", action="store_true", help="daily Wh per site instead of the time series")
+    fc.add_argument("--time", choices=("5m", "10m", "15m", "30m", "60m"), help="cadence for all sites")
+    fc.add_argument("--source", choices=("clearsky", "open-meteo"), help="data source for all sites")
+    fc.add_argument("-j", "--workers", type=int, default=0, help="worker processes (default: CPU count)")
+    fc.add_argument("--chunk-size", type=int, default=64, help="sites per worker task (default: 64)")
+    fc.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+    try:
+        return _forecast_command(args)
+    except BrokenPipeError:
+        # Output closed early, e.g. piped into head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,23 +7,62 @@ class Settings(BaseModel):
     default_resolution: str = os.getenv("DEFAULT_RESOLUTION", "60m")
     system_loss: float = float(os.getenv("SYSTEM_LOSS", "0.14"))  # fraction
     max_horizon_days: int = int(os.getenv("MAX_HORIZON_DAYS", "6"))
+    solar_position_method: str = os.getenv("SOLAR_POSITION_METHOD", "spa")  # spa|ephemeris|analytical
+    irradiance_tile_deg: float = float(os.getenv("IRRADIANCE_TILE_DEG", "0"))  # 0 disables tiling
+    irradiance_tile_ttl_seconds: int = int(os.getenv("IRRADIANCE_TILE_TTL", "3600"))
+    irradiance_tile_audit_rate: float = float(os.getenv("IRRADIANCE_TILE_AUDIT_RATE", "0.01"))
+    geometry_shm_dir: str = os.getenv("GEOMETRY_SHM_DIR", "")  # empty disables the cross-worker geometry store
+    geometry_shm_ttl_seconds: int = int(os.getenv("GEOMETRY_SHM_TTL", "86400"))
+    geometry_shm_max_mb: int = int(os.getenv("GEOMETRY_SHM_MAX_MB", "256"))
+    max_planes: int = int(os.getenv("MAX_PLANES", "4"))
     log_level: str = os.getenv("LOG_LEVEL", "info")
     service_name: str = "solar-forecast-local"
     http_host: str = os.getenv("HOST", "0.0.0.0")
     http_port: int = int(os.getenv("PORT", "8080"))
     redis_url: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
+    redis_cache_urls: str = os.getenv("REDIS_CACHE_URLS", "")  # comma-separated cache shards; empty = REDIS_URL
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))  # per pool and worker
+    redis_socket_timeout_seconds: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+    redis_connect_timeout_seconds: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.25"))
+    redis_backoff_min_seconds: float = float(os.getenv("REDIS_BACKOFF_MIN", "1"))
+    redis_backoff_max_seconds: float = float(os.getenv("REDIS_BACKOFF_MAX", "30"))
     cache_ttl_seconds: int = int(os.getenv("CACHE_TTL", "1800"))  # 30 minutes
     metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    metrics_max_paths: int = int(os.getenv("METRICS_MAX_PATHS", "50"))
     rate_limit_per_minute: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "120"))
+    compute_concurrency: int = int(os.getenv("COMPUTE_CONCURRENCY", "4"))  # per worker; 0 disables admission control
+    compute_queue_size: int = int(os.getenv("COMPUTE_QUEUE_SIZE", "16"))
+    compute_deadline_seconds: float = float(os.getenv("COMPUTE_DEADLINE_SECONDS", "10"))
+    stale_ttl_seconds: int = int(os.getenv("STALE_TTL", "86400"))  # 0 disables stale fallbacks
+    export_concurrency: int = int(os.getenv("EXPORT_CONCURRENCY", "4"))
+    export_max_body_bytes: int = int(os.getenv("EXPORT_MAX_BODY_BYTES", str(1024 * 1024)))
+    history_db_path: str = os.getenv("HISTORY_DB_PATH", "")  # empty disables /history recording
+    history_retention_days: int = int(os.getenv("HISTORY_RETENTION_DAYS", "400"))  # 0 keeps everything
+    calibration_db_path: str = os.getenv("CALIBRATION_DB_PATH", "")  # empty disables calibration
+    calibration_token: str = os.getenv("CALIBRATION_TOKEN", "")  # empty refuses telemetry uploads
+    calibration_forgetting: float = float(os.getenv("CALIBRATION_FORGETTING", "0.999"))  # per sample
+    stream_keepalive_seconds: float = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "30"))
+    debug_token: str = os.getenv("DEBUG_TOKEN", "")  # empty disables the /debug profiling endpoints
+    debug_profile_max_seconds: float = float(os.getenv("DEBUG_PROFILE_MAX_SECONDS", "60"))
     refresh_enabled: bool = os.getenv("REFRESH_ENABLED", "true").lower() == "true"
     refresh_interval_seconds: int = int(os.getenv("REFRESH_INTERVAL_SECONDS", "300"))
     weather_enabled: bool = os.getenv("WEATHER_ENABLED", "true").lower() == "true"
     weather_ttl_seconds: int = int(os.getenv("WEATHER_TTL", "1800"))
     weather_alpha: float = float(os.getenv("WEATHER_ALPHA", "0.75"))
+    weather_prefetch_enabled: bool = os.getenv("WEATHER_PREFETCH_ENABLED", "true").lower() == "true"
+    weather_prefetch_lead_seconds: int = int(os.getenv("WEATHER_PREFETCH_LEAD", "300"))
+    weather_prefetch_jitter_seconds: int = int(os.getenv("WEATHER_PREFETCH_JITTER", "120"))
+    weather_prefetch_concurrency: int = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", "4"))
+    weather_model_cadence_minutes: int = int(os.getenv("WEATHER_MODEL_CADENCE_MINUTES", "60"))
     weather_timeout_seconds: float = float(os.getenv("WEATHER_TIMEOUT", "8.0"))
     open_meteo_base_url: str = os.getenv(
         "OPEN_METEO_BASE_URL", "https://api.open-meteo.com/v1/forecast"
     )
+    open_meteo_ensemble_url: str = os.getenv(
+        "OPEN_METEO_ENSEMBLE_URL", "https://ensemble-api.open-meteo.com/v1/ensemble"
+    )
+    open_meteo_ensemble_models: str = os.getenv("OPEN_METEO_ENSEMBLE_MODELS", "icon_seamless")
+    open_meteo_ensemble_fixture: str = os.getenv("OPEN_METEO_ENSEMBLE_FIXTURE", "")  # local JSON stand-in
 
 
 settings = Settings()
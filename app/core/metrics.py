@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import os
+import threading
 import time
-from typing import Callable
+from typing import Callable, Dict, Optional
 
-from prometheus_client import Counter, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
 from starlette.requests import Request
 from starlette.responses import Response
+from starlette.routing import Match
 
+try:
+    from fastapi.routing import iter_route_contexts
+except ImportError:
+    iter_route_contexts = None
+
+from app.core.config import settings
+
+
+# Label values used instead of raw request paths
+UNMATCHED_PATH = "__unmatched__"
+OVERFLOW_PATH = "__overflow__"
 
 registry = CollectorRegistry()
 
@@ -32,10 +47,173 @@ cache_hits_total = Counter(
     registry=registry,
 )
 
+irradiance_tile_lookups_total = Counter(
+    "irradiance_tile_lookups_total",
+    "Geo-tiled clear-sky irradiance cache lookups",
+    ["result"],
+    registry=registry,
+)
+
+irradiance_tile_error_wm2 = Histogram(
+    "irradiance_tile_error_wm2",
+    "Max absolute clear-sky GHI difference between tile centre and exact site (sampled)",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50),
+    registry=registry,
+)
+
+geometry_store_lookups_total = Counter(
+    "geometry_store_lookups_total",
+    "Shared-memory geometry store lookups: hit (mapped), miss (computed and published) or error (computed locally)",
+    ["result"],
+    registry=registry,
+)
+
+weather_prefetch_total = Counter(
+    "weather_prefetch_total",
+    "Background weather prefetches by result",
+    ["result"],
+    registry=registry,
+)
+
+weather_prefetch_locations = Gauge(
+    "weather_prefetch_locations",
+    "Weather locations tracked by the prefetcher",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+
+weather_prefetch_leader = Gauge(
+    "weather_prefetch_leader",
+    "1 in the worker currently running the weather prefetch loop",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+
+forecast_refresh_total = Counter(
+    "forecast_refresh_total",
+    "Refresher outcomes per spec: recomputed, skipped (inputs unchanged, TTL extended) or error",
+    ["result"],
+    registry=registry,
+)
+
+compute_queue_depth = Gauge(
+    "compute_queue_depth",
+    "Cache-miss computations waiting for a compute slot",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+
+compute_in_flight = Gauge(
+    "compute_in_flight",
+    "Cache-miss computations running",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+
+admission_shed_total = Counter(
+    "admission_shed_total",
+    "Cache misses shed under load, by reason (queue_full, deadline) and response (stale, unavailable)",
+    ["reason", "response"],
+    registry=registry,
+)
+
+redis_up = Gauge(
+    "redis_up",
+    "1 while Redis is reachable, 0 during an outage (requests fail open)",
+    registry=registry,
+    multiprocess_mode="livemin",
+)
+
+redis_shard_up = Gauge(
+    "redis_shard_up",
+    "1 while a REDIS_CACHE_URLS node is reachable, 0 while its keys go to the next node",
+    ["shard"],
+    registry=registry,
+    multiprocess_mode="livemin",
+)
+
+redis_errors_total = Counter(
+    "redis_errors_total",
+    "Redis connection and timeout errors",
+    ["error"],
+    registry=registry,
+)
+
+redis_probes_total = Counter(
+    "redis_probes_total",
+    "Redis reconnect probes by result",
+    ["result"],
+    registry=registry,
+)
+
+
+def multiprocess_enabled() -> bool:
+    # prometheus_client switches to mmap-backed values when this env var is set at import
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+class _PathLabels:
+    """Bounded set of path label values; extra templates collapse into an overflow bucket."""
+
+    def __init__(self, max_paths: int):
+        self.max_paths = max(1, max_paths)
+        self._seen: set[str] = set()
+        self._lock = threading.Lock()
+
+    def label(self, path: str) -> str:
+        if path in self._seen:
+            return path
+        with self._lock:
+            if path in self._seen:
+                return path
+            if len(self._seen) >= self.max_paths:
+                return OVERFLOW_PATH
+            self._seen.add(path)
+            return path
+
+
+def _full_templates(app) -> Dict[int, str]:
+    """id(route) -> route template including the prefixes of the routers it was included through."""
+    routes = getattr(getattr(app, "router", None), "routes", None) or []
+    if iter_route_contexts is None:
+        # Older FastAPI copies included routes with their full path
+        return {id(r): r.path for r in routes if getattr(r, "path", None)}
+    return {id(rc.original_route): rc.path for rc in iter_route_contexts(routes) if rc.path}
+
+
+def _route_template(scope, templates: Dict[int, str]) -> str:
+    # Routing mutates the shared scope, so after the call the matched route is available
+    route = scope.get("route")
+    if route is None:
+        return _match_app_routes(scope)
+    return templates.get(id(route)) or getattr(route, "path", None) or UNMATCHED_PATH
+
+
+def _match_app_routes(scope) -> str:
+    app = scope.get("app")
+    routes = getattr(getattr(app, "router", None), "routes", None) or []
+    for candidate in routes:
+        try:
+            match, _ = candidate.matches(scope)
+        except Exception:
+            continue
+        if match == Match.FULL and getattr(candidate, "path", None):
+            return candidate.path
+    return UNMATCHED_PATH
+
 
 class MetricsMiddleware:
-    def __init__(self, app):
+    def __init__(self, app, max_paths: Optional[int] = None):
         self.app = app
+        self.paths = _PathLabels(max_paths if max_paths is not None else settings.metrics_max_paths)
+        self._templates: Optional[Dict[int, str]] = None
+
+    def _template(self, scope) -> str:
+        route = scope.get("route")
+        if self._templates is None or (route is not None and id(route) not in self._templates):
+            # Built from the app's routes on first use, and again if routes were added since
+            self._templates = _full_templates(scope.get("app"))
+        return _route_template(scope, self._templates)
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -43,8 +221,6 @@ class MetricsMiddleware:
             return
 
         method = scope.get("method", "").upper()
-        route = scope.get("route")
-        path_template = getattr(route, "path", scope.get("path", "/"))
 
         start = time.perf_counter()
         status_container = {}
@@ -54,15 +230,23 @@ class MetricsMiddleware:
                 status_container["status"] = message["status"]
             await send(message)
 
-        await self.app(scope, receive, send_wrapper)
-        duration = time.perf_counter() - start
-        status = str(status_container.get("status", 0))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            status = str(status_container.get("status", 500))
+            path_template = self.paths.label(self._template(scope))
 
-        http_requests_total.labels(method=method, path=path_template, status=status).inc()
-        http_request_duration_seconds.labels(method=method, path=path_template).observe(duration)
+            http_requests_total.labels(method=method, path=path_template, status=status).inc()
+            http_request_duration_seconds.labels(method=method, path=path_template).observe(duration)
 
 
 def metrics_endpoint(_: Request) -> Response:
-    output = generate_latest(registry)
+    if multiprocess_enabled():
+        # Aggregate the per-worker mmap files into a throwaway registry per scrape
+        collect_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collect_registry)
+        output = generate_latest(collect_registry)
+    else:
+        output = generate_latest(registry)
     return Response(content=output, media_type=CONTENT_TYPE_LATEST)
-
@@ -1,44 +1,57 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Callable
+from typing import Callable, Optional
 
 from app.core.config import settings
 from app.models.spec import ForecastSpec
-from app.services.forecast_engine import compute_forecast
-from app.services.cache import set_cached, make_key
+from app.core.metrics import forecast_refresh_total
+from app.services.forecast_engine import spec_fingerprint, to_payload
+from app.services.cache import get_fingerprints, set_cached, set_cached_raw, make_key, make_stale_key, touch_cached
+from app.services.formats import render
+from app.services.history_store import issue_forecast
+from app.services.pubsub import stream_topic
 from app.services.warmup import list_specs
 
 
+def _refresh_spec(spec: ForecastSpec, key: str, stored: Optional[str]) -> bool:
+    """Recompute and store a spec's forecast unless its inputs are unchanged; True if recomputed.
+
+    ``stored`` is the fingerprint currently cached under ``key``.
+    """
+    # Taken before computing: if inputs change meanwhile, the next cycle sees a mismatch and recomputes
+    fingerprint = spec_fingerprint(spec)
+    if stored == fingerprint and touch_cached(key):
+        return False
+    # The refresher runs one spec at a time, outside admission control, and keeps stale copies current
+    stale_key = make_stale_key(**spec.model_dump())
+    if spec.fmt == "json":
+        set_cached(
+            key, to_payload(issue_forecast(spec)), topic=stream_topic(spec), fingerprint=fingerprint, stale_key=stale_key
+        )
+    else:
+        set_cached_raw(key, render(issue_forecast(spec), spec.fmt), fingerprint=fingerprint, stale_key=stale_key)
+    return True
+
+
 async def refresh_once() -> int:
     specs = list_specs(max_age_seconds=settings.cache_ttl_seconds)
+    keys = [make_key(**spec.model_dump()) for spec in specs]
+    try:
+        # One read per cache node for the whole cycle
+        stored = await asyncio.to_thread(get_fingerprints, keys)
+    except Exception:
+        stored = [None] * len(keys)
     count = 0
-    for spec in specs:
+    for spec, key, fingerprint in zip(specs, keys, stored):
         try:
-            result = compute_forecast(
-                lat=spec.lat,
-                lon=spec.lon,
-                tilt=spec.tilt,
-                azimuth_convention=spec.azimuth,
-                kwp=spec.kwp,
-                resolution=spec.resolution,
-                source=spec.source,
-            )
-            key = make_key(
-                endpoint=spec.endpoint,
-                lat=spec.lat,
-                lon=spec.lon,
-                tilt=spec.tilt,
-                azimuth=spec.azimuth,
-                kwp=spec.kwp,
-                resolution=spec.resolution,
-                source=spec.source,
-            )
-            set_cached(key, result)
+            # Off the event loop, so requests keep being served during a refresh cycle
+            recomputed = await asyncio.to_thread(_refresh_spec, spec, key, fingerprint)
+            forecast_refresh_total.labels(result="recomputed" if recomputed else "skipped").inc()
             count += 1
         except Exception:
             # Swallow to keep loop healthy; observability via logs could be added
-            pass
+            forecast_refresh_total.labels(result="error").inc()
     return count
 
 
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import hmac
 import time
 from typing import Optional, Tuple
 
+from fastapi import Header, HTTPException
+from starlette.requests import Request
 from starlette.types import ASGIApp, Receive, Scope, Send
 from starlette.responses import JSONResponse
 
@@ -10,10 +13,74 @@ from app.core.config import settings
 from app.services.cache import _get_client as get_redis_client
 
 
+def _check_token(expected: str, header: Optional[str], authorization: Optional[str], name: str) -> None:
+    token = header or (authorization or "").removeprefix("Bearer ").strip()
+    if not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail=f"invalid {name} token")
+
+
+def require_token(
+    authorization: Optional[str] = Header(default=None),
+    x_debug_token: Optional[str] = Header(default=None),
+) -> None:
+    """Admin-only dependency: the `DEBUG_TOKEN` as bearer token or `X-Debug-Token`; refused when unset."""
+    _check_token(settings.debug_token, x_debug_token, authorization, "debug")
+
+
+def require_calibration_token(
+    authorization: Optional[str] = Header(default=None),
+    x_calibration_token: Optional[str] = Header(default=None),
+) -> None:
+    """Telemetry uploads: the `CALIBRATION_TOKEN` as bearer token or `X-Calibration-Token`; refused when unset."""
+    _check_token(settings.calibration_token, x_calibration_token, authorization, "calibration")
+
+
+def too_many_requests(ttl: int, limit: int, text: str = "Too Many Requests") -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        headers={
+            "Retry-After": str(ttl),
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": "0",
+        },
+        content={
+            "result": {"watts": {}, "watt_hours": {}, "watt_hours_day": {}},
+            "message": {
+                "type": "error",
+                "code": 429,
+                "text": text,
+            },
+        },
+    )
+
+
+def charge_rate_limit(request: Request, cost: int) -> Optional[JSONResponse]:
+    """Charge ``cost`` more requests to the caller's window, e.g. one per site of a bulk upload.
+
+    Returns the 429 response to send when that exceeds the limit, None when
+    allowed or when no rate limiter is installed.
+    """
+    limiter = request.scope.get("rate_limiter")
+    if limiter is None or cost <= 0:
+        return None
+    allowed, ttl = limiter.allow(limiter.client_ip(request.scope), cost)
+    if allowed:
+        return None
+    return too_many_requests(ttl, limiter.limit, f"{cost} items exceed the rate limit of {limiter.limit} per minute")
+
+
 class BodySizeLimitMiddleware:
-    def __init__(self, app: ASGIApp, max_bytes: int = 4096):
+    def __init__(self, app: ASGIApp, max_bytes: int = 4096, path_limits: Optional[dict[str, int]] = None):
         self.app = app
         self.max_bytes = max_bytes
+        # per path-prefix overrides, e.g. larger uploads for bulk export
+        self.path_limits = path_limits or {}
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.path_limits.items():
+            if path.startswith(prefix):
+                return limit
+        return self.max_bytes
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":
@@ -25,7 +92,7 @@ class BodySizeLimitMiddleware:
         if cl is not None:
             try:
                 size = int(cl.decode())
-                if size > self.max_bytes:
+                if size > self._limit_for(scope.get("path", "")):
                     await JSONResponse(
                         status_code=413,
                         content={
@@ -47,7 +114,7 @@ class RateLimitMiddleware:
         self._window_start = int(time.time() // 60)
         self._local_counts: dict[str, int] = {}
 
-    def _client_ip(self, scope: Scope) -> str:
+    def client_ip(self, scope: Scope) -> str:
         headers = dict(scope.get("headers") or [])
         xff = headers.get(b"x-forwarded-for")
         if xff:
@@ -57,60 +124,54 @@ class RateLimitMiddleware:
         client = scope.get("client") or (None,)
         return client[0] or "unknown"
 
-    def _redis_allow(self, ip: str) -> Tuple[bool, int]:
+    def _redis_allow(self, ip: str, cost: int = 1) -> Tuple[bool, int]:
         r = get_redis_client()
         if not r:
             return False, 0
         key = f"rl:{ip}"
         try:
-            cur = r.incr(key)
-            if cur == 1:
+            cur = r.incr(key, cost)
+            if cur == cost:
                 # first increment, set window TTL 60s
                 r.expire(key, 60)
             ttl = r.ttl(key)
             allowed = cur <= self.limit
+            if not allowed:
+                # Rejected requests do not use up the window, so a client can retry a smaller bulk upload
+                r.decrby(key, cost)
             return allowed, max(0, int(ttl))
         except Exception:
             return False, 0
 
-    def _local_allow(self, ip: str) -> Tuple[bool, int]:
+    def _local_allow(self, ip: str, cost: int = 1) -> Tuple[bool, int]:
         now_window = int(time.time() // 60)
         if now_window != self._window_start:
             self._window_start = now_window
             self._local_counts = {}
-        count = self._local_counts.get(ip, 0) + 1
-        self._local_counts[ip] = count
+        count = self._local_counts.get(ip, 0) + cost
         allowed = count <= self.limit
+        if allowed:
+            self._local_counts[ip] = count
         # approximate remaining seconds in window
         ttl = int(60 - (time.time() % 60))
         return allowed, ttl
 
+    def allow(self, ip: str, cost: int = 1) -> Tuple[bool, int]:
+        allowed, ttl = self._redis_allow(ip, cost)
+        if allowed is False and ttl == 0:
+            # Redis not available -> use local
+            allowed, ttl = self._local_allow(ip, cost)
+        return allowed, ttl
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
-        ip = self._client_ip(scope)
-        allowed, ttl = self._redis_allow(ip)
-        if allowed is False and ttl == 0:
-            # Redis not available -> use local
-            allowed, ttl = self._local_allow(ip)
+        allowed, ttl = self.allow(self.client_ip(scope))
         if not allowed:
-            await JSONResponse(
-                status_code=429,
-                headers={
-                    "Retry-After": str(ttl),
-                    "X-RateLimit-Limit": str(self.limit),
-                    "X-RateLimit-Remaining": "0",
-                },
-                content={
-                    "result": {"watts": {}, "watt_hours": {}, "watt_hours_day": {}},
-                    "message": {
-                        "type": "error",
-                        "code": 429,
-                        "text": "Too Many Requests",
-                    },
-                },
-            )(scope, receive, send)
+            await too_many_requests(ttl, self.limit)(scope, receive, send)
             return
+        # Bulk endpoints charge their extra items through `charge_rate_limit`
+        scope["rate_limiter"] = self
         await self.app(scope, receive, send)
 
@@ -1,16 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.estimate import router as estimate_router
 from app.api.clearsky import router as clearsky_router
+from app.api.best_window import router as best_window_router
+from app.api.calibrate import router as calibrate_router
+from app.api.debug import router as debug_router
+from app.api.export import router as export_router
+from app.api.history import router as history_router
+from app.api.stream import router as stream_router
 from app.core.metrics import MetricsMiddleware, metrics_endpoint
 from app.core.refresh import refresher_loop
 from app.core.security import RateLimitMiddleware, BodySizeLimitMiddleware
+from app.services import history_store, redis_conn
+from app.services.weather_prefetch import weather_prefetch_loop
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background loops run on the server's event loop for the app's lifetime
+    tasks = [asyncio.create_task(refresher_loop()), asyncio.create_task(weather_prefetch_loop())]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Rows still queued for the history writer thread
+        await asyncio.to_thread(history_store.flush)
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Local Forecast.Solar-compatible API", version="0.4.0")
+    app = FastAPI(title="Local Forecast.Solar-compatible API", version="0.4.0", lifespan=lifespan)
 
     # CORS: allow all by default; can be restricted via env later
     app.add_middleware(
@@ -22,7 +47,11 @@ def create_app() -> FastAPI:
     )
 
     # Security middleware
-    app.add_middleware(BodySizeLimitMiddleware, max_bytes=1024 * 4)
+    app.add_middleware(
+        BodySizeLimitMiddleware,
+        max_bytes=1024 * 4,
+        path_limits={"/export": settings.export_max_body_bytes, "/calibrate": settings.export_max_body_bytes},
+    )
     app.add_middleware(RateLimitMiddleware, limit_per_minute=settings.rate_limit_per_minute)
 
     if settings.metrics_enabled:
@@ -30,20 +59,23 @@ def create_app() -> FastAPI:
 
     @app.get("/health")
     def health():
-        return {"status": "ok"}
+        # Redis is optional at runtime (requests fail open), so its state does not fail the check
+        return {"status": "ok", "redis": redis_conn.health()}
 
     if settings.metrics_enabled:
         app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
 
     app.include_router(estimate_router, prefix="/estimate", tags=["estimate"])
     app.include_router(clearsky_router, prefix="/clearsky", tags=["clearsky"])
+    app.include_router(export_router, prefix="/export", tags=["export"])
+    app.include_router(history_router, prefix="/history", tags=["history"])
+    app.include_router(best_window_router, prefix="/best_window", tags=["best_window"])
+    app.include_router(stream_router, prefix="/stream", tags=["stream"])
+    app.include_router(calibrate_router, prefix="/calibrate", tags=["calibrate"])
+    if settings.debug_token:
+        app.include_router(debug_router, prefix="/debug", tags=["debug"], include_in_schema=False)
 
     return app
 
 
 app = create_app()
-
-# Start background refresher loop
-import asyncio
-
-asyncio.get_event_loop().create_task(refresher_loop())
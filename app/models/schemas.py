@@ -1,5 +1,5 @@
-from typing import Dict
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Message(BaseModel):
@@ -9,6 +9,9 @@ class Message(BaseModel):
 
 
 class ForecastResult(BaseModel):
+    # Optional extras (e.g. per-plane breakdown) are passed through unchanged
+    model_config = ConfigDict(extra="allow")
+
     watts: Dict[str, float]
     watt_hours: Dict[str, float]
     watt_hours_day: Dict[str, float]
@@ -18,3 +21,31 @@ class ForecastResponse(BaseModel):
     result: ForecastResult | dict
     message: Message
 
+
+class ExportSite(BaseModel):
+    id: Optional[str] = None
+    lat: float
+    lon: float
+    declination: float
+    azimuth: float
+    kwp: float
+    planes: List[Tuple[float, float, float]] = Field(default_factory=list)
+    time: str = Field(default="60m", pattern=r"^(5|10|15|30|60)m$")
+    source: str = Field(default="clearsky", pattern=r"^(clearsky|open-meteo)$")
+
+
+class CalibrationBatch(BaseModel):
+    """Telemetry of one site: modelled and measured AC watts at the same timestamps, oldest first.
+
+    ``predicted`` is the raw model output (`/clearsky`, or `/estimate` before
+    the site had a profile); calibrated values would re-fit the residual.
+    """
+
+    lat: float
+    lon: float
+    declination: float
+    azimuth: float
+    kwp: float
+    planes: List[Tuple[float, float, float]] = Field(default_factory=list)
+    predicted: List[float]
+    measured: List[float]
@@ -1,6 +1,21 @@
+from typing import List, Tuple
+
 from pydantic import BaseModel, Field
 
 
+class Plane(BaseModel):
+    tilt: float = Field(ge=0, le=90, description="Tilt from horizontal [deg]")
+    azimuth_conv: float = Field(
+        ge=-180,
+        le=180,
+        description="Azimuth convention: 0=South, +E, -W (Forecast.Solar)",
+    )
+    kwp: float = Field(gt=0, description="Installed DC power in kWp")
+
+    def to_pvlib_azimuth(self) -> float:
+        return 180.0 - self.azimuth_conv
+
+
 class Site(BaseModel):
     lat: float = Field(ge=-90, le=90)
     lon: float = Field(ge=-180, le=180)
@@ -12,8 +27,27 @@ class Site(BaseModel):
     )
     kwp: float = Field(gt=0, description="Installed DC power in kWp")
     resolution: str = Field(default="60m")
+    extra_planes: List[Plane] = Field(
+        default_factory=list,
+        description="Additional planes sharing the same location (multi-plane systems)",
+    )
 
     def to_pvlib_azimuth(self) -> float:
         # Convert 0=South (+E/-W) to pvlib azimuth degrees (0=N, 90=E, 180=S, 270=W)
         return 180.0 - self.azimuth_conv
 
+    def planes(self) -> List[Plane]:
+        primary = Plane(tilt=self.tilt, azimuth_conv=self.azimuth_conv, kwp=self.kwp)
+        return [primary, *self.extra_planes]
+
+
+def parse_planes(path: str) -> List[Tuple[float, float, float]]:
+    """Parse Forecast.Solar-style repeated `{declination}/{azimuth}/{kwp}` segments."""
+    parts = [p for p in path.strip("/").split("/") if p]
+    if len(parts) % 3 != 0:
+        raise ValueError("additional planes must be given as {declination}/{azimuth}/{kwp} triples")
+    try:
+        values = [float(p) for p in parts]
+    except ValueError:
+        raise ValueError("plane parameters must be numbers")
+    return [(values[i], values[i + 1], values[i + 2]) for i in range(0, len(values), 3)]
@@ -1,3 +1,5 @@
+from typing import List, Optional, Tuple
+
 from pydantic import BaseModel
 
 
@@ -10,4 +12,11 @@ class ForecastSpec(BaseModel):
     kwp: float
     resolution: str
     source: str
-
+    planes: List[Tuple[float, float, float]] = []
+    per_plane: bool = False
+    quantiles: bool = False
+    # Partial horizon: first `days` local days, or the local dates start_date..end_date
+    days: Optional[int] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    fmt: str = "json"
@@ -0,0 +1,82 @@
+"""Admission control for cache-miss computation.
+
+At most ``COMPUTE_CONCURRENCY`` forecasts are computed at once per worker;
+up to ``COMPUTE_QUEUE_SIZE`` further misses wait for a slot, each for at
+most ``COMPUTE_DEADLINE_SECONDS``. A miss that finds the queue full or runs
+out of time raises ``Overloaded`` and the caller serves a stale copy or a
+503, so a burst of cold requests cannot take the request threads that cache
+hits need. The queue should stay well below the request thread pool (40).
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.core.config import settings
+from app.core.metrics import compute_in_flight, compute_queue_depth
+
+
+# Initial guess of one computation's duration, refined by an EWMA
+_INITIAL_SECONDS = 1.0
+_EWMA_WEIGHT = 0.2
+MAX_RETRY_AFTER = 60
+
+_cond = threading.Condition()
+_running = 0
+_waiting = 0
+_avg_seconds = _INITIAL_SECONDS
+
+
+class Overloaded(RuntimeError):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"forecast computation shed ({reason})")
+        self.reason = reason  # queue_full | deadline
+        self.retry_after = retry_after
+
+
+def _retry_after() -> int:
+    # Time until the current backlog has drained at the observed compute rate
+    backlog = (_running + _waiting) / max(1, settings.compute_concurrency)
+    return max(1, min(MAX_RETRY_AFTER, math.ceil(_avg_seconds * backlog)))
+
+
+@contextmanager
+def admitted() -> Iterator[None]:
+    """Hold a compute slot for the block; raises ``Overloaded`` instead of waiting past the deadline."""
+    global _running, _waiting, _avg_seconds
+    limit = settings.compute_concurrency
+    if limit <= 0:
+        yield
+        return
+    deadline = time.monotonic() + settings.compute_deadline_seconds
+    with _cond:
+        if _running >= limit:
+            if _waiting >= settings.compute_queue_size:
+                raise Overloaded("queue_full", _retry_after())
+            _waiting += 1
+            compute_queue_depth.inc()
+            try:
+                while _running >= limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded("deadline", _retry_after())
+                    _cond.wait(remaining)
+            finally:
+                _waiting -= 1
+                compute_queue_depth.dec()
+        _running += 1
+    compute_in_flight.inc()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        compute_in_flight.dec()
+        with _cond:
+            _running -= 1
+            _avg_seconds += _EWMA_WEIGHT * (elapsed - _avg_seconds)
+            _cond.notify()
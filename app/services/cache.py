@@ -1,35 +1,36 @@
 """Redis response cache layer.
 
 Used to cache API responses keyed by input parameters and time horizon.
-Falls back to no-op if Redis is unavailable.
+Falls back to no-op if Redis is unavailable; connections, outage handling
+and the shard ring live in ``redis_conn``. Each value is stored with its
+``:etag``/``:fp`` companions on the cache node that owns its key.
 """
 
 from __future__ import annotations
 
 import json
 import hashlib
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 
 import redis
 
 from app.core.config import settings
+from app.services import pubsub, redis_conn
 from app.util.timeindex import parse_resolution, now_local
 
 
-_client: Optional[redis.Redis] = None
+# Bump when the computation changes so keys and ETags of older results are not reused
+CACHE_VERSION = 1
 
 
-def _get_client() -> Optional[redis.Redis]:
-    global _client
-    if _client is not None:
-        return _client
-    try:
-        _client = redis.from_url(settings.redis_url, decode_responses=True)
-        # Ping to confirm connectivity
-        _client.ping()
-        return _client
-    except Exception:
-        return None
+def _get_client(key: Optional[str] = None) -> Optional[redis.Redis]:
+    # Cache node owning ``key``; without a key the primary (rate limits, pub/sub)
+    return redis_conn.shard_client(key) if key is not None else redis_conn.client()
+
+
+def _get_raw_client(key: Optional[str] = None) -> Optional[redis.Redis]:
+    # Client without response decoding, for binary payloads (e.g. MessagePack)
+    return redis_conn.shard_client(key, raw=True) if key is not None else redis_conn.client(raw=True)
 
 
 def _aligned_start_key(resolution: str) -> str:
@@ -42,7 +43,7 @@ def _aligned_start_key(resolution: str) -> str:
     return now.strftime("%Y-%m-%dT%H:%M:%S%z")
 
 
-def make_key(
+def _key_parts(
     *,
     endpoint: str,
     lat: float,
@@ -52,9 +53,16 @@ def make_key(
     kwp: float,
     resolution: str,
     source: str,
-) -> str:
+    planes: Sequence[Tuple[float, float, float]] = (),
+    per_plane: bool = False,
+    quantiles: bool = False,
+    days: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    fmt: str = "json",
+) -> Dict[str, Any]:
     parts = {
-        "v": 1,
+        "v": CACHE_VERSION,
         "ep": endpoint,
         "lat": round(float(lat), 5),
         "lon": round(float(lon), 5),
@@ -67,25 +75,254 @@ def make_key(
         "days": settings.max_horizon_days,
         "start": _aligned_start_key(resolution),
     }
-    s = json.dumps(parts, sort_keys=True)
-    digest = hashlib.sha256(s.encode()).hexdigest()
-    return f"resp:{digest}"
+    # Only present for multi-plane requests so single-plane keys stay unchanged
+    if planes:
+        parts["planes"] = [[round(float(t), 2), round(float(a), 2), round(float(k), 3)] for t, a, k in planes]
+    if per_plane:
+        parts["per_plane"] = True
+    if quantiles:
+        parts["q"] = True
+    if days is not None or start_date or end_date:
+        parts["range"] = [days, start_date, end_date]
+    if fmt != "json":
+        parts["fmt"] = fmt
+    if settings.solar_position_method != "spa":
+        parts["spm"] = settings.solar_position_method
+    if settings.irradiance_tile_deg > 0:
+        parts["tile"] = settings.irradiance_tile_deg
+    return parts
+
+
+def _digest(parts: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def make_key(**spec_fields: Any) -> str:
+    return f"resp:{_digest(_key_parts(**spec_fields))}"
+
+
+def make_stale_key(**spec_fields: Any) -> str:
+    """Like ``make_key`` but without the time window: the last good result, served while computation is shed."""
+    parts = _key_parts(**spec_fields)
+    del parts["start"]
+    return f"stale:{_digest(parts)}"
+
+
+def make_site_id(
+    *,
+    lat: float,
+    lon: float,
+    tilt: float,
+    azimuth: float,
+    kwp: float,
+    planes: Sequence[Tuple[float, float, float]] = (),
+) -> str:
+    """Stable id of a physical system, independent of endpoint, cadence and format."""
+    parts = [
+        round(float(lat), 5),
+        round(float(lon), 5),
+        round(float(tilt), 2),
+        round(float(azimuth), 2),
+        round(float(kwp), 3),
+        [[round(float(t), 2), round(float(a), 2), round(float(k), 3)] for t, a, k in planes],
+    ]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:24]
+
+
+def _etag_key(key: str) -> str:
+    return f"{key}:etag"
+
+
+def _fingerprint_key(key: str) -> str:
+    return f"{key}:fp"
 
 
-def get_cached(key: str) -> Optional[Dict[str, Any]]:
-    client = _get_client()
+def make_etag(key: str, body: str | bytes) -> str:
+    """Strong ETag over the cache key, computation version and serialized result."""
+    if isinstance(body, str):
+        body = body.encode()
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{key}:".encode() + body).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def get_etag(key: str) -> Optional[str]:
+    """ETag stored next to a cached value; lets conditional GETs skip loading the body."""
+    client = _get_client(key)
     if not client:
         return None
-    data = client.get(key)
-    if not data:
+    try:
+        return client.get(_etag_key(key))
+    except redis.RedisError:
         return None
-    return json.loads(data)
 
 
-def set_cached(key: str, value: Dict[str, Any], ttl_seconds: Optional[int] = None) -> None:
-    client = _get_client()
+def get_cached(key: str, base_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    value, _ = get_cached_entry(key, base_key)
+    return value
+
+
+def get_cached_entry(
+    key: str, base_key: Optional[str] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    # A value derived from ``base_key`` is stored on that key's node
+    client = _get_client(base_key or key)
     if not client:
+        return None, None
+    try:
+        data, etag = client.mget([key, _etag_key(key)])
+    except redis.RedisError:
+        return None, None
+    if not data:
+        return None, None
+    return json.loads(data), etag or make_etag(key, data)
+
+
+class _Batch:
+    """Pipelines of one logical write, one per Redis node it touches."""
+
+    def __init__(self):
+        self._pipes: Dict[int, Any] = {}
+
+    def on(self, client: redis.Redis) -> Any:
+        pipe = self._pipes.get(id(client))
+        if pipe is None:
+            pipe = self._pipes[id(client)] = client.pipeline()
+        return pipe
+
+    def execute(self) -> set:
+        """Run every pipeline; returns the ids of clients whose pipeline failed."""
+        failed = set()
+        for client_id, pipe in self._pipes.items():
+            try:
+                pipe.execute()
+            except redis.RedisError:
+                failed.add(client_id)
+        return failed
+
+
+def _stage_stale(batch: _Batch, stale_key: Optional[str], body: str | bytes, etag: str, raw: bool) -> None:
+    # The stale copy has its own key, so it may live on another node than the value
+    if not stale_key or settings.stale_ttl_seconds <= 0:
         return
+    client = _get_raw_client(stale_key) if raw else _get_client(stale_key)
+    if client:
+        pipe = batch.on(client)
+        pipe.setex(name=stale_key, time=settings.stale_ttl_seconds, value=body)
+        pipe.setex(name=_etag_key(stale_key), time=settings.stale_ttl_seconds, value=etag)
+
+
+def set_cached(
+    key: str,
+    value: Dict[str, Any],
+    ttl_seconds: Optional[int] = None,
+    topic: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+    stale_key: Optional[str] = None,
+    base_key: Optional[str] = None,
+) -> str:
+    """Store ``value`` and its ETag; returns the ETag even when Redis is unavailable.
+
+    With ``topic``, the write is also pushed to streaming subscribers;
+    ``fingerprint`` records the inputs the value was computed from and
+    ``stale_key`` keeps a longer-lived copy for overload fallbacks. A value
+    derived from another cached one passes its ``base_key`` to be stored on
+    the same node.
+    """
+    body = json.dumps(value)
+    etag = make_etag(key, body)
+    ttl = ttl_seconds if ttl_seconds is not None else settings.cache_ttl_seconds
+    batch = _Batch()
+    client = _get_client(base_key or key)
+    if client:
+        pipe = batch.on(client)
+        pipe.setex(name=key, time=ttl, value=body)
+        pipe.setex(name=_etag_key(key), time=ttl, value=etag)
+        if fingerprint:
+            pipe.setex(name=_fingerprint_key(key), time=ttl, value=fingerprint)
+    _stage_stale(batch, stale_key, body, etag, raw=False)
+    # Stream notices go through the primary, which every worker subscribes to; listeners
+    # read the body from ``key`` only when they have subscribers, so it must be stored there
+    primary = _get_client() if topic and client else None
+    if primary:
+        batch.on(primary).publish(pubsub.CHANNEL, pubsub.encode(topic, etag, key))
+    failed = batch.execute()
+    if topic and (primary is None or id(primary) in failed or id(client) in failed):
+        pubsub.dispatch(topic, etag, body)
+    return etag
+
+
+def get_cached_raw(key: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """Pre-rendered payload bytes and ETag for non-JSON response formats."""
+    client = _get_raw_client(key)
+    if not client:
+        return None, None
+    try:
+        data, etag = client.mget([key, _etag_key(key)])
+    except redis.RedisError:
+        return None, None
+    if not data:
+        return None, None
+    if isinstance(etag, bytes):
+        etag = etag.decode()
+    return data, etag or make_etag(key, data)
+
+
+def set_cached_raw(
+    key: str,
+    body: bytes,
+    ttl_seconds: Optional[int] = None,
+    fingerprint: Optional[str] = None,
+    stale_key: Optional[str] = None,
+) -> str:
+    etag = make_etag(key, body)
     ttl = ttl_seconds if ttl_seconds is not None else settings.cache_ttl_seconds
-    client.setex(name=key, time=ttl, value=json.dumps(value))
+    batch = _Batch()
+    client = _get_raw_client(key)
+    if client:
+        pipe = batch.on(client)
+        pipe.setex(name=key, time=ttl, value=body)
+        pipe.setex(name=_etag_key(key), time=ttl, value=etag)
+        if fingerprint:
+            pipe.setex(name=_fingerprint_key(key), time=ttl, value=fingerprint)
+    _stage_stale(batch, stale_key, body, etag, raw=True)
+    batch.execute()
+    return etag
+
+
+def get_fingerprint(key: str) -> Optional[str]:
+    """Input fingerprint stored with a cached value by ``set_cached(..., fingerprint=...)``."""
+    client = _get_client(key)
+    if not client:
+        return None
+    try:
+        return client.get(_fingerprint_key(key))
+    except redis.RedisError:
+        return None
+
+
+def get_fingerprints(keys: Sequence[str]) -> List[Optional[str]]:
+    """``get_fingerprint`` for many keys: one MGET per cache node instead of a round trip per key."""
+    out: List[Optional[str]] = [None] * len(keys)
+    for client, positions in redis_conn.group_by_shard(keys):
+        try:
+            values = client.mget([_fingerprint_key(keys[i]) for i in positions])
+        except redis.RedisError:
+            continue
+        for i, value in zip(positions, values):
+            out[i] = value
+    return out
 
+
+def touch_cached(key: str, ttl_seconds: Optional[int] = None) -> bool:
+    """Extend the TTL of a cached value, its ETag and fingerprint; False if the value is gone."""
+    client = _get_client(key)
+    if not client:
+        return False
+    ttl = ttl_seconds if ttl_seconds is not None else settings.cache_ttl_seconds
+    pipe = client.pipeline()
+    for name in (key, _etag_key(key), _fingerprint_key(key)):
+        pipe.expire(name, ttl)
+    try:
+        return bool(pipe.execute()[0])
+    except redis.RedisError:
+        return False
@@ -1,11 +1,178 @@
-"""Optional site-specific calibration utilities (P1).
+"""Per-site calibration against inverter telemetry.
 
-P0 ships without calibration.
+Each site gets a two-coefficient correction of the modelled AC power,
+normalised by the nameplate ``pnom``::
+
+    u = P_model / pnom
+    P_cal = pnom * (gain * u + curvature * u**2)
+
+``gain`` absorbs the site's real system loss and cloud-scaling bias,
+``curvature`` the extra derating at high irradiance (heat, clipping).
+
+Coefficients are fitted by recursive least squares in information form:
+a profile keeps ``A = sum(w x x^T)`` and ``b = sum(w x y)`` with an
+exponential forgetting factor, so a telemetry batch is folded in with a few
+array additions and ``theta = A^-1 b`` is a batched 2x2 solve. All sites of
+a batch are updated together without revisiting older telemetry.
 """
 
 from __future__ import annotations
 
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.sqlite_db import connect
+
+
+# Weak prior towards the identity correction (gain 1, curvature 0), in full-power samples;
+# only decides directions the telemetry does not constrain yet
+PRIOR_WEIGHT = 0.1
+# Samples below this share of nameplate are ignored (night, dawn noise)
+MIN_PREDICTED_SHARE = 0.02
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calibration_profiles (
+    site TEXT PRIMARY KEY,
+    a11 REAL NOT NULL,
+    a12 REAL NOT NULL,
+    a22 REAL NOT NULL,
+    b1 REAL NOT NULL,
+    b2 REAL NOT NULL,
+    gain REAL NOT NULL,
+    curvature REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    updated INTEGER NOT NULL
+)
+"""
+
+
+@dataclass
+class Profile:
+    gain: float = 1.0
+    curvature: float = 0.0
+    samples: int = 0
+
+
+def enabled() -> bool:
+    return bool(settings.calibration_db_path)
+
+
+def _conn() -> sqlite3.Connection:
+    return connect(settings.calibration_db_path, _SCHEMA)
+
+
+def _prior(n: int) -> tuple[np.ndarray, np.ndarray]:
+    a = np.zeros((n, 2, 2))
+    a[:, 0, 0] = a[:, 1, 1] = PRIOR_WEIGHT
+    b = np.zeros((n, 2))
+    b[:, 0] = PRIOR_WEIGHT
+    return a, b
+
+
+def _load_state(sites: Sequence[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    a, b = _prior(len(sites))
+    samples = np.zeros(len(sites), dtype=np.int64)
+    pos = {s: i for i, s in enumerate(sites)}
+    conn = _conn()
+    # Chunked IN lists stay below SQLite's host-parameter limit
+    for i in range(0, len(sites), 500):
+        chunk = list(sites[i : i + 500])
+        rows = conn.execute(
+            "SELECT site, a11, a12, a22, b1, b2, samples FROM calibration_profiles"
+            f" WHERE site IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall()
+        for site, a11, a12, a22, b1, b2, n in rows:
+            j = pos[site]
+            a[j] = ((a11, a12), (a12, a22))
+            b[j] = (b1, b2)
+            samples[j] = n
+    return a, b, samples
+
+
+def ingest(
+    site_ids: Sequence[str],
+    predicted: np.ndarray,
+    measured: np.ndarray,
+    pnom: np.ndarray,
+    forgetting: Optional[float] = None,
+) -> Dict[str, Profile]:
+    """Fold one telemetry batch (flat, any site order) into the stored profiles.
+
+    ``predicted`` and ``measured`` are AC watts at the same timestamps, ``pnom``
+    the nameplate watts of each sample's site. Returns the updated profiles of
+    the sites present in the batch.
+    """
+    lam = settings.calibration_forgetting if forgetting is None else forgetting
+    site_ids = np.asarray(site_ids, dtype=object)
+    predicted = np.asarray(predicted, dtype=float)
+    measured = np.asarray(measured, dtype=float)
+    pnom = np.asarray(pnom, dtype=float)
+
+    ok = np.isfinite(predicted) & np.isfinite(measured) & (pnom > 0) & (predicted > MIN_PREDICTED_SHARE * pnom)
+    site_ids, predicted, measured, pnom = site_ids[ok], predicted[ok], measured[ok], pnom[ok]
+    if not len(site_ids):
+        return {}
+
+    sites, inverse, counts = np.unique(site_ids, return_inverse=True, return_counts=True)
+    conn = _conn()
+    with conn:
+        # Read-modify-write under the write lock, so concurrent uploads for a site do not lose an update
+        conn.execute("BEGIN IMMEDIATE")
+        a, b, samples = _load_state(sites)
+
+        # Forgetting: older state decays by lam**count; within the batch later samples weigh more
+        order = np.argsort(inverse, kind="stable")
+        rank = np.empty(len(inverse), dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        rank[order] = np.arange(len(inverse)) - np.repeat(starts, counts)
+        w = lam ** (counts[inverse] - 1 - rank)
+        decay = lam ** counts
+        a *= decay[:, None, None]
+        b *= decay[:, None]
+
+        u = predicted / pnom
+        x = np.stack([u, u * u], axis=1)
+        y = measured / pnom
+        np.add.at(a, inverse, w[:, None, None] * x[:, :, None] * x[:, None, :])
+        np.add.at(b, inverse, (w * y)[:, None] * x)
+        theta = np.linalg.solve(a, b[:, :, None])[:, :, 0]
+        samples += counts
+
+        now = int(time.time())
+        rows = np.column_stack([a[:, 0, 0], a[:, 0, 1], a[:, 1, 1], b, theta]).tolist()
+        conn.executemany(
+            "INSERT OR REPLACE INTO calibration_profiles"
+            " (site, a11, a12, a22, b1, b2, gain, curvature, samples, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(s, *row, int(n), now) for s, row, n in zip(sites, rows, samples)],
+        )
+    return {
+        s: Profile(gain=float(theta[i, 0]), curvature=float(theta[i, 1]), samples=int(samples[i]))
+        for i, s in enumerate(sites)
+    }
+
+
+def get_profile(site_id: str) -> Optional[Profile]:
+    if not enabled():
+        return None
+    try:
+        row = _conn().execute(
+            "SELECT gain, curvature, samples FROM calibration_profiles WHERE site = ?", (site_id,)
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    return Profile(*row) if row else None
 
-def apply_calibration(ac_series):  # pragma: no cover - P1 stub
-    return ac_series
 
+def apply_calibration(ac: np.ndarray, profile: Optional[Profile], pnom: float) -> np.ndarray:
+    """Calibrated AC power for a modelled AC array (any shape); night stays zero."""
+    if profile is None or pnom <= 0:
+        return ac
+    u = ac / pnom
+    return np.clip(pnom * (profile.gain * u + profile.curvature * u * u), 0.0, pnom)
@@ -1,16 +1,39 @@
 from __future__ import annotations
 
-from typing import Dict
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 import pvlib
 
 from app.core.config import settings
-from app.models.site import Site
-from app.util.timeindex import time_index
+from app.models.site import Plane, Site
+from app.models.spec import ForecastSpec
+from app.services import calibration, weather_prefetch
+from app.services.cache import make_site_id
+from app.services.geometry import Geometry
+from app.services.geometry_store import shared_geometry
+from app.services.irradiance_tiles import tile_geometry
+from app.services.power_kernel import ac_power
+from app.util.timeindex import horizon_dates, parse_resolution, slice_dates, time_index
 from app.util.units import clamp
-from app.services.weather_open_meteo import fetch_open_meteo, cmf_factor_from_weather
+from app.services.weather_open_meteo import (
+    cmf_factor_for_index,
+    cmf_factor_from_weather,
+    ensemble_factors,
+    fetch_open_meteo,
+    fetch_open_meteo_ensemble,
+    weather_cmf,
+)
+
+
+QUANTILES = (10, 50, 90)
+# Transposition and the power model only run where the true solar zenith is below this.
+# Clear-sky irradiance is already exactly zero from about 90.8 deg (refraction ends there),
+# so the band above 90 deg evaluates sunrise/sunset in full and the cut-off never shifts output.
+DAYLIGHT_ZENITH_DEG = 92.0
 
 
 def _validate_inputs(site: Site) -> None:
@@ -24,103 +47,144 @@ def _validate_inputs(site: Site) -> None:
         raise ValueError("kwp must be (0,1000]")
 
 
-def _build_index(resolution: str) -> pd.DatetimeIndex:
-    return time_index(settings.timezone, settings.max_horizon_days, resolution)
+def _validate_planes(site: Site) -> None:
+    planes = site.planes()
+    if len(planes) > settings.max_planes:
+        raise ValueError(f"at most {settings.max_planes} planes are supported")
+    if sum(p.kwp for p in planes) > 1000:
+        raise ValueError("total kwp of all planes must be <= 1000")
 
 
-def _compute_clearsky(site: Site, index: pd.DatetimeIndex) -> pd.DataFrame:
-    location = pvlib.location.Location(site.lat, site.lon, tz=settings.timezone)
-    cs = location.get_clearsky(index, model="ineichen")  # ghi, dni, dhi
+def _weather_factor(
+    site: Site, idx: pd.DatetimeIndex, cs_ghi: pd.Series, start_date: str, end_date: str
+) -> Optional[np.ndarray]:
+    # CMF arrays are precomputed per weather payload; the request only slices them
+    tz = settings.timezone
+    weather_prefetch.track(site.lat, site.lon, tz, start_date, end_date, settings.weather_alpha)
+    arrays = weather_cmf(site.lat, site.lon, tz, start_date, end_date, settings.weather_alpha)
+    if arrays is None:
+        return None
+    factor = cmf_factor_for_index(arrays, tz, start_date, idx, parse_resolution(site.resolution))
+    if factor is None:
+        # Index not on the canonical grid (e.g. unusual tz offsets): align per request
+        weather = fetch_open_meteo(site.lat, site.lon, tz, start_date, end_date)
+        series = cmf_factor_from_weather(idx, tz, cs_ghi, weather, settings.weather_alpha)
+        return None if series is None else series.to_numpy()
+    return factor
 
-    solar_pos = pvlib.solarposition.get_solarposition(index, site.lat, site.lon)
 
-    poa = pvlib.irradiance.get_total_irradiance(
-        surface_tilt=site.tilt,
-        surface_azimuth=site.to_pvlib_azimuth(),
-        dni=cs["dni"],
-        ghi=cs["ghi"],
-        dhi=cs["dhi"],
-        solar_zenith=solar_pos["zenith"],
-        solar_azimuth=solar_pos["azimuth"],
-        model="haydavies",
-        albedo=0.2,
-    )
+def _build_index(resolution: str) -> pd.DatetimeIndex:
+    return time_index(settings.timezone, settings.max_horizon_days, resolution)
 
-    # Ambient fallback assumptions
-    temp_air = pd.Series(20.0, index=index)
-    wind_speed = pd.Series(1.0, index=index)
-
-    temp_cell = pvlib.temperature.sapm_cell(
-        poa_global=poa["poa_global"],
-        temp_air=temp_air,
-        wind_speed=wind_speed,
-        a=-3.56,  # SAPM NOCT-like coefficients
-        b=-0.075,
-        deltaT=3,
-    )
 
-    # PVWatts-like DC power model (simple)
-    pdc0 = site.kwp * 1000.0
-    gamma_pdc = -0.004  # per deg C
-    poa_kw = poa["poa_global"].clip(lower=0) / 1000.0
-    pdc = pdc0 * poa_kw * (1 + gamma_pdc * (temp_cell - 25.0))
-    pdc = pdc.clip(lower=0)
+def _geometry(site: Site, index: pd.DatetimeIndex) -> Geometry:
+    # Nearby sites share one clear-sky/geometry computation per tile when tiling is on
+    if settings.irradiance_tile_deg > 0:
+        return tile_geometry(site.lat, site.lon, index)
+    return shared_geometry(site.lat, site.lon, index)
 
-    # System losses and clipping at nameplate
-    ac = pdc * (1.0 - settings.system_loss)
-    ac = ac.clip(lower=0, upper=pdc0)
 
-    df = pd.DataFrame({"ac": ac})
-    return df
+def _compute_clearsky(site: Site, index: pd.DatetimeIndex, geom: Optional[Geometry] = None) -> pd.DataFrame:
+    geom = geom if geom is not None else _geometry(site, index)
+    return _compute_with_irradiance(site, index, geom, geom.dni, geom.ghi, geom.dhi)
 
 
 def _compute_with_irradiance(
     site: Site,
     index: pd.DatetimeIndex,
-    dni: pd.Series,
-    ghi: pd.Series,
-    dhi: pd.Series,
+    geom: Geometry,
+    dni: np.ndarray,
+    ghi: np.ndarray,
+    dhi: np.ndarray,
 ) -> pd.DataFrame:
-    solar_pos = pvlib.solarposition.get_solarposition(index, site.lat, site.lon)
+    # Geometry is shared by all planes; only transposition and power run per plane
+    ac = _planes_ac(
+        site.planes(),
+        solar_zenith=geom.zenith,
+        solar_azimuth=geom.azimuth,
+        dni=np.asarray(dni, dtype=float),
+        ghi=np.asarray(ghi, dtype=float),
+        dhi=np.asarray(dhi, dtype=float),
+        dni_extra=geom.dni_extra,
+    )
+    df = pd.DataFrame({"ac": ac.sum(axis=0)}, index=index)
+    if len(site.extra_planes):
+        for i, row in enumerate(ac):
+            df[f"ac_{i}"] = row
+    return df
+
+
+def _planes_ac(
+    planes: List[Plane],
+    *,
+    solar_zenith: np.ndarray,
+    solar_azimuth: np.ndarray,
+    dni: np.ndarray,
+    ghi: np.ndarray,
+    dhi: np.ndarray,
+    dni_extra: np.ndarray,
+) -> np.ndarray:
+    """AC power [W] as a (planes x time) array.
+
+    Irradiance may carry leading axes, e.g. (members x time) for ensembles;
+    the result is then (planes x members x time). Night samples are zero
+    without being evaluated.
+    """
+    day = np.asarray(solar_zenith) < DAYLIGHT_ZENITH_DEG
+    if day.all():
+        return _planes_ac_day(planes, solar_zenith, solar_azimuth, dni, ghi, dhi, dni_extra)
+    out = np.zeros((len(planes),) + np.shape(dni), dtype=np.float64)
+    if day.any():
+        out[..., day] = _planes_ac_day(
+            planes,
+            solar_zenith[day],
+            solar_azimuth[day],
+            dni[..., day],
+            ghi[..., day],
+            dhi[..., day],
+            dni_extra[day],
+        )
+    return out
+
+
+def _planes_ac_day(
+    planes: List[Plane],
+    solar_zenith: np.ndarray,
+    solar_azimuth: np.ndarray,
+    dni: np.ndarray,
+    ghi: np.ndarray,
+    dhi: np.ndarray,
+    dni_extra: np.ndarray,
+) -> np.ndarray:
+    shape = (len(planes),) + (1,) * np.ndim(dni)
+    tilt = np.array([p.tilt for p in planes], dtype=float).reshape(shape)
+    azimuth = np.array([p.to_pvlib_azimuth() for p in planes], dtype=float).reshape(shape)
+    pdc0 = np.array([p.kwp * 1000.0 for p in planes], dtype=float).reshape(shape)
+
     poa = pvlib.irradiance.get_total_irradiance(
-        surface_tilt=site.tilt,
-        surface_azimuth=site.to_pvlib_azimuth(),
+        surface_tilt=tilt,
+        surface_azimuth=azimuth,
         dni=dni,
         ghi=ghi,
         dhi=dhi,
-        solar_zenith=solar_pos["zenith"],
-        solar_azimuth=solar_pos["azimuth"],
+        solar_zenith=solar_zenith,
+        solar_azimuth=solar_azimuth,
+        dni_extra=dni_extra,
         model="haydavies",
         albedo=0.2,
     )
+    poa_global = np.broadcast_to(poa["poa_global"], (len(planes),) + np.shape(dni))
+    return ac_power(poa_global, pdc0, settings.system_loss)
 
-    temp_air = pd.Series(20.0, index=index)
-    wind_speed = pd.Series(1.0, index=index)
 
-    temp_cell = pvlib.temperature.sapm_cell(
-        poa_global=poa["poa_global"],
-        temp_air=temp_air,
-        wind_speed=wind_speed,
-        a=-3.56,
-        b=-0.075,
-        deltaT=3,
-    )
-    pdc0 = site.kwp * 1000.0
-    gamma_pdc = -0.004
-    poa_kw = poa["poa_global"].clip(lower=0) / 1000.0
-    pdc = pdc0 * poa_kw * (1 + gamma_pdc * (temp_cell - 25.0))
-    pdc = pdc.clip(lower=0)
-    ac = (pdc * (1.0 - settings.system_loss)).clip(lower=0, upper=pdc0)
-    return pd.DataFrame({"ac": ac})
-
-
-def _serialize_timeseries(series: pd.Series) -> Dict[str, float]:
-    # Format as "YYYY-MM-DD HH:MM:SS" keys in local tz
-    out: Dict[str, float] = {}
-    for ts, val in series.items():
-        key = ts.strftime("%Y-%m-%d %H:%M:%S")
-        out[key] = float(round(val, 3))
-    return out
+def _serialize_timeseries(keys: Sequence[str], values: np.ndarray) -> Dict[str, float]:
+    # keys are "YYYY-MM-DD HH:MM:SS" local timestamps (or "YYYY-MM-DD" days)
+    return dict(zip(keys, round_values(values)))
+
+
+def round_values(values: np.ndarray) -> List[float]:
+    # Python's correctly-rounded round(), not np.round, to keep payload values stable
+    return [round(v, 3) for v in values.tolist()]
 
 
 def _energy_wh(ac_w: pd.Series) -> pd.Series:
@@ -144,7 +208,103 @@ def _daily_wh(ac_w: pd.Series) -> pd.Series:
     return daily
 
 
-def compute_forecast(
+def _daily_wh_rows(values: np.ndarray, index: pd.DatetimeIndex) -> np.ndarray:
+    """Daily Wh for each row of a (rows x time) power array; days as in ``_daily_wh``."""
+    if len(index) < 2:
+        return np.zeros((len(values), 0))
+    deltas = index.to_series().diff().dt.total_seconds().fillna(0).to_numpy() / 3600.0
+    codes, days = pd.factorize(index.strftime("%Y-%m-%d"), sort=True)
+    out = np.zeros((len(days), len(values)))
+    np.add.at(out, codes, (np.nan_to_num(values) * deltas).T)
+    return out.T
+
+
+def _ensemble_bands(
+    site: Site,
+    index: pd.DatetimeIndex,
+    geom: Geometry,
+    start_date: str,
+    end_date: str,
+    profile: Optional[calibration.Profile] = None,
+) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]]:
+    """Quantiles of watts and daily Wh across ensemble members, or None without ensemble data.
+
+    With a calibration ``profile`` every member is calibrated before the
+    quantiles are taken, like the deterministic forecast they bracket.
+    """
+    weather = fetch_open_meteo_ensemble(site.lat, site.lon, settings.timezone, start_date, end_date)
+    factors = ensemble_factors(index, weather, settings.weather_alpha)
+    if factors is None:
+        return None
+    # One (planes x members x time) pass; geometry and clear-sky are shared with the main forecast
+    ac = _planes_ac(
+        site.planes(),
+        solar_zenith=geom.zenith,
+        solar_azimuth=geom.azimuth,
+        dni=np.clip(geom.dni * factors, 0.0, None),
+        ghi=np.clip(geom.ghi * factors, 0.0, None),
+        dhi=np.clip(geom.dhi * factors, 0.0, None),
+        dni_extra=geom.dni_extra,
+    ).sum(axis=0)
+    ac = calibration.apply_calibration(ac, profile, _pnom(site))
+    watts = np.percentile(ac, QUANTILES, axis=0)
+    # Daily bands are quantiles of each member's daily total, not sums of hourly quantiles
+    daily = np.percentile(_daily_wh_rows(ac, index), QUANTILES, axis=0)
+    names = [f"p{q}" for q in QUANTILES]
+    return dict(zip(names, watts)), dict(zip(names, daily))
+
+
+def _pnom(site: Site) -> float:
+    return sum(p.kwp for p in site.planes()) * 1000.0
+
+
+def _calibration_profile(site: Site) -> Optional[calibration.Profile]:
+    """The site's telemetry profile, or None when calibration is off or the site has none."""
+    if not calibration.enabled():
+        return None
+    site_id = make_site_id(
+        lat=site.lat,
+        lon=site.lon,
+        tilt=site.tilt,
+        azimuth=site.azimuth_conv,
+        kwp=site.kwp,
+        planes=[(p.tilt, p.azimuth_conv, p.kwp) for p in site.extra_planes],
+    )
+    return calibration.get_profile(site_id)
+
+
+def _calibrate(site: Site, df: pd.DataFrame, profile: Optional[calibration.Profile]) -> None:
+    """Apply a telemetry profile to the summed AC power in place."""
+    if profile is None:
+        return
+    ac = df["ac"].to_numpy()
+    cal = calibration.apply_calibration(ac, profile, _pnom(site))
+    # Per-plane columns keep their share of the calibrated total
+    scale = np.divide(cal, ac, out=np.zeros_like(ac), where=ac > 0)
+    for col in df.columns.drop("ac"):
+        df[col] = df[col].to_numpy() * scale
+    df["ac"] = cal
+
+
+@dataclass
+class ForecastArrays:
+    """Engine output as plain arrays; response formats are rendered from this."""
+
+    index: pd.DatetimeIndex
+    watts: np.ndarray
+    watt_hours: np.ndarray
+    days: List[str]
+    watt_hours_day: np.ndarray
+    planes: List[Plane] = field(default_factory=list)
+    plane_watts: Optional[np.ndarray] = None  # (planes x time), only with per_plane
+    # quantile name ("p10", ...) -> watts / daily Wh, only with ensemble bands
+    watts_bands: Optional[Dict[str, np.ndarray]] = None
+    watt_hours_day_bands: Optional[Dict[str, np.ndarray]] = None
+    # True when a calibration profile was applied
+    calibrated: bool = False
+
+
+def forecast_arrays(
     *,
     lat: float,
     lon: float,
@@ -153,7 +313,13 @@ def compute_forecast(
     kwp: float,
     resolution: str,
     source: str = "clearsky",
-) -> Dict[str, Dict[str, float]]:
+    planes: Optional[Sequence[Tuple[float, float, float]]] = None,
+    per_plane: bool = False,
+    calibrate: bool = False,
+    quantiles: bool = False,
+    dates: Optional[Tuple[str, str]] = None,
+) -> ForecastArrays:
+    """Forecast arrays for one site; ``dates`` limits the computation to those local days."""
     site = Site(
         lat=lat,
         lon=lon,
@@ -161,39 +327,226 @@ def compute_forecast(
         azimuth_conv=azimuth_convention,
         kwp=kwp,
         resolution=resolution or settings.default_resolution,
+        extra_planes=[Plane(tilt=t, azimuth_conv=a, kwp=k) for t, a, k in planes or ()],
     )
     _validate_inputs(site)
-    idx = _build_index(site.resolution)
+    _validate_planes(site)
+    full_idx = _build_index(site.resolution)
+    idx = slice_dates(full_idx, dates)
+    # Weather is fetched (and prefetched) for the whole horizon and only sliced here
+    start_date = full_idx[0].strftime("%Y-%m-%d")
+    end_date = full_idx[-1].strftime("%Y-%m-%d")
 
     if source not in ("clearsky", "open-meteo"):
         raise ValueError("Unsupported source. Use 'clearsky' or 'open-meteo'.")
 
+    bands = None
+    profile = _calibration_profile(site) if calibrate else None
     if source == "clearsky" or not settings.weather_enabled:
         df = _compute_clearsky(site, idx)
     else:
         # Weather-aware: fetch weather and compute CMF scaling on clearsky irradiance
-        location = pvlib.location.Location(site.lat, site.lon, tz=settings.timezone)
-        cs = location.get_clearsky(idx, model="ineichen")
-        # Open-Meteo prefers date strings
-        start_date = idx[0].strftime("%Y-%m-%d")
-        end_date = idx[-1].strftime("%Y-%m-%d")
-        weather = fetch_open_meteo(site.lat, site.lon, settings.timezone, start_date, end_date)
-        factor = cmf_factor_from_weather(idx, settings.timezone, cs["ghi"], weather, settings.weather_alpha)
+        geom = _geometry(site, idx)
+        factor = _weather_factor(site, idx, pd.Series(geom.ghi, index=idx), start_date, end_date)
         if factor is None:
-            df = _compute_clearsky(site, idx)
+            df = _compute_clearsky(site, idx, geom)
         else:
-            scaled = {
-                "dni": (cs["dni"] * factor).clip(lower=0.0),
-                "ghi": (cs["ghi"] * factor).clip(lower=0.0),
-                "dhi": (cs["dhi"] * factor).clip(lower=0.0),
-            }
-            df = _compute_with_irradiance(site, idx, scaled["dni"], scaled["ghi"], scaled["dhi"])
+            df = _compute_with_irradiance(
+                site,
+                idx,
+                geom,
+                np.clip(geom.dni * factor, 0.0, None),
+                np.clip(geom.ghi * factor, 0.0, None),
+                np.clip(geom.dhi * factor, 0.0, None),
+            )
+        if quantiles:
+            bands = _ensemble_bands(site, idx, geom, start_date, end_date, profile)
+    _calibrate(site, df, profile)
     watts = df["ac"].round(3)
-    wh_cum = _energy_wh(watts)
     wh_day = _daily_wh(watts)
 
-    return {
-        "watts": _serialize_timeseries(watts),
-        "watt_hours": _serialize_timeseries(wh_cum),
-        "watt_hours_day": {k: float(round(v, 3)) for k, v in wh_day.items()},
+    plane_watts = None
+    if per_plane:
+        cols = [f"ac_{i}" if f"ac_{i}" in df.columns else "ac" for i in range(len(site.planes()))]
+        plane_watts = df[cols].round(3).to_numpy().T
+    return ForecastArrays(
+        index=idx,
+        watts=watts.to_numpy(),
+        watt_hours=_energy_wh(watts).to_numpy(),
+        days=list(wh_day.index),
+        watt_hours_day=wh_day.to_numpy(),
+        planes=site.planes(),
+        plane_watts=plane_watts,
+        watts_bands=bands[0] if bands else None,
+        watt_hours_day_bands=bands[1] if bands else None,
+        calibrated=profile is not None,
+    )
+
+
+def to_payload(arrays: ForecastArrays) -> Dict[str, Dict[str, float]]:
+    """Forecast.Solar-shaped result keyed by local timestamp strings."""
+    keys = arrays.index.strftime("%Y-%m-%d %H:%M:%S")
+    out = {
+        "watts": _serialize_timeseries(keys, arrays.watts),
+        "watt_hours": _serialize_timeseries(keys, arrays.watt_hours),
+        "watt_hours_day": _serialize_timeseries(arrays.days, arrays.watt_hours_day),
     }
+    if arrays.plane_watts is not None:
+        out["planes"] = [
+            {
+                "declination": plane.tilt,
+                "azimuth": plane.azimuth_conv,
+                "kwp": plane.kwp,
+                "watts": _serialize_timeseries(keys, row),
+                "watt_hours_day": _serialize_timeseries(
+                    arrays.days, _daily_wh(pd.Series(row, index=arrays.index)).to_numpy()
+                ),
+            }
+            for plane, row in zip(arrays.planes, arrays.plane_watts)
+        ]
+    for name, values in (arrays.watts_bands or {}).items():
+        out[f"watts_{name}"] = _serialize_timeseries(keys, values)
+    for name, values in (arrays.watt_hours_day_bands or {}).items():
+        out[f"watt_hours_day_{name}"] = _serialize_timeseries(arrays.days, values)
+    return out
+
+
+def compute_forecast(
+    *,
+    lat: float,
+    lon: float,
+    tilt: float,
+    azimuth_convention: float,
+    kwp: float,
+    resolution: str,
+    source: str = "clearsky",
+    planes: Optional[Sequence[Tuple[float, float, float]]] = None,
+    per_plane: bool = False,
+) -> Dict[str, Dict[str, float]]:
+    """Forecast for one site; ``planes`` adds further (tilt, azimuth, kwp) planes
+    at the same location whose output is summed into the result."""
+    arrays = forecast_arrays(
+        lat=lat,
+        lon=lon,
+        tilt=tilt,
+        azimuth_convention=azimuth_convention,
+        kwp=kwp,
+        resolution=resolution,
+        source=source,
+        planes=planes,
+        per_plane=per_plane,
+    )
+    return to_payload(arrays)
+
+
+def spec_dates(spec: ForecastSpec) -> Optional[Tuple[str, str]]:
+    """Local dates selected by the spec's partial-horizon fields, None for the full horizon."""
+    return horizon_dates(settings.timezone, settings.max_horizon_days, spec.days, spec.start_date, spec.end_date)
+
+
+def spec_fingerprint(spec: ForecastSpec) -> str:
+    """Digest of the inputs a spec's forecast is built from, beyond the spec itself.
+
+    Covers the time window, the weather CMF (and ensemble) data and the
+    calibration profile the forecast would use right now. Equal fingerprints
+    mean a recomputation would give the same result.
+    """
+    full_idx = _build_index(spec.resolution)
+    idx = slice_dates(full_idx, spec_dates(spec))
+    h = hashlib.sha256(f"{idx[0].isoformat()}|{idx[-1].isoformat()}|{len(idx)}".encode())
+    if spec.source == "open-meteo" and settings.weather_enabled:
+        tz = settings.timezone
+        start_date, end_date = full_idx[0].strftime("%Y-%m-%d"), full_idx[-1].strftime("%Y-%m-%d")
+        arrays = weather_cmf(spec.lat, spec.lon, tz, start_date, end_date, settings.weather_alpha)
+        cmf = None if arrays is None else arrays.get(parse_resolution(spec.resolution))
+        h.update(b"|cmf:" + (b"-" if cmf is None else cmf.tobytes()))
+        if spec.quantiles:
+            ens = fetch_open_meteo_ensemble(spec.lat, spec.lon, tz, start_date, end_date)
+            h.update(b"|ens:" + (b"-" if ens is None else ens.to_numpy(dtype=float).tobytes()))
+    if spec.endpoint == "estimate" and calibration.enabled():
+        site_id = make_site_id(
+            lat=spec.lat, lon=spec.lon, tilt=spec.tilt, azimuth=spec.azimuth, kwp=spec.kwp, planes=spec.planes
+        )
+        profile = calibration.get_profile(site_id)
+        h.update(f"|cal:{profile}".encode())
+    return h.hexdigest()[:32]
+
+
+def _range_first_day_wh(watts: Dict[str, float]) -> Optional[float]:
+    """Wh of the first day of a sliced ``watts`` series, as a direct computation of the range gives it.
+
+    A range's first sample integrates nothing (there is no earlier sample),
+    while in the full forecast it carries the step before it. That matters
+    whenever power is non-zero at midnight (polar day).
+    """
+    keys = list(watts)
+    if len(keys) < 2:
+        return None
+    day = keys[0][:10]
+    keys = [k for k in keys if k[:10] == day]
+    index = pd.DatetimeIndex(keys).tz_localize(settings.timezone, ambiguous="infer", nonexistent="shift_forward")
+    daily = _daily_wh(pd.Series([watts[k] for k in keys], index=index, dtype=float))
+    return round(float(daily.iloc[0]), 3) if len(daily) else None
+
+
+def slice_payload(result: Dict[str, object], dates: Tuple[str, str]) -> Dict[str, object]:
+    """Cut a full-horizon payload down to the local dates ``dates``.
+
+    Equal to computing the range directly: values are per timestamp or per
+    day, the first day's totals are recomputed from the sliced samples when
+    the range starts after the forecast does, and ``watt_hours`` is re-based
+    to start at zero like a fresh range. Daily quantile bands cannot be
+    rebuilt from sliced quantiles and are only cut.
+    """
+    first, last = dates
+
+    def cut(series: Dict[str, float]) -> Dict[str, float]:
+        return {k: v for k, v in series.items() if first <= k[:10] <= last}
+
+    # Samples before the range contribute to its first day's total in the full forecast
+    starts_later = next(iter(result.get("watts") or {}), "")[:10] < first
+
+    def daily(series: Dict[str, float], watts: Dict[str, float]) -> Dict[str, float]:
+        days = cut(series)
+        total = _range_first_day_wh(watts) if starts_later and days else None
+        if total is not None:
+            days[next(iter(days))] = total
+        return days
+
+    out: Dict[str, object] = {}
+    for name, series in result.items():
+        if name == "planes":
+            out[name] = []
+            for p in series:
+                watts = cut(p["watts"])
+                out[name].append({**p, "watts": watts, "watt_hours_day": daily(p["watt_hours_day"], watts)})
+        elif name == "watt_hours_day":
+            out[name] = daily(series, cut(result["watts"]))
+        else:
+            out[name] = cut(series)
+    wh = out.get("watt_hours")
+    if wh:
+        base = next(iter(wh.values()))
+        out["watt_hours"] = {k: round(v - base, 3) for k, v in wh.items()}
+    return out
+
+
+def spec_arrays(spec: ForecastSpec) -> ForecastArrays:
+    return forecast_arrays(
+        lat=spec.lat,
+        lon=spec.lon,
+        tilt=spec.tilt,
+        azimuth_convention=spec.azimuth,
+        kwp=spec.kwp,
+        resolution=spec.resolution,
+        source=spec.source,
+        planes=spec.planes,
+        per_plane=spec.per_plane,
+        calibrate=spec.endpoint == "estimate",
+        quantiles=spec.quantiles,
+        dates=spec_dates(spec),
+    )
+
+
+def compute_spec(spec: ForecastSpec) -> Dict[str, Dict[str, float]]:
+    return to_payload(spec_arrays(spec))
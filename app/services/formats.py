@@ -0,0 +1,86 @@
+"""Compact response formats rendered straight from engine arrays.
+
+The default Forecast.Solar shape repeats a timestamp key per value; these
+formats carry the time axis once (`start` + `step`) and plain float arrays.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+from typing import Any, Dict, Optional
+
+import msgpack
+
+from app.services.forecast_engine import ForecastArrays, round_values
+
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.solarforecast.columnar+json",
+    "csv": "text/csv",
+    "msgpack": "application/msgpack",
+}
+
+_ACCEPT_ALIASES = {
+    "application/vnd.solarforecast.columnar+json": "columnar",
+    "text/csv": "csv",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+
+
+def negotiate_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    """Pick the response format: explicit `?format=` wins, then the Accept header."""
+    if fmt:
+        return fmt
+    for part in (accept or "").split(","):
+        media = part.split(";")[0].strip().lower()
+        if media in _ACCEPT_ALIASES:
+            return _ACCEPT_ALIASES[media]
+    return "json"
+
+
+def columnar(arrays: ForecastArrays) -> Dict[str, Any]:
+    index = arrays.index
+    step = int((index[1] - index[0]).total_seconds()) if len(index) > 1 else 0
+    out: Dict[str, Any] = {
+        "start": index[0].isoformat() if len(index) else None,
+        "step": step,
+        "watts": round_values(arrays.watts),
+        "watt_hours": round_values(arrays.watt_hours),
+        "days": list(arrays.days),
+        "watt_hours_day": round_values(arrays.watt_hours_day),
+    }
+    if arrays.plane_watts is not None:
+        out["planes"] = [
+            {"declination": p.tilt, "azimuth": p.azimuth_conv, "kwp": p.kwp, "watts": round_values(row)}
+            for p, row in zip(arrays.planes, arrays.plane_watts)
+        ]
+    for name, values in (arrays.watts_bands or {}).items():
+        out[f"watts_{name}"] = round_values(values)
+    for name, values in (arrays.watt_hours_day_bands or {}).items():
+        out[f"watt_hours_day_{name}"] = round_values(values)
+    return out
+
+
+def to_csv(arrays: ForecastArrays) -> str:
+    bands = arrays.watts_bands or {}
+    buf = io.StringIO()
+    buf.write(",".join(["timestamp", "watts", "watt_hours", *(f"watts_{n}" for n in bands)]) + "\n")
+    stamps = arrays.index.strftime("%Y-%m-%dT%H:%M:%S%z")
+    columns = [round_values(arrays.watts), round_values(arrays.watt_hours), *map(round_values, bands.values())]
+    line = "%s" + ",%r" * len(columns) + "\n"
+    for row in zip(stamps, *columns):
+        buf.write(line % row)
+    return buf.getvalue()
+
+
+def render(arrays: ForecastArrays, fmt: str) -> bytes:
+    if fmt == "columnar":
+        return json.dumps(columnar(arrays), separators=(",", ":")).encode()
+    if fmt == "csv":
+        return to_csv(arrays).encode()
+    if fmt == "msgpack":
+        return msgpack.packb(columnar(arrays))
+    raise ValueError(f"Unsupported format '{fmt}'")
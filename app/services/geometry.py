@@ -0,0 +1,81 @@
+"""Per-location solar geometry and clear-sky irradiance for a time index.
+
+Everything here depends only on the location and the index, not on the
+planes, so it is computed once per request (or shared via the tile cache)
+and fed to transposition and the power kernel.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pvlib
+
+from app.core.config import settings
+from app.services.solar_position import solar_position
+
+
+FIELDS = ("zenith", "azimuth", "ghi", "dni", "dhi", "dni_extra")
+
+
+@dataclass
+class Geometry:
+    zenith: np.ndarray
+    azimuth: np.ndarray
+    ghi: np.ndarray
+    dni: np.ndarray
+    dhi: np.ndarray
+    dni_extra: np.ndarray
+
+    def to_bytes(self) -> bytes:
+        return np.stack([getattr(self, f) for f in FIELDS]).astype(np.float64).tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "Geometry":
+        rows = np.frombuffer(blob, dtype=np.float64).reshape(len(FIELDS), -1)
+        return cls(**dict(zip(FIELDS, rows)))
+
+    def as_dict(self) -> Dict[str, np.ndarray]:
+        return {f: getattr(self, f) for f in FIELDS}
+
+    def slice(self, offset: int, n: int) -> "Geometry":
+        return Geometry(**{f: getattr(self, f)[offset : offset + n] for f in FIELDS})
+
+
+def day_window(index: pd.DatetimeIndex) -> Optional[Tuple[pd.DatetimeIndex, int]]:
+    """Whole local days around ``index`` at its cadence, and the offset of ``index`` in them.
+
+    Caches key entries on these days so every window inside them (a later
+    "now", a partial-horizon request) is a slice of one entry. None for an
+    index that is not on that grid.
+    """
+    if len(index) < 2:
+        return None
+    step = index[1] - index[0]
+    full = pd.date_range(
+        index[0].normalize(), index[-1].normalize() + pd.Timedelta(days=1), freq=step, inclusive="left"
+    )
+    offset, rem = divmod((index[0] - full[0]) // pd.Timedelta(seconds=1), step // pd.Timedelta(seconds=1))
+    if rem or offset + len(index) > len(full) or full[offset + len(index) - 1] != index[-1]:
+        return None
+    return full, offset
+
+
+def site_geometry(lat: float, lon: float, index: pd.DatetimeIndex) -> Geometry:
+    location = pvlib.location.Location(lat, lon, tz=settings.timezone)
+    # One solar-position pass with the selected backend, shared with the clear-sky model
+    pressure = pvlib.atmosphere.alt2pres(location.altitude)
+    solar_pos = solar_position(index, lat, lon, pressure=pressure)
+    dni_extra = pvlib.irradiance.get_extra_radiation(index)
+    cs = location.get_clearsky(index, model="ineichen", solar_position=solar_pos, dni_extra=dni_extra)
+    return Geometry(
+        zenith=solar_pos["zenith"].to_numpy(dtype=float),
+        azimuth=solar_pos["azimuth"].to_numpy(dtype=float),
+        ghi=cs["ghi"].to_numpy(dtype=float),
+        dni=cs["dni"].to_numpy(dtype=float),
+        dhi=cs["dhi"].to_numpy(dtype=float),
+        dni_extra=dni_extra.to_numpy(dtype=float),
+    )
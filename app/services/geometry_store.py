@@ -0,0 +1,228 @@
+"""Geometry and clear-sky arrays shared by all workers through memory-mapped files.
+
+With ``GEOMETRY_SHM_DIR`` set (ideally on tmpfs, e.g. ``/dev/shm/solar-geometry``),
+a site's geometry is computed for whole local days at the request's cadence
+and written to one file there; every worker maps that file read-only and
+slices the window it needs as views, so N workers share one copy in the page
+cache instead of each computing and holding their own. Concurrent misses
+for the same entry are serialized by a striped ``flock`` so it is computed
+once, and entries are published by atomic rename. Files expire after
+``GEOMETRY_SHM_TTL``; expired files and, beyond ``GEOMETRY_SHM_MAX_MB``, the
+oldest ones are unlinked by writers (existing mappings stay valid).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.core.metrics import geometry_store_lookups_total
+from app.services.geometry import FIELDS, Geometry, day_window, site_geometry
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: concurrent misses may compute an entry twice
+    fcntl = None
+
+
+_MAGIC = b"SFGEO1\0\0"
+# magic, expires_at (epoch seconds), samples per field, key length; the key follows
+_HEADER = struct.Struct("<8sdqq")
+_MEMO_SIZE = 256
+_LOCK_STRIPES = 64
+SWEEP_SECONDS = 60
+
+_lock = threading.Lock()
+# entry key -> (expires_at, geometry mapped from its file)
+_memo: "OrderedDict[str, Tuple[float, Geometry]]" = OrderedDict()
+_last_sweep = 0.0
+
+
+def _entry_key(lat: float, lon: float, full: pd.DatetimeIndex) -> str:
+    step = int((full[1] - full[0]).total_seconds())
+    return (
+        f"{round(float(lat), 5)}:{round(float(lon), 5)}:{full.tz}:{settings.solar_position_method}"
+        f":{full[0].isoformat()}:{step}:{len(full)}"
+    )
+
+
+def _path(key: str) -> str:
+    return os.path.join(settings.geometry_shm_dir, hashlib.sha256(key.encode()).hexdigest()[:32] + ".geo")
+
+
+def _data_offset(key_len: int) -> int:
+    # float64 rows start 8-byte aligned after the header and key
+    return -(-(_HEADER.size + key_len) // 8) * 8
+
+
+def _map(path: str, key: str) -> Optional[Tuple[float, Geometry]]:
+    """Map an entry file read-only; None if it is missing, expired or not ``key``'s."""
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    expected = key.encode()
+    if len(mm) < _HEADER.size:
+        mm.close()
+        return None
+    magic, expires_at, n, key_len = _HEADER.unpack_from(mm)
+    offset = _data_offset(key_len)
+    if (
+        magic != _MAGIC
+        or expires_at <= time.time()
+        or mm[_HEADER.size : _HEADER.size + key_len] != expected
+        or len(mm) < offset + len(FIELDS) * n * 8
+    ):
+        mm.close()
+        return None
+    # The arrays keep the mapping alive; they are read-only views of the shared pages
+    rows = np.frombuffer(mm, dtype=np.float64, count=len(FIELDS) * n, offset=offset).reshape(len(FIELDS), n)
+    return expires_at, Geometry(**dict(zip(FIELDS, rows)))
+
+
+def _publish(path: str, key: str, geom: Geometry) -> None:
+    expires_at = time.time() + settings.geometry_shm_ttl_seconds
+    key_bytes = key.encode()
+    header = _HEADER.pack(_MAGIC, expires_at, len(geom.zenith), len(key_bytes)) + key_bytes
+    header = header.ljust(_data_offset(len(key_bytes)), b"\0")
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(geom.to_bytes())
+    # Readers see the whole entry or none of it
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def _entry_lock(key: str) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    stripe = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) % _LOCK_STRIPES
+    fd = os.open(os.path.join(settings.geometry_shm_dir, f".lock-{stripe:02d}"), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def sweep(now: Optional[float] = None) -> int:
+    """Unlink expired entries, then the oldest ones while over the size limit; returns files removed."""
+    now = time.time() if now is None else now
+    entries = []
+    removed = 0
+    with os.scandir(settings.geometry_shm_dir) as it:
+        for e in it:
+            if not e.name.endswith((".geo", ".tmp")):
+                continue
+            try:
+                st = e.stat()
+            except OSError:
+                continue
+            # Files are written once, so mtime + TTL is their expiry; leftover temp files go after a minute
+            ttl = settings.geometry_shm_ttl_seconds if e.name.endswith(".geo") else SWEEP_SECONDS
+            if st.st_mtime + ttl <= now:
+                with contextlib.suppress(OSError):
+                    os.unlink(e.path)
+                    removed += 1
+            elif e.name.endswith(".geo"):
+                entries.append((st.st_mtime, st.st_size, e.path))
+    budget = settings.geometry_shm_max_mb * 1024 * 1024
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+            removed += 1
+        total -= size
+    return removed
+
+
+def _maybe_sweep() -> None:
+    global _last_sweep
+    now = time.time()
+    with _lock:
+        if now - _last_sweep < SWEEP_SECONDS:
+            return
+        _last_sweep = now
+    with contextlib.suppress(OSError):
+        sweep(now)
+
+
+def _memo_get(key: str) -> Optional[Geometry]:
+    with _lock:
+        entry = _memo.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            _memo.pop(key, None)
+            return None
+        _memo.move_to_end(key)
+        return entry[1]
+
+
+def _memo_put(key: str, entry: Tuple[float, Geometry]) -> None:
+    with _lock:
+        _memo[key] = entry
+        _memo.move_to_end(key)
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def shared_geometry(lat: float, lon: float, index: pd.DatetimeIndex) -> Geometry:
+    """``site_geometry`` for ``index``, served from the shared store when ``GEOMETRY_SHM_DIR`` is set."""
+    window = day_window(index) if settings.geometry_shm_dir else None
+    if window is None:
+        return site_geometry(lat, lon, index)
+    full, offset = window
+    key = _entry_key(lat, lon, full)
+    geom = _memo_get(key)
+    if geom is not None:
+        geometry_store_lookups_total.labels(result="hit").inc()
+        return geom.slice(offset, len(index))
+
+    path = _path(key)
+    entry = _map(path, key)
+    result = "hit"
+    if entry is None:
+        try:
+            os.makedirs(settings.geometry_shm_dir, exist_ok=True)
+            with _entry_lock(key):
+                # Another worker may have published it while we waited for the lock
+                entry = _map(path, key)
+                if entry is None:
+                    result = "miss"
+                    _publish(path, key, site_geometry(lat, lon, full))
+                    entry = _map(path, key)
+        except OSError:
+            entry = None
+        if result == "miss":
+            _maybe_sweep()
+        if entry is None:
+            geometry_store_lookups_total.labels(result="error").inc()
+            return site_geometry(lat, lon, index)
+    geometry_store_lookups_total.labels(result=result).inc()
+    _memo_put(key, entry)
+    return entry[1].slice(offset, len(index))
+
+
+def reset() -> None:
+    """Forget mapped entries of this process (files stay), e.g. after changing ``GEOMETRY_SHM_DIR``."""
+    global _last_sweep
+    with _lock:
+        _memo.clear()
+        _last_sweep = 0.0
@@ -0,0 +1,185 @@
+"""Append-only SQLite store of issued daily forecast totals for `/history`.
+
+Every computed forecast appends one row per *complete* local day it covers
+(partial first/last days are skipped). Rows are clustered by
+``(site, source, day, issued)`` in a ``WITHOUT ROWID`` table, so a range read
+for one site is a single index seek plus a contiguous scan regardless of how
+many months of other sites and days the file holds. For each day the most
+recently issued complete forecast wins. Calibrated forecasts are kept under
+their own source (``open-meteo+calibrated``), apart from the raw model's.
+
+Requests only queue their rows; one writer thread per process inserts them
+in batched transactions and, at most every ``PRUNE_SECONDS``, deletes days
+older than ``HISTORY_RETENTION_DAYS``.
+"""
+
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+from app.models.spec import ForecastSpec
+from app.services.cache import make_site_id
+from app.services.forecast_engine import ForecastArrays, spec_arrays
+from app.services.sqlite_db import connect
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecast_daily (
+    site TEXT NOT NULL,
+    source TEXT NOT NULL,
+    day TEXT NOT NULL,
+    issued INTEGER NOT NULL,
+    wh REAL NOT NULL,
+    PRIMARY KEY (site, source, day, issued)
+) WITHOUT ROWID
+"""
+
+# Forecasts waiting for the writer; beyond this history is dropped instead of blocking requests
+PENDING_MAX = 10_000
+BATCH_MAX = 256
+PRUNE_SECONDS = 3600
+
+_queue: "queue.Queue[Tuple[str, List[tuple]]]" = queue.Queue(PENDING_MAX)
+_writer_lock = threading.Lock()
+_writer: Optional[threading.Thread] = None
+# db path -> time of its last prune
+_pruned: Dict[str, float] = {}
+
+
+def enabled() -> bool:
+    return bool(settings.history_db_path)
+
+
+def _conn(path: Optional[str] = None) -> sqlite3.Connection:
+    return connect(path or settings.history_db_path, _SCHEMA)
+
+
+def site_id(spec: ForecastSpec) -> str:
+    return make_site_id(
+        lat=spec.lat, lon=spec.lon, tilt=spec.tilt, azimuth=spec.azimuth, kwp=spec.kwp, planes=spec.planes
+    )
+
+
+def history_source(source: str, calibrated: bool) -> str:
+    return f"{source}+calibrated" if calibrated else source
+
+
+def _complete_days(arrays: ForecastArrays) -> Dict[str, float]:
+    idx = arrays.index
+    if len(idx) < 2:
+        return {}
+    step = idx[1] - idx[0]
+    days = dict(zip(arrays.days, arrays.watt_hours_day.tolist()))
+    first, last = idx[0], idx[-1]
+    if (first.hour, first.minute) != (0, 0):
+        days.pop(first.strftime("%Y-%m-%d"), None)
+    if (last + step).strftime("%Y-%m-%d") == last.strftime("%Y-%m-%d"):
+        days.pop(last.strftime("%Y-%m-%d"), None)
+    return days
+
+
+def prune(path: Optional[str] = None, today: Optional[pd.Timestamp] = None) -> int:
+    """Delete days older than ``HISTORY_RETENTION_DAYS`` (0 keeps everything); returns rows removed."""
+    if settings.history_retention_days <= 0:
+        return 0
+    today = today or pd.Timestamp.now(tz=settings.timezone).normalize()
+    cutoff = (today - timedelta(days=settings.history_retention_days)).strftime("%Y-%m-%d")
+    conn = _conn(path)
+    with conn:
+        return conn.execute("DELETE FROM forecast_daily WHERE day < ?", (cutoff,)).rowcount
+
+
+def _write(path: str, rows: List[tuple]) -> None:
+    conn = _conn(path)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO forecast_daily (site, source, day, issued, wh) VALUES (?, ?, ?, ?, ?)", rows
+        )
+    now = time.monotonic()
+    if now - _pruned.get(path, float("-inf")) >= PRUNE_SECONDS:
+        _pruned[path] = now
+        prune(path)
+
+
+def _write_loop() -> None:
+    while True:
+        batch = [_queue.get()]
+        while len(batch) < BATCH_MAX:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        by_path: Dict[str, List[tuple]] = {}
+        for path, rows in batch:
+            by_path.setdefault(path, []).extend(rows)
+        for path, rows in by_path.items():
+            try:
+                _write(path, rows)
+            except Exception:
+                # History is best effort; a failed batch is dropped and the writer keeps going
+                pass
+        for _ in batch:
+            _queue.task_done()
+
+
+def _ensure_writer() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name="history-writer", daemon=True)
+            _writer.start()
+
+
+def record_forecast(spec: ForecastSpec, arrays: ForecastArrays, issued: Optional[int] = None) -> int:
+    """Queue the complete daily totals of one issued forecast for the writer; returns rows queued."""
+    if not enabled():
+        return 0
+    days = _complete_days(arrays)
+    if not days:
+        return 0
+    sid = site_id(spec)
+    source = history_source(spec.source, arrays.calibrated)
+    issued = int(time.time()) if issued is None else issued
+    _ensure_writer()
+    try:
+        _queue.put_nowait((settings.history_db_path, [(sid, source, day, issued, wh) for day, wh in days.items()]))
+    except queue.Full:
+        # Never make a forecast request wait for history
+        return 0
+    return len(days)
+
+
+def flush() -> None:
+    """Block until every queued forecast has been written (shutdown, tests)."""
+    _queue.join()
+
+
+def issue_forecast(spec: ForecastSpec) -> ForecastArrays:
+    """Compute the forecast for ``spec`` and record it in the history store."""
+    arrays = spec_arrays(spec)
+    record_forecast(spec, arrays)
+    return arrays
+
+
+def daily_history(spec: ForecastSpec, start: str, end: str, calibrated: bool = False) -> Dict[str, float]:
+    """Daily Wh of the latest complete forecast per day in ``[start, end]`` (YYYY-MM-DD)."""
+    # SQLite returns the row holding MAX(issued) for the bare `wh` column
+    rows = _conn().execute(
+        "SELECT day, wh, MAX(issued) FROM forecast_daily"
+        " WHERE site = ? AND source = ? AND day BETWEEN ? AND ? GROUP BY day ORDER BY day",
+        (site_id(spec), history_source(spec.source, calibrated), start, end),
+    ).fetchall()
+    return {day: round(wh, 3) for day, wh, _ in rows}
+
+
+def default_range(days: int = 30) -> tuple[str, str]:
+    today = pd.Timestamp.now(tz=settings.timezone).normalize()
+    return (today - timedelta(days=days)).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
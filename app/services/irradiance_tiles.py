@@ -0,0 +1,124 @@
+"""Geo-tiled clear-sky irradiance cache shared across nearby sites.
+
+Clear-sky GHI/DNI/DHI and solar geometry barely change over a few hundred
+metres, so sites are snapped to the centre of a square lat/lon tile of
+``IRRADIANCE_TILE_DEG`` and share one computation per tile, cadence and set
+of whole local days; each request slices its window from that entry, so a
+moving "now" or a partial horizon reuses it. Entries live in a bounded
+process memo and in Redis (raw float64 bytes) for ``IRRADIANCE_TILE_TTL``
+seconds. A sampled fraction of lookups (``IRRADIANCE_TILE_AUDIT_RATE``) is
+also computed at the exact location and the GHI difference is recorded in a
+histogram.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.core.metrics import irradiance_tile_error_wm2, irradiance_tile_lookups_total
+from app.services.cache import _get_raw_client as get_raw_redis_client
+from app.services.geometry import Geometry, day_window, site_geometry
+from app.services.geometry_store import shared_geometry
+
+
+_MEMO_SIZE = 512
+
+_lock = threading.Lock()
+# tile key -> (expires_at, geometry)
+_memo: "OrderedDict[str, Tuple[float, Geometry]]" = OrderedDict()
+
+
+def tile_center(lat: float, lon: float, tile_deg: float) -> Tuple[float, float]:
+    lat_c = (math.floor(lat / tile_deg) + 0.5) * tile_deg
+    lon_c = (math.floor(lon / tile_deg) + 0.5) * tile_deg
+    return max(-90.0, min(90.0, lat_c)), max(-180.0, min(180.0, lon_c))
+
+
+def _tile_key(lat_c: float, lon_c: float, tile_deg: float, full: pd.DatetimeIndex) -> str:
+    # ``full`` spans whole local days, so its first and last day identify it
+    step = int((full[1] - full[0]).total_seconds())
+    return (
+        f"tile:{tile_deg}:{lat_c:.6f}:{lon_c:.6f}:{settings.timezone}:{settings.solar_position_method}"
+        f":{full[0].strftime('%Y-%m-%d')}:{full[-1].strftime('%Y-%m-%d')}:{step}"
+    )
+
+
+def _memo_get(key: str) -> Optional[Geometry]:
+    with _lock:
+        entry = _memo.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            _memo.pop(key, None)
+            return None
+        _memo.move_to_end(key)
+        return entry[1]
+
+
+def _memo_put(key: str, geom: Geometry) -> None:
+    with _lock:
+        _memo[key] = (time.time() + settings.irradiance_tile_ttl_seconds, geom)
+        _memo.move_to_end(key)
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def _redis_get(key: str) -> Optional[Geometry]:
+    client = get_raw_redis_client(key)
+    if not client:
+        return None
+    try:
+        blob = client.get(key)
+    except Exception:
+        return None
+    return Geometry.from_bytes(blob) if blob else None
+
+
+def _redis_put(key: str, geom: Geometry) -> None:
+    client = get_raw_redis_client(key)
+    if not client:
+        return
+    try:
+        client.setex(key, settings.irradiance_tile_ttl_seconds, geom.to_bytes())
+    except Exception:
+        pass
+
+
+def tile_geometry(lat: float, lon: float, index: pd.DatetimeIndex) -> Geometry:
+    """Geometry and clear-sky irradiance of the tile containing (lat, lon)."""
+    tile_deg = settings.irradiance_tile_deg
+    lat_c, lon_c = tile_center(lat, lon, tile_deg)
+    window = day_window(index)
+    if window is None:
+        irradiance_tile_lookups_total.labels(result="miss").inc()
+        return shared_geometry(lat_c, lon_c, index)
+    full, offset = window
+    key = _tile_key(lat_c, lon_c, tile_deg, full)
+
+    geom = _memo_get(key)
+    if geom is None:
+        geom = _redis_get(key)
+        if geom is not None:
+            _memo_put(key, geom)
+    if geom is None:
+        irradiance_tile_lookups_total.labels(result="miss").inc()
+        geom = shared_geometry(lat_c, lon_c, full)
+        _memo_put(key, geom)
+        _redis_put(key, geom)
+    else:
+        irradiance_tile_lookups_total.labels(result="hit").inc()
+    geom = geom.slice(offset, len(index))
+
+    if settings.irradiance_tile_audit_rate > 0 and random.random() < settings.irradiance_tile_audit_rate:
+        exact = site_geometry(lat, lon, index)
+        irradiance_tile_error_wm2.observe(float(np.nanmax(np.abs(exact.ghi - geom.ghi), initial=0.0)))
+    return geom
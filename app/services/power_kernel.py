@@ -0,0 +1,77 @@
+"""Array kernel for the post-transposition power chain.
+
+SAPM cell temperature, PVWatts-like DC power, system losses and clipping at
+nameplate, evaluated on contiguous float64 arrays in place. Only one scratch
+buffer per thread is kept (grown on demand), so a request allocates just its
+output array. The operation order mirrors pvlib's ``sapm_cell`` and the
+former pandas chain, so results are bit-identical.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+import numpy as np
+
+
+# SAPM open-rack glass/polymer coefficients with ambient fallback assumptions
+SAPM_A = -3.56
+SAPM_B = -0.075
+SAPM_DELTA_T = 3
+TEMP_AIR = 20.0  # degC
+WIND_SPEED = 1.0  # m/s
+GAMMA_PDC = -0.004  # per degC
+IRRAD_REF = 1000.0
+
+_local = threading.local()
+
+
+def _scratch(shape: tuple) -> np.ndarray:
+    size = int(np.prod(shape))
+    buf = getattr(_local, "buf", None)
+    if buf is None or buf.size < size:
+        buf = np.empty(size, dtype=np.float64)
+        _local.buf = buf
+    return buf[:size].reshape(shape)
+
+
+def ac_power(
+    poa_global: np.ndarray,
+    pdc0: np.ndarray,
+    system_loss: float,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """AC power [W] from plane-of-array irradiance [W/m2].
+
+    ``poa_global`` is (planes x time) or (time,), ``pdc0`` the nameplate DC
+    power [W] broadcastable against it, e.g. shape (planes, 1).
+    """
+    poa = np.ascontiguousarray(poa_global, dtype=np.float64)
+    if out is None:
+        out = np.empty(poa.shape, dtype=np.float64)
+    temp = _scratch(poa.shape)
+
+    # Cell temperature: (E * exp(a + b*WS) + Ta) + (E / E0) * dT
+    np.multiply(poa, np.exp(SAPM_A + SAPM_B * WIND_SPEED), out=temp)
+    temp += TEMP_AIR
+    np.divide(poa, IRRAD_REF, out=out)
+    out *= SAPM_DELTA_T
+    temp += out
+
+    # Temperature derate: 1 + gamma * (Tc - 25)
+    temp -= 25.0
+    temp *= GAMMA_PDC
+    temp += 1
+
+    # DC: pdc0 * (max(E, 0) / 1000) * derate, floored at zero
+    np.clip(poa, 0, None, out=out)
+    out /= 1000.0
+    np.multiply(pdc0, out, out=out)
+    out *= temp
+    np.clip(out, 0, None, out=out)
+
+    # System losses and clipping at nameplate
+    out *= 1.0 - system_loss
+    np.clip(out, 0, pdc0, out=out)
+    return out
@@ -0,0 +1,189 @@
+"""In-process CPU sampling and tracemalloc snapshots for the debug endpoints.
+
+CPU captures sample the stacks of all threads of the worker (event loop,
+request thread pool, background loops) via ``sys._current_frames`` at a
+fixed interval, so they see the hot paths of live traffic without a
+profiler hook in every thread. Samples render as collapsed stacks (for
+flame graph tools) or as ``pstats`` statistics, where ``ncalls`` counts
+samples and times are samples times the achieved sampling interval.
+"""
+
+from __future__ import annotations
+
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Tuple
+
+
+Func = Tuple[str, int, str]  # pstats key: (filename, first line, function name)
+Stack = Tuple[Func, ...]  # root first
+
+# Leaf frames in these modules are threads waiting for work, not load
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+_capture_lock = threading.Lock()
+_snapshot_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+class CaptureBusy(RuntimeError):
+    pass
+
+
+def _stack(frame) -> Stack:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def sample(
+    seconds: float, interval: float = 0.005, idle: bool = False
+) -> Tuple[Dict[Tuple[str, Stack], int], float]:
+    """Sample every other thread's stack for ``seconds``.
+
+    Returns {(thread name, stack): samples} and the achieved interval, which
+    is longer than ``interval`` when busy threads hold the GIL.
+    """
+    if not _capture_lock.acquire(blocking=False):
+        raise CaptureBusy("a CPU capture is already running")
+    try:
+        me = threading.get_ident()
+        counts: Counter = Counter()
+        rounds = 0
+        start = time.monotonic()
+        deadline = start + seconds
+        while time.monotonic() < deadline:
+            rounds += 1
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _stack(frame)
+                if not stack or (not idle and stack[-1][0].endswith(_IDLE_MODULES)):
+                    continue
+                counts[(names.get(ident, str(ident)), stack)] += 1
+            time.sleep(interval)
+        return dict(counts), (time.monotonic() - start) / max(rounds, 1)
+    finally:
+        _capture_lock.release()
+
+
+def _label(func: Func) -> str:
+    filename, line, name = func
+    for marker in ("site-packages" + os.sep, os.getcwd() + os.sep, os.path.dirname(os.__file__) + os.sep):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    return f"{name} ({filename}:{line})"
+
+
+def collapsed(samples: Dict[Tuple[str, Stack], int]) -> str:
+    """``thread;outer;...;leaf count`` lines, as read by flamegraph.pl and speedscope."""
+    lines = [
+        ";".join([thread.replace(";", ":"), *(_label(f).replace(";", ":") for f in stack)]) + f" {n}"
+        for (thread, stack), n in samples.items()
+    ]
+    return "\n".join(sorted(lines)) + "\n"
+
+
+class _SampledStats:
+    """Sample counts in the shape ``pstats.Stats`` loads from a profiler."""
+
+    def __init__(self, samples: Dict[Tuple[str, Stack], int], interval: float):
+        stats: Dict[Func, list] = defaultdict(lambda: [0, 0, 0.0, 0.0, defaultdict(lambda: [0, 0, 0.0, 0.0])])
+        for (_, stack), n in samples.items():
+            dt = n * interval
+            seen = set()
+            for i, func in enumerate(stack):
+                entry = stats[func]
+                leaf = i == len(stack) - 1
+                if leaf:
+                    entry[2] += dt
+                if func not in seen:
+                    # recursion counts once per sample
+                    seen.add(func)
+                    entry[0] += n
+                    entry[1] += n
+                    entry[3] += dt
+                if i:
+                    caller = entry[4][stack[i - 1]]
+                    caller[0] += n
+                    caller[1] += n
+                    caller[2] += dt if leaf else 0.0
+                    caller[3] += dt
+        self.stats = {
+            func: (cc, nc, tt, ct, {c: tuple(v) for c, v in callers.items()})
+            for func, (cc, nc, tt, ct, callers) in stats.items()
+        }
+
+    def create_stats(self) -> None:
+        pass
+
+
+def stats_report(
+    samples: Dict[Tuple[str, Stack], int], interval: float, sort: str = "cumulative", limit: int = 50
+) -> str:
+    buf = io.StringIO()
+    stats = pstats.Stats(_SampledStats(samples, interval), stream=buf)
+    stats.sort_stats(sort).print_stats(limit)
+    return buf.getvalue()
+
+
+def stats_dump(samples: Dict[Tuple[str, Stack], int], interval: float) -> bytes:
+    """Marshalled stats, loadable with ``pstats.Stats(path)`` or snakeviz."""
+    return marshal.dumps(_SampledStats(samples, interval).stats)
+
+
+def tracemalloc_start(frames: int) -> bool:
+    """Start tracing allocations; False if it was already running."""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+
+def tracemalloc_stop() -> None:
+    global _last_snapshot
+    with _snapshot_lock:
+        _last_snapshot = None
+    tracemalloc.stop()
+
+
+def tracemalloc_report(group_by: str = "lineno", limit: int = 30, diff: bool = False) -> str:
+    """Top allocation sites of a new snapshot, or its growth since the previous one with ``diff``.
+
+    The new snapshot becomes the baseline of the next diff.
+    """
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+    )
+    with _snapshot_lock:
+        previous, _last_snapshot = _last_snapshot, snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    out = [f"traced: {current / 1e6:.1f} MB current, {peak / 1e6:.1f} MB peak"]
+    if diff and previous is not None:
+        out.append(f"top {limit} differences since the previous snapshot:")
+        stats = snapshot.compare_to(previous, group_by)
+    else:
+        if diff:
+            out.append("no previous snapshot; this one is the baseline for the next diff")
+        out.append(f"top {limit} allocation sites:")
+        stats = snapshot.statistics(group_by)
+    for stat in stats[:limit]:
+        out.append(str(stat))
+        if group_by == "traceback":
+            out.extend(f"    {line}" for line in stat.traceback.format())
+    return "\n".join(out) + "\n"
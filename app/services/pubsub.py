@@ -0,0 +1,134 @@
+"""Push delivery of freshly written forecasts to streaming subscribers.
+
+Forecast writes publish a small ``topic\\netag\\nkey`` notice on one Redis
+channel in the same pipeline as the cache write, never the body. Each worker
+runs a single listener thread (started with its first subscriber); only for
+topics with local subscribers does it read the body from the cache key and
+fan it out to in-process asyncio queues. Writes nobody streams therefore cost
+a notice of ~100 bytes, and an idle subscriber one parked coroutine and no
+Redis connection of its own. Without Redis, writes are dispatched to the
+local subscribers directly.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from app.models.spec import ForecastSpec
+
+
+CHANNEL = "forecast-updates"
+
+Update = Tuple[str, str]  # (etag, JSON body)
+
+_lock = threading.Lock()
+_subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Update]"]]] = {}
+_listener: Optional[threading.Thread] = None
+
+
+def stream_topic(spec: ForecastSpec) -> str:
+    """Topic of a spec's JSON forecast; unlike the cache key it does not roll over with the horizon start."""
+    parts = spec.model_dump(exclude={"fmt"})
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def encode(topic: str, etag: str, key: str) -> str:
+    return f"{topic}\n{etag}\n{key}"
+
+
+def subscriber_count() -> int:
+    with _lock:
+        return sum(len(s) for s in _subscribers.values())
+
+
+def _has_subscribers(topic: str) -> bool:
+    with _lock:
+        return bool(_subscribers.get(topic))
+
+
+def _offer(queue: "asyncio.Queue[Update]", update: Update) -> None:
+    # Latest-only: a slow consumer skips intermediate versions instead of piling them up
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(update)
+
+
+def dispatch(topic: str, etag: str, body: str) -> None:
+    """Hand an update to this process's subscribers of ``topic``; safe from any thread."""
+    with _lock:
+        targets = list(_subscribers.get(topic, ()))
+    for loop, queue in targets:
+        with contextlib.suppress(RuntimeError):  # loop already closed
+            loop.call_soon_threadsafe(_offer, queue, (etag, body))
+
+
+def _handle(message: bytes | str) -> None:
+    from app.services.cache import get_cached_raw
+
+    if isinstance(message, bytes):
+        message = message.decode()
+    topic, etag, key = message.split("\n", 2)
+    if not _has_subscribers(topic):
+        return
+    body, stored = get_cached_raw(key)
+    if not body:
+        # Evicted or overwritten by a failed write; the next update gets through
+        return
+    # A newer write may already have replaced the notified version; its own notice follows
+    dispatch(topic, stored or etag, body.decode() if isinstance(body, bytes) else body)
+
+
+def _listen() -> None:
+    from app.services.redis_conn import pubsub_client
+
+    while True:
+        # Own connection: a subscriber blocks on reads longer than the pooled socket timeout
+        client = pubsub_client()
+        if client is None:
+            time.sleep(5)
+            continue
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _handle(message["data"])
+        except Exception:
+            time.sleep(1)
+        finally:
+            client.close()
+
+
+def _ensure_listener() -> None:
+    global _listener
+    from app.services.cache import _get_client
+
+    with _lock:
+        if _listener is not None or _get_client() is None:
+            return
+        _listener = threading.Thread(target=_listen, name="forecast-pubsub", daemon=True)
+        _listener.start()
+
+
+@contextlib.asynccontextmanager
+async def subscribe(topic: str) -> AsyncIterator["asyncio.Queue[Update]"]:
+    """Queue receiving ``(etag, body)`` for every forecast written under ``topic``."""
+    await asyncio.to_thread(_ensure_listener)
+    entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=1))
+    with _lock:
+        _subscribers.setdefault(topic, set()).add(entry)
+    try:
+        yield entry[1]
+    finally:
+        with _lock:
+            subs = _subscribers.get(topic)
+            if subs is not None:
+                subs.discard(entry)
+                if not subs:
+                    del _subscribers[topic]
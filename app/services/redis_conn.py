@@ -0,0 +1,291 @@
+"""Shared Redis connections with fail-fast outage handling and client-side sharding.
+
+Every Redis server is a ``Node`` with two bounded connection pools (decoded
+and raw bytes) and short socket timeouts. A connection or timeout error on
+any of its connections marks the node down; while down, ``client()`` returns
+``None`` immediately so callers fall back to their no-Redis path. One caller
+at a time probes again after an exponential backoff with jitter, capped at
+``REDIS_BACKOFF_MAX``, so an outage costs one timeout per backoff interval
+instead of one or more per request.
+
+``REDIS_URL`` is the primary node (rate limiting, pub/sub). The response and
+weather caches are spread over ``REDIS_CACHE_URLS`` with a consistent-hash
+ring; without it they share the primary. A key whose node is down goes to
+the next live node on the ring, so an outage remaps only that node's slice.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import redis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from app.core.config import settings
+from app.core.metrics import redis_errors_total, redis_probes_total, redis_shard_up, redis_up
+
+
+_UNAVAILABLE = (RedisConnectionError, RedisTimeoutError, OSError)
+
+# Ring points per node; enough for an even split across a handful of nodes
+RING_REPLICAS = 160
+
+
+class _TrackedConnection:
+    """Mixin reporting connection-level failures to the owning node's outage state."""
+
+    node: "Node"
+
+    def connect(self, *args, **kwargs):
+        try:
+            return super().connect(*args, **kwargs)
+        except _UNAVAILABLE as exc:
+            self.node.mark_down(exc)
+            raise
+
+    def send_packed_command(self, *args, **kwargs):
+        try:
+            return super().send_packed_command(*args, **kwargs)
+        except _UNAVAILABLE as exc:
+            self.node.mark_down(exc)
+            raise
+
+    def read_response(self, *args, **kwargs):
+        try:
+            return super().read_response(*args, **kwargs)
+        except _UNAVAILABLE as exc:
+            self.node.mark_down(exc)
+            raise
+
+
+def _node_name(url: str) -> str:
+    # host:port/db without credentials; stable across workers, so it also seeds the ring
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        return parts.path
+    return f"{parts.hostname or 'localhost'}:{parts.port or 6379}{parts.path or '/0'}"
+
+
+class Node:
+    def __init__(self, url: str, shard: bool = False):
+        self.url = url
+        self.name = _node_name(url)
+        self.shard = shard
+        self.lock = threading.Lock()
+        self.probe_lock = threading.Lock()
+        # decode_responses flag -> client; both share the outage state below
+        self.clients: Dict[bool, redis.Redis] = {}
+        self.state = "unknown"  # unknown | up | down
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def _pool(self, decode: bool) -> redis.ConnectionPool:
+        pool = redis.BlockingConnectionPool.from_url(
+            self.url,
+            decode_responses=decode,
+            max_connections=settings.redis_max_connections,
+            # Waiting for a free pooled connection is bounded like a socket read
+            timeout=settings.redis_socket_timeout_seconds,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_connect_timeout_seconds,
+            health_check_interval=30,
+        )
+        # Keep the URL's connection class (plain, TLS or unix socket)
+        base = pool.connection_class
+        pool.connection_class = type(f"Tracked{base.__name__}", (_TrackedConnection, base), {"node": self})
+        return pool
+
+    def _client(self, decode: bool) -> redis.Redis:
+        with self.lock:
+            client = self.clients.get(decode)
+            if client is None:
+                client = self.clients[decode] = redis.Redis(connection_pool=self._pool(decode))
+            return client
+
+    def _set_gauge(self, up: int) -> None:
+        if self.shard:
+            redis_shard_up.labels(shard=self.name).set(up)
+        else:
+            redis_up.set(up)
+
+    def mark_down(self, exc: BaseException) -> None:
+        """Record a failed operation; requests skip this node until the next probe."""
+        redis_errors_total.labels(error=type(exc).__name__).inc()
+        with self.lock:
+            if self.state == "down" and time.monotonic() < self.retry_at:
+                return
+            self.failures += 1
+            self.state = "down"
+            self.retry_at = time.monotonic() + _backoff(self.failures)
+            self.last_error = f"{type(exc).__name__}: {exc}"
+        self._set_gauge(0)
+
+    def _mark_up(self) -> None:
+        with self.lock:
+            self.state = "up"
+            self.failures = 0
+            self.last_error = None
+        self._set_gauge(1)
+
+    def client(self, raw: bool = False) -> Optional[redis.Redis]:
+        """Pooled client, or None while the node is considered unavailable (never blocks on an outage)."""
+        if self.state == "up":
+            return self._client(not raw)
+        if time.monotonic() < self.retry_at:
+            return None
+        # One probe at a time; concurrent callers fail open instead of queueing behind it
+        if not self.probe_lock.acquire(blocking=False):
+            return None
+        try:
+            if self.state == "up":
+                return self._client(not raw)
+            try:
+                self._client(True).ping()
+            except Exception as exc:
+                redis_probes_total.labels(result="error").inc()
+                if self.state != "down" or time.monotonic() >= self.retry_at:
+                    self.mark_down(exc)
+                return None
+            redis_probes_total.labels(result="ok").inc()
+            self._mark_up()
+            return self._client(not raw)
+        finally:
+            self.probe_lock.release()
+
+    def health(self) -> Dict[str, Any]:
+        with self.lock:
+            out: Dict[str, Any] = {"state": self.state, "failures": self.failures}
+            if self.state == "down":
+                out["retry_in_seconds"] = round(max(0.0, self.retry_at - time.monotonic()), 1)
+                out["last_error"] = self.last_error
+        return out
+
+    def close(self) -> None:
+        with self.lock:
+            for c in self.clients.values():
+                c.connection_pool.disconnect()
+            self.clients.clear()
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring over nodes, with ``RING_REPLICAS`` points per node."""
+
+    def __init__(self, nodes: Sequence[Node], replicas: int = RING_REPLICAS):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node.name}#{i}"), n) for n, node in enumerate(self.nodes) for i in range(replicas))
+        self._hashes = [h for h, _ in points]
+        self._owners = [n for _, n in points]
+
+    def candidates(self, key: str) -> Iterator[Node]:
+        """Distinct nodes clockwise from ``key``'s position: its owner first, then the fallbacks."""
+        if len(self.nodes) == 1:
+            yield self.nodes[0]
+            return
+        start = bisect.bisect(self._hashes, _hash(key))
+        seen = set()
+        for i in range(len(self._owners)):
+            n = self._owners[(start + i) % len(self._owners)]
+            if n not in seen:
+                seen.add(n)
+                yield self.nodes[n]
+                if len(seen) == len(self.nodes):
+                    return
+
+    def owner(self, key: str) -> Node:
+        return next(self.candidates(key))
+
+
+_lock = threading.Lock()
+_primary: Optional[Node] = None
+_ring: Optional[HashRing] = None
+
+
+def _backoff(failures: int) -> float:
+    delay = min(settings.redis_backoff_max_seconds, settings.redis_backoff_min_seconds * 2 ** (failures - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def primary() -> Node:
+    global _primary
+    with _lock:
+        if _primary is None:
+            _primary = Node(settings.redis_url)
+        return _primary
+
+
+def ring() -> HashRing:
+    global _ring
+    node = primary()
+    with _lock:
+        if _ring is None:
+            urls = [u.strip() for u in settings.redis_cache_urls.split(",") if u.strip()]
+            _ring = HashRing([Node(u, shard=True) for u in urls] if urls else [node])
+        return _ring
+
+
+def client(raw: bool = False) -> Optional[redis.Redis]:
+    """Primary node client, or None while it is unavailable."""
+    return primary().client(raw)
+
+
+def shard_client(key: str, raw: bool = False) -> Optional[redis.Redis]:
+    """Client of the cache node owning ``key`` (or the next live one), None if all are down.
+
+    Derived keys (``:etag``, ``:fp``, per-cadence suffixes) are stored with
+    their base key by routing on the base key and reusing its client.
+    """
+    for node in ring().candidates(key):
+        c = node.client(raw)
+        if c is not None:
+            return c
+    return None
+
+
+def group_by_shard(keys: Sequence[str], raw: bool = False) -> List[Tuple[redis.Redis, List[int]]]:
+    """(client, positions in ``keys``) per live cache node; keys without a live node are left out."""
+    groups: Dict[int, Tuple[redis.Redis, List[int]]] = {}
+    for i, key in enumerate(keys):
+        c = shard_client(key, raw)
+        if c is not None:
+            groups.setdefault(id(c), (c, []))[1].append(i)
+    return list(groups.values())
+
+
+def pubsub_client() -> Optional[redis.Redis]:
+    """Dedicated raw client for a blocking subscriber on the primary, without a read timeout."""
+    if client() is None:
+        return None
+    return redis.Redis.from_url(
+        settings.redis_url,
+        socket_connect_timeout=settings.redis_connect_timeout_seconds,
+        health_check_interval=30,
+    )
+
+
+def health() -> Dict[str, Any]:
+    out = primary().health()
+    nodes = ring().nodes
+    if nodes != [primary()]:
+        out["shards"] = {node.name: node.health() for node in nodes}
+    return out
+
+
+def reset() -> None:
+    """Drop pools and outage state, e.g. after changing ``REDIS_URL`` or ``REDIS_CACHE_URLS``."""
+    global _primary, _ring
+    with _lock:
+        nodes = ([_primary] if _primary else []) + (_ring.nodes if _ring else [])
+        _primary = _ring = None
+    for node in {id(n): n for n in nodes}.values():
+        node.close()
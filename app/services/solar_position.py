@@ -0,0 +1,94 @@
+"""Selectable solar-position backends.
+
+`spa` is pvlib's NREL SPA (NumPy) and the reference. `ephemeris` is pvlib's
+lighter ephemeris algorithm (~0.01 deg). `analytical` uses Spencer (1971)
+declination and equation of time with closed-form zenith/azimuth (~0.1 deg)
+in plain NumPy and is roughly an order of magnitude faster than SPA. The
+error each backend introduces in watts is bounded by
+tests/test_solar_position.py.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pvlib
+
+from app.core.config import settings
+
+
+METHODS = ("spa", "ephemeris", "analytical")
+
+
+def solar_position(
+    index: pd.DatetimeIndex,
+    lat: float,
+    lon: float,
+    method: Optional[str] = None,
+    pressure: Optional[float] = None,
+) -> pd.DataFrame:
+    """Solar ``zenith`` and ``azimuth`` [deg, pvlib convention] for ``index``.
+
+    ``apparent_zenith`` and ``apparent_elevation`` are refracted at ``pressure`` [Pa].
+    """
+    method = method or settings.solar_position_method
+    if method == "spa":
+        return pvlib.solarposition.get_solarposition(index, lat, lon, pressure=pressure)
+    if method == "ephemeris":
+        return pvlib.solarposition.get_solarposition(index, lat, lon, pressure=pressure, method="ephemeris")
+    if method == "analytical":
+        return _analytical(index, lat, lon, pressure)
+    raise ValueError(f"Unknown solar position method '{method}'. Use one of {', '.join(METHODS)}.")
+
+
+def _refraction(elevation: np.ndarray, pressure: Optional[float], temperature: float = 12.0) -> np.ndarray:
+    """Atmospheric refraction [deg] as in NREL SPA (Bennett), zero below the refracted horizon."""
+    pressure_hpa = (pressure if pressure is not None else 101325.0) / 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dz = (pressure_hpa / 1010.0) * (283.0 / (273.0 + temperature)) * 1.02 / (
+            60.0 * np.tan(np.radians(elevation + 10.3 / (elevation + 5.11)))
+        )
+    return np.where(elevation >= -(0.26667 + 0.5667), dz, 0.0)
+
+
+def _analytical(index: pd.DatetimeIndex, lat: float, lon: float, pressure: Optional[float] = None) -> pd.DataFrame:
+    day_angle = 2.0 * np.pi * (index.dayofyear.to_numpy() - 1) / 365.0
+    declination = (
+        0.006918
+        - 0.399912 * np.cos(day_angle)
+        + 0.070257 * np.sin(day_angle)
+        - 0.006758 * np.cos(2 * day_angle)
+        + 0.000907 * np.sin(2 * day_angle)
+        - 0.002697 * np.cos(3 * day_angle)
+        + 0.00148 * np.sin(3 * day_angle)
+    )
+    # minutes
+    equation_of_time = (1440.0 / (2.0 * np.pi)) * (
+        0.0000075
+        + 0.001868 * np.cos(day_angle)
+        - 0.032077 * np.sin(day_angle)
+        - 0.014615 * np.cos(2 * day_angle)
+        - 0.040849 * np.sin(2 * day_angle)
+    )
+    # UTC hour of day straight from the epoch nanoseconds, no per-element datetime work
+    days = index.asi8 / 86400e9
+    utc_hours = (days - np.floor(days)) * 24.0
+    hour_angle = np.radians(15.0 * (utc_hours - 12.0) + lon + equation_of_time / 4.0)
+
+    lat_r = np.radians(lat)
+    cos_zenith = np.sin(lat_r) * np.sin(declination) + np.cos(lat_r) * np.cos(declination) * np.cos(hour_angle)
+    zenith = np.arccos(np.clip(cos_zenith, -1.0, 1.0))
+    azimuth = pvlib.solarposition.solar_azimuth_analytical(lat_r, hour_angle, declination, zenith)
+    zenith = np.degrees(zenith)
+    apparent_elevation = 90.0 - zenith + _refraction(90.0 - zenith, pressure)
+    return pd.DataFrame(
+        {
+            "zenith": zenith,
+            "azimuth": np.degrees(azimuth),
+            "apparent_zenith": 90.0 - apparent_elevation,
+            "apparent_elevation": apparent_elevation,
+        },
+        index=index,
+    )
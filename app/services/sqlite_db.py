@@ -0,0 +1,25 @@
+"""Thread-local SQLite connections for the small local stores (history, calibration)."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+
+_local = threading.local()
+
+
+def connect(path: str, schema: str) -> sqlite3.Connection:
+    """Connection to ``path`` for the calling thread, with ``schema`` applied once."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        # WAL lets readers run next to the writer (refresher vs. request threads)
+        conn = sqlite3.connect(path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(schema)
+        conns[path] = conn
+    return conn
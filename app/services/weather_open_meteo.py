@@ -2,18 +2,35 @@
 
 Fetches hourly weather and derives a scaling factor to adjust clear-sky
 irradiance. Falls back gracefully if network/cache is unavailable.
+
+The factor is computed once per weather payload ("ingest") for every
+supported cadence, aligned to a canonical index starting at local midnight
+of the payload's start date. Requests then only slice those arrays.
 """
 
 from __future__ import annotations
 
 import json
-from typing import Optional, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 
 import httpx
+import numpy as np
 import pandas as pd
+import pvlib
 
 from app.core.config import settings
-from app.services.cache import _get_client as get_redis_client
+from app.services.cache import _get_client as get_redis_client, _get_raw_client as get_raw_redis_client
+
+
+CADENCES = ("5min", "10min", "15min", "30min", "60min")
+_CMF_MEMO_SIZE = 256
+
+_cmf_lock = threading.Lock()
+# weather cmf key -> (expires_at, {cadence: factor array})
+_cmf_memo: "OrderedDict[str, Tuple[float, Dict[str, np.ndarray]]]" = OrderedDict()
 
 
 def _weather_cache_key(lat: float, lon: float, tz: str, start_date: str, end_date: str) -> str:
@@ -34,10 +51,13 @@ def _to_dataframe(payload: Dict[str, Any], tz: str) -> Optional[pd.DataFrame]:
         return None
 
 
-def fetch_open_meteo(lat: float, lon: float, tz: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
-    client = get_redis_client()
+def fetch_open_meteo(
+    lat: float, lon: float, tz: str, start_date: str, end_date: str, refresh: bool = False
+) -> Optional[pd.DataFrame]:
+    """Hourly weather from Redis or Open-Meteo; ``refresh`` skips the cache read."""
     key = _weather_cache_key(lat, lon, tz, start_date, end_date)
-    if client:
+    client = get_redis_client(key)
+    if client and not refresh:
         try:
             cached = client.get(key)
             if cached:
@@ -100,8 +120,7 @@ def cmf_factor_from_weather(
         # Map clearsky GHI to weather timestamps
         cs_on_w = cs_ghi.reindex(weather_df.index, method="nearest")
         # avoid div by zero at night
-        with pd.option_context("mode.use_inf_as_na", True):
-            ratio = (sw / cs_on_w.clip(lower=1e-6)).fillna(0.0)
+        ratio = (sw / cs_on_w.clip(lower=1e-6)).replace([np.inf, -np.inf], np.nan).fillna(0.0)
         factor = ratio.clip(lower=0.0, upper=1.0)
     elif "cloudcover" in weather_df.columns:
         cc = weather_df["cloudcover"].astype(float).clip(lower=0.0, upper=100.0)
@@ -111,6 +130,233 @@ def cmf_factor_from_weather(
 
     # Align factor to requested index
     factor = factor.reindex(index, method="nearest")
-    factor = factor.fillna(method="ffill").fillna(method="bfill").fillna(0.0)
+    factor = factor.ffill().bfill().fillna(0.0)
     return factor
 
+
+def _canonical_index(tz: str, start_date: str, end_date: str, freq: str) -> pd.DatetimeIndex:
+    start = pd.Timestamp(start_date).tz_localize(tz)
+    end = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).tz_localize(tz)
+    return pd.date_range(start=start, end=end, freq=freq, inclusive="left")
+
+
+def cmf_arrays_from_weather(
+    lat: float,
+    lon: float,
+    tz: str,
+    start_date: str,
+    end_date: str,
+    weather_df: Optional[pd.DataFrame],
+    alpha: float,
+) -> Optional[Dict[str, np.ndarray]]:
+    """Cloud-modification factor per cadence, aligned to the canonical indexes."""
+    if weather_df is None or len(weather_df) == 0:
+        return None
+    if "shortwave_radiation" in weather_df.columns:
+        sw = weather_df["shortwave_radiation"].to_numpy(dtype=float)
+        location = pvlib.location.Location(lat, lon, tz=tz)
+        # Clear sky at the weather timestamps themselves, not the nearest request sample: a horizon
+        # starting off the hour gets the on-the-hour ratio for its first partial hour
+        cs_ghi = location.get_clearsky(weather_df.index, model="ineichen")["ghi"].to_numpy()
+        # avoid div by zero at night; gaps count as fully clouded
+        ratio = np.nan_to_num(sw / np.clip(cs_ghi, 1e-6, None), nan=0.0)
+        hourly = np.clip(ratio, 0.0, 1.0)
+    elif "cloudcover" in weather_df.columns:
+        cc = np.clip(weather_df["cloudcover"].to_numpy(dtype=float), 0.0, 100.0)
+        hourly = np.clip(1.0 - alpha * (cc / 100.0), 0.0, 1.0)
+    else:
+        return None
+
+    factor = pd.Series(hourly, index=weather_df.index)
+    out: Dict[str, np.ndarray] = {}
+    for freq in CADENCES:
+        idx = _canonical_index(tz, start_date, end_date, freq)
+        aligned = factor.reindex(idx, method="nearest").ffill().bfill().fillna(0.0)
+        out[freq] = aligned.to_numpy(dtype=np.float64)
+    return out
+
+
+def _cmf_key(lat: float, lon: float, tz: str, start_date: str, end_date: str, alpha: float) -> str:
+    return f"{_weather_cache_key(lat, lon, tz, start_date, end_date)}:cmf:{round(alpha, 4)}"
+
+
+def _memo_get(key: str) -> Optional[Dict[str, np.ndarray]]:
+    with _cmf_lock:
+        entry = _cmf_memo.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            _cmf_memo.pop(key, None)
+            return None
+        _cmf_memo.move_to_end(key)
+        return entry[1]
+
+
+def _memo_put(key: str, arrays: Dict[str, np.ndarray]) -> None:
+    with _cmf_lock:
+        _cmf_memo[key] = (time.time() + settings.weather_ttl_seconds, arrays)
+        _cmf_memo.move_to_end(key)
+        while len(_cmf_memo) > _CMF_MEMO_SIZE:
+            _cmf_memo.popitem(last=False)
+
+
+def cmf_expires_at(lat: float, lon: float, tz: str, start_date: str, end_date: str, alpha: float) -> Optional[float]:
+    """Epoch seconds at which the cached CMF arrays of a window expire (shared TTL first); None if not cached."""
+    key = _cmf_key(lat, lon, tz, start_date, end_date, alpha)
+    client = get_raw_redis_client(key)
+    if client:
+        try:
+            ttl = client.ttl(f"{key}:{CADENCES[-1]}")
+            if ttl and ttl > 0:
+                return time.time() + ttl
+        except Exception:
+            pass
+    with _cmf_lock:
+        entry = _cmf_memo.get(key)
+        return entry[0] if entry else None
+
+
+def _load_cmf(key: str) -> Optional[Dict[str, np.ndarray]]:
+    # Per-cadence arrays share the base key's node, so one MGET reads them all
+    client = get_raw_redis_client(key)
+    if not client:
+        return None
+    try:
+        blobs = client.mget([f"{key}:{freq}" for freq in CADENCES])
+    except Exception:
+        return None
+    if not all(blobs):
+        return None
+    return {freq: np.frombuffer(blob, dtype=np.float64) for freq, blob in zip(CADENCES, blobs)}
+
+
+def _store_cmf(key: str, arrays: Dict[str, np.ndarray]) -> None:
+    client = get_raw_redis_client(key)
+    if not client:
+        return
+    try:
+        pipe = client.pipeline()
+        for freq, arr in arrays.items():
+            pipe.setex(f"{key}:{freq}", settings.weather_ttl_seconds, arr.tobytes())
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def weather_cmf(
+    lat: float,
+    lon: float,
+    tz: str,
+    start_date: str,
+    end_date: str,
+    alpha: float,
+    weather: Optional[pd.DataFrame] = None,
+) -> Optional[Dict[str, np.ndarray]]:
+    """Ingested CMF arrays for a weather window: process memo, then Redis, then fetch + ingest.
+
+    Passing freshly fetched ``weather`` re-ingests it and replaces the stored arrays.
+    """
+    key = _cmf_key(lat, lon, tz, start_date, end_date, alpha)
+    if weather is None:
+        arrays = _memo_get(key)
+        if arrays is not None:
+            return arrays
+        arrays = _load_cmf(key)
+        if arrays is not None:
+            _memo_put(key, arrays)
+            return arrays
+        weather = fetch_open_meteo(lat, lon, tz, start_date, end_date)
+    arrays = cmf_arrays_from_weather(lat, lon, tz, start_date, end_date, weather, alpha)
+    if arrays is None:
+        return None
+    _store_cmf(key, arrays)
+    _memo_put(key, arrays)
+    return arrays
+
+
+def cmf_factor_for_index(
+    arrays: Dict[str, np.ndarray], tz: str, start_date: str, index: pd.DatetimeIndex, freq: str
+) -> Optional[np.ndarray]:
+    """Slice the canonical factor array for ``freq`` down to ``index``."""
+    full = arrays.get(freq)
+    if full is None or len(index) == 0:
+        return None
+    step = pd.Timedelta(freq).total_seconds()
+    start = pd.Timestamp(start_date).tz_localize(tz)
+    offset, rem = divmod((index[0] - start).total_seconds(), step)
+    offset = int(offset)
+    if rem or offset < 0 or offset + len(index) > len(full):
+        return None
+    return full[offset : offset + len(index)]
+
+
+def _ensemble_cache_key(lat: float, lon: float, tz: str, start_date: str, end_date: str) -> str:
+    return f"weather:om-ens:{settings.open_meteo_ensemble_models}:{round(lat,3)}:{round(lon,3)}:{tz}:{start_date}:{end_date}"
+
+
+def fetch_open_meteo_ensemble(
+    lat: float, lon: float, tz: str, start_date: str, end_date: str
+) -> Optional[pd.DataFrame]:
+    """Hourly ensemble cloud cover, one ``cloudcover_memberNN`` column per member.
+
+    With ``OPEN_METEO_ENSEMBLE_FIXTURE`` set, the payload is read from that
+    local JSON file (same shape as the ensemble API) instead of the network.
+    """
+    if settings.open_meteo_ensemble_fixture:
+        try:
+            with open(settings.open_meteo_ensemble_fixture) as f:
+                return _to_dataframe(json.load(f), tz)
+        except (OSError, ValueError):
+            return None
+
+    key = _ensemble_cache_key(lat, lon, tz, start_date, end_date)
+    client = get_redis_client(key)
+    if client:
+        try:
+            cached = client.get(key)
+            if cached:
+                df = _to_dataframe(json.loads(cached), tz)
+                if df is not None:
+                    return df
+        except Exception:
+            pass
+
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "timezone": tz,
+        "start_date": start_date,
+        "end_date": end_date,
+        "models": settings.open_meteo_ensemble_models,
+        "hourly": "cloudcover",
+    }
+    try:
+        with httpx.Client(timeout=settings.weather_timeout_seconds) as http:
+            r = http.get(settings.open_meteo_ensemble_url, params=params)
+            if r.status_code != 200:
+                return None
+            data = r.json()
+    except Exception:
+        return None
+
+    if client:
+        try:
+            client.setex(key, settings.weather_ttl_seconds, json.dumps(data))
+        except Exception:
+            pass
+    return _to_dataframe(data, tz)
+
+
+def ensemble_factors(
+    index: pd.DatetimeIndex, weather_df: Optional[pd.DataFrame], alpha: float
+) -> Optional[np.ndarray]:
+    """CMF per ensemble member as a (members x time) array aligned to ``index``."""
+    if weather_df is None or len(weather_df) == 0 or len(index) == 0:
+        return None
+    members = [c for c in weather_df.columns if c.startswith("cloudcover")]
+    cc = weather_df[members].astype(float).ffill().bfill().dropna(axis=1, how="all")
+    if cc.shape[1] < 2:
+        return None
+    hourly = np.clip(1.0 - alpha * (np.clip(cc.to_numpy().T, 0.0, 100.0) / 100.0), 0.0, 1.0)
+    pos = weather_df.index.get_indexer(index, method="nearest")
+    return hourly[:, pos]
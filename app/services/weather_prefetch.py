@@ -0,0 +1,254 @@
+"""Background prefetch of weather for locations in use, ahead of cache expiry.
+
+Weather-aware requests register their location here. A background loop
+re-fetches each location before its cached CMF arrays expire, or shortly
+after the next upstream model run is expected (``WEATHER_MODEL_CADENCE_MINUTES``),
+whichever comes first. Due times carry random jitter so many locations do not
+hit Open-Meteo at once, and at most ``WEATHER_PREFETCH_CONCURRENCY`` fetches
+run in parallel. The forecast window rolls over at local midnight; a location
+whose current window has not been fetched yet is due immediately. Locations
+unused for ``IDLE_SECONDS`` are dropped.
+
+With Redis, only one worker runs the loop: workers compete for a leader key
+(``SET NX`` with a TTL the leader renews every tick), and a leader that dies
+is replaced once its key expires. Every worker announces the locations it
+serves in a shared sorted set scored by last use, which the leader merges
+into its own table each tick. Without Redis each worker prefetches the
+locations it has seen itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import weather_prefetch_leader, weather_prefetch_locations, weather_prefetch_total
+from app.services import weather_open_meteo as wom
+from app.services.cache import _get_client as get_redis_client
+from app.util.timeindex import time_index
+
+
+TICK_SECONDS = 15
+IDLE_SECONDS = 6 * 3600
+# Upstream runs are published with some delay after the nominal cycle time
+MODEL_SETTLE_SECONDS = 600
+RETRY_SECONDS = 60
+LEADER_KEY = "weather-prefetch:leader"
+REGISTRY_KEY = "weather-prefetch:locations"
+# A leader keeps its key across a few slow ticks; a dead one is replaced after this
+LEADER_TTL_SECONDS = 4 * TICK_SECONDS
+# Extend the leader key only while it still holds our id, in one step
+_RENEW_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+)
+# How often a worker re-announces a location it keeps serving
+ANNOUNCE_SECONDS = 300
+
+
+@dataclass
+class _Location:
+    lat: float
+    lon: float
+    tz: str
+    alpha: float
+    window: Tuple[str, str]
+    last_used: float
+    fetched_at: float
+    due: float
+    announced: float = 0.0
+
+
+_lock = threading.Lock()
+_locations: Dict[Tuple[float, float, str, float], _Location] = {}
+# Distinguishes workers forked from one parent (pid) and containers reusing pids (host, nonce)
+_instance = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+
+
+def _worker_id() -> str:
+    return f"{_instance}:{os.getpid()}"
+
+
+def current_window(tz: str) -> Tuple[str, str]:
+    """(start_date, end_date) the engine requests weather for right now."""
+    idx = time_index(tz, settings.max_horizon_days, "60m")
+    return idx[0].strftime("%Y-%m-%d"), idx[-1].strftime("%Y-%m-%d")
+
+
+def next_due(fetched_at: float, expires_at: float) -> float:
+    due = expires_at - settings.weather_prefetch_lead_seconds
+    cadence = settings.weather_model_cadence_minutes * 60
+    if cadence > 0:
+        due = min(due, (fetched_at // cadence + 1) * cadence + MODEL_SETTLE_SECONDS)
+    return due - random.uniform(0, settings.weather_prefetch_jitter_seconds)
+
+
+def _new_location(
+    key: Tuple[float, float, str, float], window: Tuple[str, str], last_used: float, now: float
+) -> _Location:
+    lat, lon, tz, alpha = key
+    expires_at = wom.cmf_expires_at(lat, lon, tz, window[0], window[1], alpha)
+    if expires_at is None:
+        # Not cached anywhere yet: the request that registered it is fetching it now
+        expires_at = now + settings.weather_ttl_seconds
+    fetched_at = expires_at - settings.weather_ttl_seconds
+    return _Location(lat, lon, tz, alpha, window, last_used, fetched_at, next_due(fetched_at, expires_at))
+
+
+def _announce(key: Tuple[float, float, str, float], now: float) -> None:
+    client = get_redis_client()
+    if not client:
+        return
+    try:
+        client.zadd(REGISTRY_KEY, {json.dumps(key): now})
+    except Exception:
+        pass
+
+
+def track(lat: float, lon: float, tz: str, start_date: str, end_date: str, alpha: float) -> None:
+    """Register (or touch) a location served with weather; cheap enough for every request."""
+    if not settings.weather_prefetch_enabled:
+        return
+    key = (round(lat, 3), round(lon, 3), tz, round(alpha, 4))
+    now = time.time()
+    with _lock:
+        loc = _locations.get(key)
+        if loc is not None:
+            loc.last_used = now
+            if now - loc.announced < ANNOUNCE_SECONDS:
+                return
+            loc.announced = now
+    if loc is None:
+        loc = _new_location(key, (start_date, end_date), now, now)
+        loc.announced = now
+        with _lock:
+            _locations.setdefault(key, loc)
+    _announce(key, now)
+
+
+def _is_leader() -> bool:
+    """Take or renew the prefetch leadership; without Redis every worker leads itself."""
+    client = get_redis_client()
+    if not client:
+        return True
+    me = _worker_id()
+    try:
+        if client.set(LEADER_KEY, me, nx=True, ex=LEADER_TTL_SECONDS):
+            return True
+        return bool(client.eval(_RENEW_SCRIPT, 1, LEADER_KEY, me, LEADER_TTL_SECONDS))
+    except Exception:
+        # Not knowing who leads, stand down; once the node is marked down the no-Redis path applies
+        return False
+
+
+def _merge_registry(now: float) -> None:
+    """Add locations other workers announced and refresh last-use times; drop idle registry entries."""
+    client = get_redis_client()
+    if not client:
+        return
+    try:
+        client.zremrangebyscore(REGISTRY_KEY, "-inf", now - IDLE_SECONDS)
+        members = client.zrangebyscore(REGISTRY_KEY, now - IDLE_SECONDS, "+inf", withscores=True)
+    except Exception:
+        return
+    for member, last_used in members:
+        lat, lon, tz, alpha = json.loads(member)
+        key = (lat, lon, tz, alpha)
+        with _lock:
+            loc = _locations.get(key)
+            if loc is not None:
+                loc.last_used = max(loc.last_used, last_used)
+                continue
+        loc = _new_location(key, current_window(tz), last_used, now)
+        with _lock:
+            _locations.setdefault(key, loc)
+
+
+def _drop_idle(now: float) -> None:
+    with _lock:
+        for key, loc in list(_locations.items()):
+            if now - loc.last_used > IDLE_SECONDS:
+                del _locations[key]
+
+
+def _lead(now: float) -> bool:
+    leader = _is_leader()
+    weather_prefetch_leader.set(1 if leader else 0)
+    if leader:
+        _merge_registry(now)
+    else:
+        # Followers only keep announcing what they serve; the leader reports the shared table
+        _drop_idle(now)
+        weather_prefetch_locations.set(0)
+    return leader
+
+
+def _take_due(now: float) -> List[_Location]:
+    due = []
+    windows: Dict[str, Tuple[str, str]] = {}
+    _drop_idle(now)
+    with _lock:
+        weather_prefetch_locations.set(len(_locations))
+        for loc in _locations.values():
+            if loc.tz not in windows:
+                windows[loc.tz] = current_window(loc.tz)
+            if loc.due <= now or loc.window != windows[loc.tz]:
+                # Push the due time out while the fetch runs so the next tick skips it
+                loc.due = now + RETRY_SECONDS
+                due.append(loc)
+    return due
+
+
+def prefetch_location(loc: _Location) -> bool:
+    window = current_window(loc.tz)
+    weather = wom.fetch_open_meteo(loc.lat, loc.lon, loc.tz, window[0], window[1], refresh=True)
+    arrays = None
+    if weather is not None:
+        arrays = wom.weather_cmf(loc.lat, loc.lon, loc.tz, window[0], window[1], loc.alpha, weather=weather)
+    now = time.time()
+    if arrays is None:
+        weather_prefetch_total.labels(result="error").inc()
+        return False
+    with _lock:
+        loc.window = window
+        loc.fetched_at = now
+        loc.due = next_due(now, now + settings.weather_ttl_seconds)
+    weather_prefetch_total.labels(result="ok").inc()
+    return True
+
+
+async def prefetch_due(now: Optional[float] = None) -> int:
+    """Refresh every due location with bounded concurrency; returns the number refreshed."""
+    due = _take_due(time.time() if now is None else now)
+    if not due:
+        return 0
+    sem = asyncio.Semaphore(max(1, settings.weather_prefetch_concurrency))
+
+    async def run(loc: _Location) -> bool:
+        async with sem:
+            try:
+                return await asyncio.to_thread(prefetch_location, loc)
+            except Exception:
+                weather_prefetch_total.labels(result="error").inc()
+                return False
+
+    results = await asyncio.gather(*(run(loc) for loc in due))
+    return sum(results)
+
+
+async def weather_prefetch_loop():
+    if not (settings.weather_enabled and settings.weather_prefetch_enabled):
+        return
+    while True:
+        # Leadership and the registry are Redis round trips: keep them off the event loop
+        if await asyncio.to_thread(_lead, time.time()):
+            await prefetch_due()
+        await asyncio.sleep(TICK_SECONDS)
@@ -0,0 +1,125 @@
+"""Best production windows over a forecast `watts` series.
+
+Window energies for every start position come from one cumulative sum, so a
+duration costs O(n) regardless of its length; several durations share the
+prefix array. Windows are picked greedily by energy without overlaps,
+optionally per local day and within time-of-day bounds.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import time as dtime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+_DURATION_RE = re.compile(r"^(?:(\d+)h)?(?:(\d+)m)?$")
+
+
+def parse_duration(text: str) -> pd.Timedelta:
+    """`2h`, `90m` or `1h30m` as a Timedelta."""
+    m = _DURATION_RE.match(text.strip().lower())
+    if not m or not any(m.groups()):
+        raise ValueError(f"invalid duration '{text}', use e.g. 2h, 90m or 1h30m")
+    duration = pd.Timedelta(hours=int(m.group(1) or 0), minutes=int(m.group(2) or 0))
+    if duration <= pd.Timedelta(0):
+        raise ValueError("duration must be positive")
+    return duration
+
+
+def window_energy(watts: np.ndarray, samples: int, step_hours: float) -> np.ndarray:
+    """Wh of every window of ``samples`` consecutive values (one entry per start)."""
+    if samples > len(watts):
+        return np.empty(0)
+    prefix = np.concatenate(([0.0], np.cumsum(watts, dtype=np.float64)))
+    return (prefix[samples:] - prefix[:-samples]) * step_hours
+
+
+def best_windows(
+    index: pd.DatetimeIndex,
+    watts: np.ndarray,
+    step: pd.Timedelta,
+    durations: Sequence[pd.Timedelta],
+    *,
+    top: int = 1,
+    per_day: bool = False,
+    earliest: Optional[dtime] = None,
+    latest: Optional[dtime] = None,
+) -> Dict[str, List[Dict[str, object]]]:
+    """Top non-overlapping windows per duration.
+
+    ``index`` holds naive local timestamps (as in the payload keys); windows
+    spanning a gap in it (e.g. a DST change) are skipped. ``earliest`` and
+    ``latest`` bound the window's start and end time of day.
+    """
+    stamps = index.asi8
+    watts = np.nan_to_num(np.asarray(watts, dtype=np.float64))
+    step_ns = step.value
+    day_ns = stamps - (stamps % (86400 * 10**9))
+    tod = stamps - day_ns
+    out: Dict[str, List[Dict[str, object]]] = {}
+    for duration in durations:
+        samples = max(1, int(np.ceil(duration.value / step_ns)))
+        energy = window_energy(watts, samples, step_ns / 3.6e12)
+        if not len(energy):
+            out[_label(duration)] = []
+            continue
+        starts = stamps[: len(energy)]
+        ends = starts + samples * step_ns
+        # contiguous in local time, and within the time-of-day bounds of the start day
+        valid = stamps[samples - 1 :] - starts == (samples - 1) * step_ns
+        if earliest is not None:
+            valid &= tod[: len(energy)] >= _tod_ns(earliest)
+        if latest is not None:
+            valid &= ends - day_ns[: len(energy)] <= _tod_ns(latest)
+        groups = day_ns[: len(energy)] if per_day else np.zeros(len(energy), dtype=np.int64)
+        picks = _pick(energy, valid, groups, samples, top)
+        out[_label(duration)] = [
+            {
+                "start": _fmt(starts[i]),
+                "end": _fmt(ends[i]),
+                "watt_hours": round(float(energy[i]), 3),
+                "mean_watts": round(float(energy[i]) / (samples * step_ns / 3.6e12), 3),
+            }
+            for i in picks
+        ]
+    return out
+
+
+def _pick(energy: np.ndarray, valid: np.ndarray, groups: np.ndarray, samples: int, top: int) -> List[int]:
+    """Greedy highest-energy, non-overlapping starts; up to ``top`` per group, in time order."""
+    candidates = np.flatnonzero(valid)
+    order = candidates[np.argsort(-energy[candidates], kind="stable")]
+    taken = np.zeros(len(energy) + samples, dtype=bool)
+    counts: Dict[int, int] = {}
+    picks: List[int] = []
+    limit = top * len(np.unique(groups[candidates]))
+    for i in order:
+        g = int(groups[i])
+        if counts.get(g, 0) >= top or energy[i] <= 0:
+            continue
+        if taken[i : i + samples].any():
+            continue
+        taken[i : i + samples] = True
+        counts[g] = counts.get(g, 0) + 1
+        picks.append(int(i))
+        if len(picks) == limit:
+            break
+    return sorted(picks)
+
+
+def _tod_ns(t: dtime) -> int:
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 10**9
+
+
+def _label(duration: pd.Timedelta) -> str:
+    minutes = int(duration.total_seconds() // 60)
+    hours, minutes = divmod(minutes, 60)
+    return (f"{hours}h" if hours else "") + (f"{minutes}m" if minutes else "")
+
+
+def _fmt(ns: int) -> str:
+    return pd.Timestamp(int(ns)).strftime("%Y-%m-%d %H:%M:%S")
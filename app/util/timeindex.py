@@ -1,4 +1,6 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
 import pandas as pd
 import pytz
 
@@ -34,3 +36,49 @@ def time_index(
     end = start + timedelta(days=horizon_days)
     return pd.date_range(start=start, end=end, freq=freq, tz=tz_name, inclusive="both")
 
+
+def horizon_dates(
+    tz_name: str,
+    horizon_days: int,
+    days: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Optional[Tuple[str, str]]:
+    """Local (first, last) dates selected by ``days`` or ``start``/``end``, clamped to the horizon.
+
+    Returns None when the selection covers the full horizon.
+    """
+    if days is None and start is None and end is None:
+        return None
+    now = now_local(tz_name)
+    today, last = now.date(), (now + timedelta(days=horizon_days)).date()
+    if days is not None:
+        if start is not None or end is not None:
+            raise ValueError("use either days or start/end")
+        if days < 1:
+            raise ValueError("days must be at least 1")
+        first, final = today, today + timedelta(days=days - 1)
+    else:
+        try:
+            first = date.fromisoformat(start) if start else today
+            final = date.fromisoformat(end) if end else last
+        except ValueError:
+            raise ValueError("start and end must be dates (YYYY-MM-DD)")
+        if start and end and first > final:
+            raise ValueError("start must not be after end")
+    first, final = max(first, today), min(final, last)
+    if first > final:
+        raise ValueError(f"requested range is outside the forecast horizon ({today} to {last})")
+    if (first, final) == (today, last):
+        return None
+    return first.isoformat(), final.isoformat()
+
+
+def slice_dates(index: pd.DatetimeIndex, dates: Optional[Tuple[str, str]]) -> pd.DatetimeIndex:
+    """Part of ``index`` on the local dates ``dates`` (inclusive)."""
+    if dates is None:
+        return index
+    local = index.tz_localize(None)
+    first = pd.Timestamp(dates[0])
+    stop = pd.Timestamp(dates[1]) + pd.Timedelta(days=1)
+    return index[(local >= first) & (local < stop)]
@@ -0,0 +1,124 @@
+import time as _time
+
+import pytest
+
+from app.services import redis_conn
+
+
+class FakeRedis:
+    """In-memory stand-in for the small subset of redis-py used by the app."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.published = []
+
+    def _alive(self, key):
+        exp = self.expiry.get(key)
+        if exp is not None and exp <= _time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.data
+
+    def ping(self):
+        return True
+
+    def get(self, key):
+        return self.data.get(key) if self._alive(key) else None
+
+    def ttl(self, key):
+        if not self._alive(key):
+            return -2
+        exp = self.expiry.get(key)
+        return -1 if exp is None else int(exp - _time.time())
+
+    def mget(self, keys):
+        return [self.get(k) for k in keys]
+
+    def setex(self, name, time, value):
+        self.data[name] = value
+        self.expiry[name] = _time.time() + time
+        return True
+
+    def set(self, name, value, nx=False, ex=None):
+        if nx and self._alive(name):
+            return None
+        self.data[name] = value
+        self.expiry.pop(name, None)
+        if ex is not None:
+            self.expiry[name] = _time.time() + ex
+        return True
+
+    def zadd(self, name, mapping):
+        zset = self.data.setdefault(name, {})
+        added = len(set(mapping) - set(zset))
+        zset.update(mapping)
+        return added
+
+    def zrangebyscore(self, name, min, max, withscores=False):
+        lo, hi = float(min), float(max)
+        items = sorted((s, m) for m, s in self.data.get(name, {}).items() if lo <= s <= hi)
+        return [(m, s) for s, m in items] if withscores else [m for _, m in items]
+
+    def zremrangebyscore(self, name, min, max):
+        zset = self.data.get(name, {})
+        gone = self.zrangebyscore(name, min, max)
+        for m in gone:
+            del zset[m]
+        return len(gone)
+
+    def incr(self, name, amount=1):
+        value = int(self.get(name) or 0) + amount
+        self.data[name] = str(value)
+        return value
+
+    def decrby(self, name, amount=1):
+        return self.incr(name, -amount)
+
+    def expire(self, name, time):
+        if not self._alive(name):
+            return False
+        self.expiry[name] = _time.time() + time
+        return True
+
+    def eval(self, script, numkeys, *args):
+        # Only the compare-and-expire used to renew a lock
+        if "expire" not in script:
+            raise NotImplementedError(script)
+        keys, argv = args[:numkeys], args[numkeys:]
+        if self.get(keys[0]) != argv[0]:
+            return 0
+        return int(self.expire(keys[0], int(argv[1])))
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+            return self
+
+        return op
+
+    def execute(self):
+        ops, self.ops = self.ops, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in ops]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    node = redis_conn.primary()
+    monkeypatch.setattr(node, "clients", {True: client, False: client})
+    monkeypatch.setattr(node, "state", "up")
+    return client
@@ -0,0 +1,121 @@
+"""Admission control around cache-miss computation and its stale/503 fallbacks."""
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.main import app
+from app.services import admission
+
+
+client = TestClient(app)
+URL = "/clearsky/54.32/10.12/30/0/5"
+
+
+def _shed(reason, response):
+    labels = {"reason": reason, "response": response}
+    return registry.get_sample_value("admission_shed_total", labels) or 0.0
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(settings, "compute_concurrency", 1)
+    monkeypatch.setattr(settings, "compute_queue_size", 0)
+    monkeypatch.setattr(settings, "compute_deadline_seconds", 0.05)
+
+
+@pytest.fixture
+def saturated(one_slot):
+    """Hold the only compute slot until the test ends."""
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with admission.admitted():
+            entered.set()
+            release.wait(10)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    entered.wait(5)
+    yield
+    release.set()
+    t.join()
+
+
+def test_queue_full_and_deadline(monkeypatch, saturated):
+    with pytest.raises(admission.Overloaded) as exc:
+        with admission.admitted():
+            pass
+    assert exc.value.reason == "queue_full" and exc.value.retry_after >= 1
+
+    monkeypatch.setattr(settings, "compute_queue_size", 1)
+    with pytest.raises(admission.Overloaded) as exc:
+        with admission.admitted():
+            pass
+    assert exc.value.reason == "deadline"
+    assert registry.get_sample_value("compute_queue_depth") == 0
+
+
+def test_waiter_gets_released_slot(one_slot, monkeypatch):
+    monkeypatch.setattr(settings, "compute_queue_size", 1)
+    monkeypatch.setattr(settings, "compute_deadline_seconds", 5)
+    release = threading.Event()
+    order = []
+
+    def first():
+        with admission.admitted():
+            order.append("first")
+            release.wait(5)
+
+    t = threading.Thread(target=first)
+    t.start()
+    while not order:
+        pass
+    threading.Timer(0.05, release.set).start()
+    with admission.admitted():
+        order.append("second")
+    t.join()
+    assert order == ["first", "second"]
+
+
+def test_saturated_miss_gets_503_with_retry_after(fake_redis, saturated):
+    before = _shed("queue_full", "unavailable")
+    r = client.get(URL, params={"time": "30m"})
+    assert r.status_code == 503
+    assert int(r.headers["Retry-After"]) >= 1
+    assert r.json()["message"]["code"] == 503
+    assert _shed("queue_full", "unavailable") == before + 1
+
+
+def test_saturated_miss_serves_stale_and_hits_stay_cached(fake_redis, one_slot):
+    assert client.get(URL).headers["X-Cache"] == "MISS"
+    expired = [k for k in fake_redis.data if k.startswith("resp:")]
+    for k in expired:
+        del fake_redis.data[k]
+    assert client.get(URL, params={"time": "15m"}).headers["X-Cache"] == "MISS"
+
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with admission.admitted():
+            entered.set()
+            release.wait(10)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    entered.wait(5)
+    try:
+        before = _shed("queue_full", "stale")
+        stale = client.get(URL)
+        assert stale.status_code == 200 and stale.headers["X-Cache"] == "STALE"
+        assert stale.headers["Cache-Control"] == "no-cache"
+        assert stale.json()["result"]["watts"]
+        assert _shed("queue_full", "stale") == before + 1
+        # Cached responses do not need a compute slot
+        assert client.get(URL, params={"time": "15m"}).headers["X-Cache"] == "HIT"
+    finally:
+        release.set()
+        t.join()
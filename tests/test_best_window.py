@@ -0,0 +1,93 @@
+"""Prefix-sum sliding windows and the `/best_window` endpoint."""
+
+from datetime import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import cache, windows
+
+
+client = TestClient(app)
+
+STEP = pd.Timedelta("60min")
+
+
+def _series(days=3):
+    index = pd.date_range("2024-06-10", periods=24 * days, freq="60min")
+    watts = np.clip(np.sin((index.hour.to_numpy() - 5) / 15 * np.pi), 0, None) * 1000 * np.repeat([1.0, 0.5, 0.8][:days], 24)
+    return index, watts
+
+
+def test_window_energy_matches_brute_force():
+    watts = np.random.default_rng(0).uniform(0, 1000, 50)
+    energy = windows.window_energy(watts, 4, 0.25)
+    brute = [watts[i : i + 4].sum() * 0.25 for i in range(len(watts) - 3)]
+    np.testing.assert_allclose(energy, brute)
+    assert windows.window_energy(watts, 51, 1.0).size == 0
+
+
+def test_top_windows_do_not_overlap():
+    index, watts = _series()
+    result = windows.best_windows(index, watts, STEP, [pd.Timedelta("2h"), pd.Timedelta("3h")], top=2)
+    assert set(result) == {"2h", "3h"}
+    first, second = result["2h"]
+    assert first["start"] < second["start"]
+    assert pd.Timestamp(first["end"]) <= pd.Timestamp(second["start"])
+    # best 2h on the sunniest day straddles the noon peak
+    assert {w["start"][:10] for w in result["2h"]} == {"2024-06-10"}
+    assert max(w["watt_hours"] for w in result["2h"]) == pytest.approx(max(watts[:-1] + watts[1:]))
+
+
+def test_per_day_and_time_of_day_bounds():
+    index, watts = _series()
+    result = windows.best_windows(
+        index, watts, STEP, [pd.Timedelta("90m")], per_day=True, earliest=time(14, 0), latest=time(18, 0)
+    )["1h30m"]
+    assert [w["start"][:10] for w in result] == ["2024-06-10", "2024-06-11", "2024-06-12"]
+    for w in result:
+        assert w["start"][11:] >= "14:00:00" and w["end"][11:] <= "18:00:00"
+        # 90m rounds up to two hourly samples
+        assert pd.Timestamp(w["end"]) - pd.Timestamp(w["start"]) == pd.Timedelta("2h")
+
+
+def test_parse_duration():
+    assert windows.parse_duration("1h30m") == pd.Timedelta("90min")
+    with pytest.raises(ValueError):
+        windows.parse_duration("soon")
+
+
+def test_endpoint_reads_cached_forecast_and_caches_result(fake_redis):
+    url = "/best_window/52.52/13.405/30/0/5?duration=2h&duration=4h&top=2&per_day=true"
+    r = client.get(url)
+    assert r.headers["X-Cache"] == "MISS"
+    result = r.json()["result"]
+    assert set(result) == {"2h", "4h"}
+    assert result["2h"]
+    # forecast body was stored under the /estimate key, so /estimate is a hit now
+    assert client.get("/estimate/52.52/13.405/30/0/5").headers["X-Cache"] == "HIT"
+    again = client.get(url)
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.json()["result"] == result
+
+
+def test_refreshed_forecast_is_not_answered_with_older_windows(fake_redis):
+    url = "/best_window/52.52/13.405/30/0/5?duration=2h"
+    first = client.get(url).json()["result"]
+    key = next(k for k in fake_redis.data if k.startswith("resp:") and k.count(":") == 1)
+    # the refresher rewrites the forecast: half the power everywhere
+    payload = cache.get_cached(key)
+    payload["watts"] = {t: w / 2 for t, w in payload["watts"].items()}
+    cache.set_cached(key, payload)
+    r = client.get(url)
+    assert r.headers["X-Cache"] == "MISS"
+    assert r.json()["result"]["2h"][0]["watt_hours"] < first["2h"][0]["watt_hours"]
+    assert client.get(url).headers["X-Cache"] == "HIT"
+
+
+def test_endpoint_rejects_bad_duration():
+    r = client.get("/best_window/52.52/13.405/30/0/5?duration=later")
+    assert r.json()["message"]["code"] == 400
@@ -0,0 +1,122 @@
+"""Incremental per-site calibration: RLS fit, persistence and engine application."""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+import pytz
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services import calibration, forecast_engine
+from app.services.cache import make_site_id
+from app.util import timeindex
+
+
+client = TestClient(app)
+AUTH = {"Authorization": "Bearer s3cret"}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "calibration_db_path", str(tmp_path / "calibration.sqlite"))
+    monkeypatch.setattr(settings, "calibration_token", "s3cret")
+
+
+def _telemetry(rng, n, gain, curvature, pnom=5000.0):
+    predicted = rng.uniform(0.05, 0.95, n) * pnom
+    u = predicted / pnom
+    measured = pnom * (gain * u + curvature * u * u) + rng.normal(0, 5.0, n)
+    return predicted, measured
+
+
+def test_batches_converge_like_a_full_fit(db):
+    rng = np.random.default_rng(1)
+    truth = {"a": (0.9, -0.05), "b": (1.05, -0.15), "c": (0.8, 0.0)}
+    for _ in range(4):  # four batches, sites interleaved
+        ids, pred, meas = [], [], []
+        for site, (g, c) in truth.items():
+            p, m = _telemetry(rng, 200, g, c)
+            ids += [site] * len(p)
+            pred.append(p)
+            meas.append(m)
+        order = rng.permutation(len(ids))
+        profiles = calibration.ingest(
+            np.array(ids)[order], np.concatenate(pred)[order], np.concatenate(meas)[order], np.full(len(ids), 5000.0),
+            forgetting=1.0,
+        )
+    for site, (g, c) in truth.items():
+        assert profiles[site].gain == pytest.approx(g, abs=0.01)
+        assert profiles[site].curvature == pytest.approx(c, abs=0.02)
+        assert profiles[site].samples == 800
+        assert calibration.get_profile(site).gain == pytest.approx(profiles[site].gain)
+
+
+def test_concurrent_uploads_for_a_site_both_count(db, monkeypatch):
+    load = calibration._load_state
+
+    def slow_load(sites):
+        state = load(sites)
+        time.sleep(0.2)  # the other upload reads in this gap unless the read is locked
+        return state
+
+    monkeypatch.setattr(calibration, "_load_state", slow_load)
+    p, m = _telemetry(np.random.default_rng(3), 50, 0.9, 0.0)
+    threads = [threading.Thread(target=calibration.ingest, args=(["a"] * 50, p, m, [5000.0] * 50)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calibration.get_profile("a").samples == 100
+
+
+def test_night_and_invalid_samples_ignored(db):
+    profiles = calibration.ingest(["a"] * 3, [0.0, np.nan, 10.0], [50.0, 1.0, 0.0], [5000.0] * 3)
+    assert profiles == {}
+    assert calibration.get_profile("a") is None
+
+
+def test_estimate_applies_profile_clearsky_does_not(db, monkeypatch):
+    fixed = pytz.timezone(settings.timezone).localize(datetime(2024, 6, 10))
+    monkeypatch.setattr(timeindex, "now_local", lambda tz: fixed)
+    monkeypatch.setattr(settings, "max_horizon_days", 1)
+    kwargs = dict(lat=52.52, lon=13.405, tilt=30, azimuth_convention=0, kwp=5, resolution="60m")
+    base = forecast_engine.forecast_arrays(**kwargs)
+    site = make_site_id(lat=52.52, lon=13.405, tilt=30, azimuth=0, kwp=5)
+    calibration.ingest([site] * 50, np.full(50, 2500.0), np.full(50, 2000.0), np.full(50, 5000.0))
+    cal = forecast_engine.forecast_arrays(**kwargs, calibrate=True)
+    day = base.watts > 0
+    assert np.all(cal.watts[day] < base.watts[day])
+    assert np.all(cal.watts[~day] == 0)
+    assert np.array_equal(forecast_engine.forecast_arrays(**kwargs).watts, base.watts)
+
+
+def test_calibrate_endpoint(db):
+    rng = np.random.default_rng(2)
+    p, m = _telemetry(rng, 100, 0.9, 0.0, pnom=8000.0)
+    body = [{"lat": 48.1, "lon": 11.5, "declination": 30, "azimuth": 90, "kwp": 4, "planes": [[30, -90, 4]],
+             "predicted": p.tolist(), "measured": m.tolist()}]
+    r = client.post("/calibrate", json=body, headers=AUTH)
+    profile = r.json()["result"]["profiles"][0]
+    assert profile["samples"] == 100
+    assert profile["gain"] == pytest.approx(0.9, abs=0.05)
+    body[0]["measured"] = body[0]["measured"][:-1]
+    assert client.post("/calibrate", json=body, headers=AUTH).json()["message"]["code"] == 400
+
+
+def test_calibrate_requires_token(db, monkeypatch):
+    assert client.post("/calibrate", json=[]).status_code == 401
+    assert client.post("/calibrate", json=[], headers={"X-Calibration-Token": "wrong"}).status_code == 401
+    assert client.post("/calibrate", json=[], headers={"X-Calibration-Token": "s3cret"}).status_code == 200
+    # no token configured: uploads are refused outright
+    monkeypatch.setattr(settings, "calibration_token", "")
+    assert client.post("/calibrate", json=[], headers=AUTH).status_code == 401
+
+
+def test_calibrate_disabled(db, monkeypatch):
+    monkeypatch.setattr(settings, "calibration_db_path", "")
+    r = client.post("/calibrate", json=[], headers=AUTH)
+    assert r.json()["message"]["code"] == 503
@@ -0,0 +1,71 @@
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import cli
+from app.services.forecast_engine import forecast_arrays, round_values
+
+
+SITES = """id,lat,lon,declination,azimuth,kwp,planes
+a,54.32,10.12,30,0,5,
+"b, east",48.1,11.5,45,-90,7.5,20/90/2
+c,95,0,30,0,5,
+"""
+
+
+def _sites():
+    return cli.read_sites(io.StringIO(SITES))
+
+
+def test_read_sites():
+    sites = _sites()
+    assert [s.id for s in sites] == ["a", "b, east", "c"]
+    assert sites[1].planes == [(20.0, 90.0, 2.0)]
+    assert sites[0].time == "60m" and sites[0].source == "clearsky"
+    with pytest.raises(ValueError, match="row 1"):
+        cli.read_sites(io.StringIO("lat,lon,declination,azimuth\n1,2,3,4\n"))
+
+
+def test_chunks_written_in_order_with_errors():
+    out = io.BytesIO()
+    with ThreadPoolExecutor(2) as executor:
+        ok, errors = cli.run_forecast(
+            _sites(), cli._CsvWriter(out, False), executor=executor, workers=2, chunk_size=1, daily=False, fmt="csv"
+        )
+    assert ok == 2 and [e[0] for e in errors] == ["c"]
+
+    rows = list(csv.reader(io.StringIO(out.getvalue().decode())))
+    assert rows[0] == ["site", "timestamp", "watts", "watt_hours"]
+    expected = forecast_arrays(lat=54.32, lon=10.12, tilt=30, azimuth_convention=0, kwp=5, resolution="60m")
+    a_rows = [r for r in rows[1:] if r[0] == "a"]
+    assert [float(r[2]) for r in a_rows] == round_values(expected.watts)
+    assert rows[len(a_rows) + 1][0] == "b, east"
+    assert {r[0] for r in rows[1:]} == {"a", "b, east"}
+
+
+def test_main_daily_csv(tmp_path, capsys):
+    sites = tmp_path / "sites.csv"
+    sites.write_text(SITES)
+    out = tmp_path / "daily.csv"
+    assert cli.main(["forecast", str(sites), "-o", str(out), "--daily", "-j", "1"]) == 1  # site c fails
+    rows = list(csv.DictReader(out.open()))
+    assert {r["site"] for r in rows} == {"a", "b, east"}
+    assert all(float(r["watt_hours"]) >= 0 for r in rows)
+    err = capsys.readouterr().err
+    assert "3/3 sites" in err
+    assert "2 sites (1 failed)" in err and "site c:" in err
+
+
+def test_parquet_output(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    out = tmp_path / "out.parquet"
+    writer = cli._ParquetWriter(str(out))
+    with ThreadPoolExecutor(1) as executor:
+        cli.run_forecast(
+            _sites()[:2], writer, executor=executor, workers=1, chunk_size=1, daily=False, fmt="parquet"
+        )
+    table = pq.read_table(out)
+    assert table.column_names == ["site", "timestamp", "watts", "watt_hours"]
+    assert pq.ParquetFile(out).num_row_groups == 2
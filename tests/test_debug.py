@@ -0,0 +1,91 @@
+import pstats
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app, create_app
+from app.services import profiling
+
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "debug_token", TOKEN)
+    return TestClient(create_app())
+
+
+def _busy(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    t = threading.Thread(target=_busy, args=(stop,), name="busy")
+    t.start()
+    yield
+    stop.set()
+    t.join()
+
+
+def test_disabled_by_default():
+    assert not settings.debug_token
+    assert TestClient(app).get("/debug/profile", params={"seconds": 0.1}).status_code == 404
+
+
+def test_token_required(client):
+    assert client.get("/debug/profile", params={"seconds": 0.1}).status_code == 401
+    assert client.get("/debug/profile", params={"seconds": 0.1}, headers={"X-Debug-Token": "nope"}).status_code == 401
+    assert client.post("/debug/tracemalloc/start").status_code == 401
+    r = client.get("/debug/profile", params={"seconds": 0.1}, headers={"Authorization": f"Bearer {TOKEN}"})
+    assert r.status_code == 200
+    r = client.get("/debug/profile", params={"seconds": 3600}, headers={"X-Debug-Token": TOKEN})
+    assert r.status_code == 400
+
+
+def test_sampled_profile_formats(client, busy_thread, tmp_path):
+    headers = {"X-Debug-Token": TOKEN}
+    r = client.get("/debug/profile", params={"seconds": 0.3}, headers=headers)
+    busy = [line for line in r.text.splitlines() if line.startswith("busy;")]
+    assert busy and all("_busy (" in line for line in busy)
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in busy)
+
+    r = client.get("/debug/profile", params={"seconds": 0.3, "format": "pstats"}, headers=headers)
+    assert "_busy" in r.text and "cumulative" in r.text
+
+    r = client.get("/debug/profile", params={"seconds": 0.3, "format": "prof"}, headers=headers)
+    path = tmp_path / "p.prof"
+    path.write_bytes(r.content)
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == "_busy" for func in stats.stats)
+
+
+def test_concurrent_capture_rejected():
+    t = threading.Thread(target=profiling.sample, args=(0.3,))
+    t.start()
+    time.sleep(0.05)
+    with pytest.raises(profiling.CaptureBusy):
+        profiling.sample(0.01)
+    t.join()
+
+
+def test_tracemalloc_snapshot_diff(client):
+    headers = {"X-Debug-Token": TOKEN}
+    assert client.get("/debug/tracemalloc/snapshot", headers=headers).status_code == 409
+    assert client.post("/debug/tracemalloc/start", headers=headers).json() == {"tracing": True, "started": True}
+    try:
+        assert "allocation sites" in client.get("/debug/tracemalloc/snapshot", headers=headers).text
+        leak = [bytearray(10_000) for _ in range(200)]
+        r = client.get("/debug/tracemalloc/snapshot", params={"diff": True}, headers=headers)
+        assert "differences since the previous snapshot" in r.text
+        assert "test_debug.py" in r.text.split("\n", 3)[2]
+        del leak
+    finally:
+        client.post("/debug/tracemalloc/stop", headers=headers)
+    assert "tracemalloc is not running" in client.get("/debug/tracemalloc/snapshot", headers=headers).text
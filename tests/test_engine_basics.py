@@ -1,6 +1,10 @@
+import numpy as np
 import pandas as pd
 
+from app.models.site import Plane
+from app.services import forecast_engine as fe
 from app.services.forecast_engine import compute_forecast
+from app.services.geometry import site_geometry
 
 
 def test_engine_output_types():
@@ -10,3 +14,29 @@ def test_engine_output_types():
     assert set(out.keys()) == {"watts", "watt_hours", "watt_hours_day"}
     assert isinstance(next(iter(out["watts"].values()), 0.0), float)
 
+
+def test_daylight_mask_keeps_output_identical(monkeypatch):
+    kwargs = dict(lat=69.6, lon=18.9, tilt=60, azimuth_convention=10, kwp=4, resolution="15m")
+    masked = fe.forecast_arrays(**kwargs)
+    monkeypatch.setattr(fe, "DAYLIGHT_ZENITH_DEG", 180.0)
+    full = fe.forecast_arrays(**kwargs)
+    assert np.array_equal(masked.watts, full.watts)
+    assert not np.signbit(masked.watts).any()
+
+
+def test_daylight_mask_zero_at_night():
+    idx = fe._build_index("60m")
+    geom = site_geometry(54.32, 10.12, idx)
+    ac = fe._planes_ac(
+        [Plane(tilt=30, azimuth_conv=0, kwp=5), Plane(tilt=10, azimuth_conv=90, kwp=2)],
+        solar_zenith=geom.zenith,
+        solar_azimuth=geom.azimuth,
+        dni=np.stack([geom.dni, geom.dni * 0.5]),
+        ghi=np.stack([geom.ghi, geom.ghi * 0.5]),
+        dhi=np.stack([geom.dhi, geom.dhi * 0.5]),
+        dni_extra=geom.dni_extra,
+    )
+    night = geom.zenith >= fe.DAYLIGHT_ZENITH_DEG
+    assert ac.shape == (2, 2, len(idx))
+    assert night.any() and (ac[..., night] == 0).all()
+    assert (ac[..., ~night] > 0).any()
@@ -0,0 +1,124 @@
+"""Quantile bands from ensemble weather, evaluated as one members x time pass."""
+
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services import calibration, forecast_engine
+from app.services import weather_open_meteo as wom
+from app.services.cache import make_site_id
+from app.services.formats import columnar, to_csv
+from app.util import timeindex
+
+
+client = TestClient(app)
+
+TZ = "Europe/Berlin"
+MEMBERS = 8
+
+
+@pytest.fixture
+def ensemble(tmp_path, monkeypatch):
+    fixed = pytz.timezone(TZ).localize(datetime(2024, 6, 10))
+    monkeypatch.setattr(timeindex, "now_local", lambda tz: fixed)
+    monkeypatch.setattr(settings, "max_horizon_days", 2)
+    times = pd.date_range("2024-06-10", periods=72, freq="60min")
+    hourly = {"time": [t.strftime("%Y-%m-%dT%H:%M") for t in times]}
+    for m in range(MEMBERS):
+        hourly[f"cloudcover_member{m:02d}"] = [100.0 * m / (MEMBERS - 1)] * len(times)
+    path = tmp_path / "ensemble.json"
+    path.write_text(json.dumps({"hourly": hourly}))
+    monkeypatch.setattr(settings, "open_meteo_ensemble_fixture", str(path))
+    # deterministic weather unavailable: the main forecast falls back to clear-sky
+    monkeypatch.setattr(forecast_engine, "weather_cmf", lambda *a, **k: None)
+    monkeypatch.setattr(forecast_engine, "fetch_open_meteo", lambda *a, **k: None)
+
+
+def _arrays(**kwargs):
+    return forecast_engine.forecast_arrays(
+        lat=52.52, lon=13.405, tilt=30, azimuth_convention=0, kwp=5, resolution="60m",
+        source="open-meteo", **kwargs,
+    )
+
+
+def test_factors_are_members_by_time(ensemble):
+    idx = forecast_engine._build_index("15m")
+    df = wom.fetch_open_meteo_ensemble(52.52, 13.405, TZ, "2024-06-10", "2024-06-12")
+    factors = wom.ensemble_factors(idx, df, 0.75)
+    assert factors.shape == (MEMBERS, len(idx))
+    np.testing.assert_allclose(factors[:, 0], 1 - 0.75 * np.arange(MEMBERS) / (MEMBERS - 1))
+
+
+def test_bands_match_per_member_forecasts(ensemble, monkeypatch):
+    arrays = _arrays(quantiles=True)
+    assert set(arrays.watts_bands) == {"p10", "p50", "p90"}
+    p10, p50, p90 = (arrays.watts_bands[k] for k in ("p10", "p50", "p90"))
+    assert np.all(p10 <= p50) and np.all(p50 <= p90)
+    assert p90.max() > p10.max() > 0
+    # cloud-free member bounds the upper band; the deterministic run is clear-sky here
+    assert np.all(p90 <= arrays.watts + 1e-6)
+
+    # reference: one scalar-factor forecast per member
+    members = []
+    for m in range(MEMBERS):
+        factor = 1 - 0.75 * m / (MEMBERS - 1)
+        monkeypatch.setattr(forecast_engine, "weather_cmf", lambda *a, **k: {})
+        monkeypatch.setattr(forecast_engine, "cmf_factor_for_index", lambda *a, f=factor: np.full(len(arrays.index), f))
+        members.append(_arrays().watts)
+    np.testing.assert_allclose(p50, np.percentile(np.array(members), 50, axis=0), atol=1e-2)
+
+    daily = forecast_engine._daily_wh_rows(np.array(members), arrays.index)
+    np.testing.assert_allclose(
+        arrays.watt_hours_day_bands["p10"], np.percentile(daily, 10, axis=0), rtol=1e-6
+    )
+
+
+def test_calibrated_bands_bracket_calibrated_forecast(ensemble, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "calibration_db_path", str(tmp_path / "calibration.sqlite"))
+    # deterministic run at 50 % cloud cover, between the middle members
+    monkeypatch.setattr(forecast_engine, "weather_cmf", lambda *a, **k: {})
+    monkeypatch.setattr(forecast_engine, "cmf_factor_for_index", lambda arrays, tz, start, idx, res: np.full(len(idx), 0.625))
+    site = make_site_id(lat=52.52, lon=13.405, tilt=30, azimuth=0, kwp=5)
+    calibration.ingest([site] * 50, np.full(50, 2500.0), np.full(50, 1000.0), np.full(50, 5000.0))
+    base = _arrays(quantiles=True)
+    cal = _arrays(quantiles=True, calibrate=True)
+    day = base.watts > 0
+    assert np.all(cal.watts[day] < base.watts[day])
+    for arrays in (base, cal):
+        p10, p90 = arrays.watts_bands["p10"], arrays.watts_bands["p90"]
+        assert np.all(p10 <= arrays.watts + 1e-6) and np.all(arrays.watts <= p90 + 1e-6)
+        d10, d90 = arrays.watt_hours_day_bands["p10"], arrays.watt_hours_day_bands["p90"]
+        assert np.all(d10 <= arrays.watt_hours_day + 1e-3) and np.all(arrays.watt_hours_day <= d90 + 1e-3)
+    # the profile scales the members, so the band narrows with the forecast
+    assert np.all(cal.watts_bands["p90"][day] < base.watts_bands["p90"][day])
+
+
+def test_bands_in_payload_and_formats(ensemble):
+    arrays = _arrays(quantiles=True)
+    payload = forecast_engine.to_payload(arrays)
+    assert list(payload["watts_p10"]) == list(payload["watts"])
+    assert list(payload["watt_hours_day_p90"]) == list(payload["watt_hours_day"])
+    assert len(columnar(arrays)["watts_p50"]) == len(arrays.index)
+    assert to_csv(arrays).splitlines()[0] == "timestamp,watts,watt_hours,watts_p10,watts_p50,watts_p90"
+
+
+def test_no_bands_without_request_or_ensemble(ensemble, monkeypatch):
+    assert _arrays().watts_bands is None
+    monkeypatch.setattr(settings, "open_meteo_ensemble_fixture", "/nonexistent.json")
+    assert "watts_p10" not in forecast_engine.to_payload(_arrays(quantiles=True))
+
+
+def test_estimate_quantiles_query(ensemble):
+    r = client.get("/estimate/52.52/13.405/30/0/5?source=open-meteo&quantiles=true")
+    result = r.json()["result"]
+    assert {"watts_p10", "watts_p50", "watts_p90", "watt_hours_day_p50"} <= set(result)
+    # bands need ensemble weather, so clear-sky requests ignore the flag
+    r = client.get("/estimate/52.52/13.405/30/0/5?quantiles=true")
+    assert "watts_p10" not in r.json()["result"]
@@ -0,0 +1,49 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.common import etag_matches
+from app.main import app
+from app.services import cache
+
+
+client = TestClient(app)
+URL = "/clearsky/54.32/10.12/30/0/5"
+
+
+def test_etag_matches_list_and_weak():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_conditional_get_without_store_returns_304():
+    r1 = client.get(URL)
+    etag = r1.headers["ETag"]
+    r2 = client.get(URL, headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.headers["ETag"] == etag
+    assert r2.content == b""
+
+
+def test_conditional_get_served_from_stored_etag(fake_redis, monkeypatch):
+    r1 = client.get(URL)
+    etag = r1.headers["ETag"]
+
+    # A matching revalidation must not load or parse the cached body
+    real_loads = cache.json.loads
+
+    def fail_loads(*_):
+        raise AssertionError("body was deserialized")
+
+    monkeypatch.setattr(cache.json, "loads", fail_loads)
+    r2 = client.get(URL, headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+
+    monkeypatch.setattr(cache.json, "loads", real_loads)
+    r3 = client.get(URL, headers={"If-None-Match": '"stale"'})
+    assert r3.status_code == 200
+    assert r3.headers["X-Cache"] == "HIT"
+    assert r3.headers["ETag"] == etag
+    assert json.loads(r3.content)["result"]["watts"]
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api import export
+from app.core.config import settings
+from app.main import app, create_app
+from app.models.spec import ForecastSpec
+from app.services.admission import Overloaded
+
+
+client = TestClient(app)
+
+
+def test_export_streams_one_line_per_site():
+    sites = [
+        {"id": "a", "lat": 54.32, "lon": 10.12, "declination": 30, "azimuth": 0, "kwp": 5},
+        {"id": "b", "lat": 48.1, "lon": 11.5, "declination": 30, "azimuth": 90, "kwp": 4, "planes": [[30, -90, 4]]},
+        {"id": "bad", "lat": 48.1, "lon": 11.5, "declination": 30, "azimuth": 0, "kwp": 5000},
+    ]
+    r = client.post("/export", json=sites)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    by_id = {line["site"]["id"]: line for line in lines}
+    assert set(by_id) == {"a", "b", "bad"}
+    assert by_id["a"]["result"]["watts"]
+    assert "error" in by_id["bad"]
+
+
+def test_export_columnar_format():
+    sites = [{"lat": 54.32, "lon": 10.12, "declination": 30, "azimuth": 0, "kwp": 5}]
+    r = client.post("/export?format=columnar", json=sites)
+    line = json.loads(r.text.splitlines()[0])
+    assert line["result"]["step"] == 3600
+
+
+SITE = {"lat": 54.32, "lon": 10.12, "declination": 30, "azimuth": 0, "kwp": 5}
+
+
+def test_export_charges_each_site_against_rate_limit(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_per_minute", 3)
+    limited = TestClient(create_app())
+    r = limited.post("/export", json=[SITE] * 4, headers={"X-Forwarded-For": "203.0.113.7"})
+    assert r.status_code == 429 and r.headers["X-RateLimit-Limit"] == "3"
+    r = limited.post("/export", json=[SITE] * 3, headers={"X-Forwarded-For": "203.0.113.8"})
+    assert r.status_code == 200 and len(r.text.splitlines()) == 3
+
+
+def test_rejected_export_does_not_use_up_the_window(monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "rate_limit_per_minute", 3)
+    limited = TestClient(create_app())
+    headers = {"X-Forwarded-For": "203.0.113.9"}
+    assert limited.post("/export", json=[SITE] * 4, headers=headers).status_code == 429
+    r = limited.post("/export", json=[SITE] * 2, headers=headers)
+    assert r.status_code == 200 and len(r.text.splitlines()) == 2
+
+
+def test_registry_export_requires_debug_token(monkeypatch):
+    monkeypatch.setattr(settings, "debug_token", "")
+    assert client.get("/export").status_code == 401
+    monkeypatch.setattr(settings, "debug_token", "secret")
+    assert client.get("/export", headers={"X-Debug-Token": "wrong"}).status_code == 401
+    assert client.get("/export", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_shed_site_gets_error_line_with_retry_after(monkeypatch):
+    def overloaded(spec):
+        raise Overloaded("queue_full", 7)
+
+    monkeypatch.setattr(export, "issue_forecast", overloaded)
+    site = dict(SITE, id="shed", lat=47.11)
+    line = json.loads(client.post("/export", json=[site]).text)
+    assert line["site"]["id"] == "shed"
+    assert line["retry_after"] == 7 and "shed" in line["error"]
+
+
+def _run(coro):
+    # private loop, so the app's default event loop is left alone
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_stream_export_pulls_sites_lazily(monkeypatch):
+    monkeypatch.setattr(export, "_export_line", lambda spec, site_id: b"{}\n")
+    spec = ForecastSpec(endpoint="estimate", lat=0, lon=0, tilt=0, azimuth=0, kwp=1, resolution="60m", source="clearsky")
+    pulled = []
+
+    def items():
+        for i in range(50):
+            pulled.append(i)
+            yield spec, str(i)
+
+    async def first_line():
+        stream = export.stream_export(items(), concurrency=3)
+        await stream.__anext__()
+        seen = len(pulled)
+        await stream.aclose()
+        return seen
+
+    # only the in-flight window (plus its refill) is pulled before the client reads on
+    assert _run(first_line()) <= 4
+
+    async def consume():
+        return [line async for line in export.stream_export(items(), concurrency=3)]
+
+    pulled.clear()
+    assert len(_run(consume())) == 50
@@ -0,0 +1,40 @@
+import json
+
+import msgpack
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.formats import negotiate_format
+
+
+client = TestClient(app)
+URL = "/clearsky/54.32/10.12/30/0/5"
+
+
+def test_negotiate_format():
+    assert negotiate_format("csv", "application/msgpack") == "csv"
+    assert negotiate_format(None, "text/csv;q=0.9, */*") == "csv"
+    assert negotiate_format(None, "application/json") == "json"
+    assert negotiate_format(None, None) == "json"
+
+
+def test_columnar_matches_default_payload():
+    default = client.get(URL).json()["result"]
+    r = client.get(URL, params={"format": "columnar"})
+    assert r.headers["content-type"].startswith("application/vnd.solarforecast.columnar+json")
+    col = json.loads(r.content)
+    assert col["step"] == 3600
+    # the keyed payload collapses the repeated hour at a DST fall-back; columnar keeps it
+    assert col["watts"][:24] == list(default["watts"].values())[:24]
+    assert dict(zip(col["days"], col["watt_hours_day"])) == default["watt_hours_day"]
+    assert len(r.content) < len(json.dumps(default))
+
+
+def test_csv_and_msgpack():
+    csv = client.get(URL, headers={"Accept": "text/csv"})
+    lines = csv.text.strip().splitlines()
+    assert lines[0] == "timestamp,watts,watt_hours"
+    mp = client.get(URL, params={"format": "msgpack"})
+    doc = msgpack.unpackb(mp.content)
+    assert len(doc["watts"]) == len(lines) - 1
+    assert mp.headers["ETag"]
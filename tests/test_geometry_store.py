@@ -0,0 +1,95 @@
+"""Cross-worker geometry store: mapped entries match the direct computation and are computed once."""
+
+import mmap
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.services import geometry_store
+from app.services.geometry import FIELDS, site_geometry
+from app.util.timeindex import time_index
+
+
+LAT, LON = 54.32, 10.12
+
+
+def _count(result):
+    return registry.get_sample_value("geometry_store_lookups_total", {"result": result}) or 0.0
+
+
+def _backing(array):
+    while isinstance(array, np.ndarray):
+        array = array.base
+    return array.obj if isinstance(array, memoryview) else array
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "geometry_shm_dir", str(tmp_path))
+    geometry_store.reset()
+    yield tmp_path
+    geometry_store.reset()
+
+
+def _lookup(resolution):
+    # Runs in a forked worker: fresh process memo, same store directory
+    geometry_store.reset()
+    before = _count("miss")
+    geometry_store.shared_geometry(LAT, LON, time_index(settings.timezone, settings.max_horizon_days, resolution))
+    return _count("miss") - before
+
+
+def test_matches_direct_computation_and_maps_shared_file(store):
+    index = time_index(settings.timezone, settings.max_horizon_days, "15m")
+    expected = site_geometry(LAT, LON, index)
+    misses = _count("miss")
+
+    geom = geometry_store.shared_geometry(LAT, LON, index)
+    assert _count("miss") == misses + 1
+    assert len(list(store.glob("*.geo"))) == 1
+    for f in FIELDS:
+        np.testing.assert_array_equal(getattr(geom, f), getattr(expected, f))
+
+    # Another worker (no memo) maps the same file; a later window on the same days is a view of it
+    geometry_store.reset()
+    hits = _count("hit")
+    later = geometry_store.shared_geometry(LAT, LON, index[3:])
+    assert _count("hit") == hits + 1 and _count("miss") == misses + 1
+    assert not later.ghi.flags.writeable and isinstance(_backing(later.ghi), mmap.mmap)
+    np.testing.assert_array_equal(later.zenith, expected.zenith[3:])
+
+
+def test_concurrent_workers_compute_an_entry_once(store):
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("fork")) as pool:
+        misses = list(pool.map(_lookup, ["30m"] * 4))
+    assert sum(misses) == 1
+    assert len(list(store.glob("*.geo"))) == 1
+
+
+def test_sweep_removes_expired_then_oldest(store, monkeypatch):
+    for resolution in ("60m", "30m", "15m"):
+        geometry_store.shared_geometry(LAT, LON, time_index(settings.timezone, 2, resolution))
+    files = sorted(store.glob("*.geo"), key=lambda p: p.stat().st_size)
+    now = time.time()
+    os.utime(files[0], (now - settings.geometry_shm_ttl_seconds - 1,) * 2)
+    os.utime(files[1], (now - 10,) * 2)
+    assert geometry_store.sweep(now) == 1
+    assert not files[0].exists() and files[1].exists()
+
+    monkeypatch.setattr(settings, "geometry_shm_max_mb", 0)
+    assert geometry_store.sweep(now) == 2
+    assert not list(store.glob("*.geo"))
+
+
+def test_disabled_computes_directly(monkeypatch):
+    monkeypatch.setattr(settings, "geometry_shm_dir", "")
+    index = time_index(settings.timezone, 1, "60m")
+    lookups = _count("hit") + _count("miss")
+    geom = geometry_store.shared_geometry(LAT, LON, index)
+    assert geom.ghi.flags.writeable and _count("hit") + _count("miss") == lookups
@@ -0,0 +1,123 @@
+"""Append-only daily history store and the `/history` endpoint."""
+
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.models.spec import ForecastSpec
+from app.services import calibration, history_store
+from app.services.cache import make_site_id
+from app.services.forecast_engine import spec_arrays
+from app.util import timeindex
+
+
+client = TestClient(app)
+
+SPEC = ForecastSpec(
+    endpoint="clearsky", lat=52.52, lon=13.405, tilt=30, azimuth=0, kwp=5, resolution="60m", source="clearsky"
+)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "history_db_path", str(tmp_path / "history.sqlite"))
+    monkeypatch.setattr(settings, "max_horizon_days", 3)
+    # fixed dates in the past; pruning has its own test
+    monkeypatch.setattr(settings, "history_retention_days", 0)
+
+
+def _at(monkeypatch, when):
+    fixed = pytz.timezone(settings.timezone).localize(when)
+    monkeypatch.setattr(timeindex, "now_local", lambda tz: fixed)
+
+
+def _issue_at(monkeypatch, when):
+    _at(monkeypatch, when)
+    arrays = history_store.issue_forecast(SPEC)
+    history_store.flush()
+    return dict(zip(arrays.days, arrays.watt_hours_day.tolist()))
+
+
+def _arrays_for(monkeypatch, when, spec=SPEC):
+    _at(monkeypatch, when)
+    return spec_arrays(spec)
+
+
+def test_only_complete_days_recorded(store, monkeypatch):
+    totals = _issue_at(monkeypatch, datetime(2024, 6, 10, 9, 30))
+    history = history_store.daily_history(SPEC, "2024-06-01", "2024-06-30")
+    # issued mid-morning: today and the last (partial) day are skipped
+    assert list(history) == ["2024-06-11", "2024-06-12"]
+    assert history["2024-06-11"] == pytest.approx(totals["2024-06-11"], abs=1e-3)
+
+
+def test_latest_issue_wins_and_range_is_respected(store, monkeypatch):
+    other = SPEC.model_copy(update={"kwp": 10})
+    history_store.record_forecast(SPEC, _arrays_for(monkeypatch, datetime(2024, 6, 9)), issued=100)
+    history_store.record_forecast(other, _arrays_for(monkeypatch, datetime(2024, 6, 9), other), issued=150)
+    history_store.record_forecast(SPEC, _arrays_for(monkeypatch, datetime(2024, 6, 10)), issued=200)
+    history_store.flush()
+    history = history_store.daily_history(SPEC, "2024-06-09", "2024-06-10")
+    assert list(history) == ["2024-06-09", "2024-06-10"]
+    newer = history_store.daily_history(SPEC, "2024-06-10", "2024-06-10")
+    assert newer == {"2024-06-10": history["2024-06-10"]}
+    # a site twice the size is stored separately
+    assert history_store.daily_history(other, "2024-06-09", "2024-06-09")["2024-06-09"] > history["2024-06-09"]
+
+
+def test_old_days_are_pruned(store, monkeypatch):
+    history_store.record_forecast(SPEC, _arrays_for(monkeypatch, datetime(2024, 6, 1)), issued=100)
+    history_store.record_forecast(SPEC, _arrays_for(monkeypatch, datetime(2024, 6, 20)), issued=200)
+    history_store.flush()
+    monkeypatch.setattr(settings, "history_retention_days", 10)
+    today = pd.Timestamp("2024-06-21", tz=settings.timezone)
+    assert history_store.prune(today=today) == 3
+    assert list(history_store.daily_history(SPEC, "2024-06-01", "2024-06-30")) == ["2024-06-20", "2024-06-21", "2024-06-22"]
+
+
+def test_writes_are_queued_off_the_request_thread(store, monkeypatch):
+    writers = []
+    monkeypatch.setattr(history_store, "_write", lambda path, rows: writers.append(threading.current_thread().name))
+    assert history_store.record_forecast(SPEC, _arrays_for(monkeypatch, datetime(2024, 6, 10))) == 3
+    history_store.flush()
+    assert writers == ["history-writer"]
+
+
+def test_history_endpoint(store, monkeypatch):
+    _issue_at(monkeypatch, datetime(2024, 6, 10))
+    r = client.get("/history/52.52/13.405/30/0/5?start=2024-06-01&end=2024-06-30")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["message"]["code"] == 0
+    assert list(body["result"]["watt_hours_day"]) == ["2024-06-10", "2024-06-11", "2024-06-12"]
+    bad = client.get("/history/52.52/13.405/30/0/5?start=2024-06-30&end=2024-06-01")
+    assert bad.json()["message"]["code"] == 400
+
+
+def test_calibrated_issues_kept_apart(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "calibration_db_path", str(tmp_path / "calibration.sqlite"))
+    site = make_site_id(lat=52.52, lon=13.405, tilt=30, azimuth=0, kwp=5)
+    calibration.ingest([site] * 50, np.full(50, 2500.0), np.full(50, 2000.0), np.full(50, 5000.0))
+    raw = _issue_at(monkeypatch, datetime(2024, 6, 10))
+    estimate = SPEC.model_copy(update={"endpoint": "estimate"})
+    arrays = history_store.issue_forecast(estimate)
+    history_store.flush()
+    cal = dict(zip(arrays.days, arrays.watt_hours_day.tolist()))
+    assert cal["2024-06-11"] < raw["2024-06-11"]
+    # the later calibrated issue does not replace the raw model's day
+    assert history_store.daily_history(SPEC, "2024-06-11", "2024-06-11") == {"2024-06-11": round(raw["2024-06-11"], 3)}
+    r = client.get("/history/52.52/13.405/30/0/5?start=2024-06-11&end=2024-06-11&calibrated=true")
+    assert r.json()["result"]["watt_hours_day"] == {"2024-06-11": round(cal["2024-06-11"], 3)}
+
+
+def test_history_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "history_db_path", "")
+    r = client.get("/history/52.52/13.405/30/0/5")
+    assert r.json()["message"]["code"] == 503
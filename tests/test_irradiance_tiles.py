@@ -0,0 +1,87 @@
+"""Geo-tiled clear-sky cache: sharing between nearby sites and tiling error."""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+import pytz
+
+from app.core.config import settings
+from app.core.metrics import irradiance_tile_error_wm2, irradiance_tile_lookups_total
+from app.services import forecast_engine, irradiance_tiles
+from app.services.geometry import Geometry
+from app.util import timeindex
+
+
+@pytest.fixture
+def tiled(monkeypatch):
+    fixed = pytz.timezone("Europe/Berlin").localize(datetime(2024, 6, 21))
+    monkeypatch.setattr(timeindex, "now_local", lambda tz: fixed)
+    monkeypatch.setattr(settings, "max_horizon_days", 2)
+    monkeypatch.setattr(settings, "irradiance_tile_deg", 0.01)
+    monkeypatch.setattr(settings, "irradiance_tile_audit_rate", 0.0)
+    irradiance_tiles._memo.clear()
+    yield
+    irradiance_tiles._memo.clear()
+
+
+def _arrays(lat, lon):
+    return forecast_engine.forecast_arrays(
+        lat=lat, lon=lon, tilt=30, azimuth_convention=0, kwp=1, resolution="15m"
+    )
+
+
+def _count(result):
+    return irradiance_tile_lookups_total.labels(result=result)._value.get()
+
+
+def test_tile_center():
+    assert irradiance_tiles.tile_center(52.5213, 13.4049, 0.01) == pytest.approx((52.525, 13.405))
+    assert irradiance_tiles.tile_center(-33.9249, 18.4241, 0.1) == pytest.approx((-33.95, 18.45))
+
+
+def test_sites_in_one_tile_share_computation(tiled):
+    misses, hits = _count("miss"), _count("hit")
+    _arrays(52.5213, 13.4049)
+    _arrays(52.5244, 13.4011)  # same 0.01° tile
+    assert _count("miss") - misses == 1
+    assert _count("hit") - hits == 1
+    _arrays(52.5313, 13.4049)  # neighbouring tile
+    assert _count("miss") - misses == 2
+
+
+def test_later_window_on_same_days_is_a_slice(tiled, monkeypatch):
+    index = forecast_engine._build_index("15m")
+    misses = _count("miss")
+    whole = irradiance_tiles.tile_geometry(52.5213, 13.4049, index)
+    # "now" moved on by an hour: same days, same entry
+    later = irradiance_tiles.tile_geometry(52.5244, 13.4011, index[4:])
+    assert _count("miss") - misses == 1
+    np.testing.assert_array_equal(later.ghi, whole.ghi[4:])
+    assert len(later.zenith) == len(index) - 4
+
+
+def test_tiling_error_is_small(tiled, monkeypatch):
+    tiled_arrays = _arrays(52.5213, 13.4049)
+    monkeypatch.setattr(settings, "irradiance_tile_deg", 0.0)
+    exact = _arrays(52.5213, 13.4049)
+    # half a 0.01° tile is ~0.5 km: well under 1 W per kWp
+    assert np.abs(tiled_arrays.watts - exact.watts).max() < 1.0
+
+
+def test_tile_shared_through_redis(tiled, fake_redis):
+    _arrays(52.5213, 13.4049)
+    blobs = [v for k, v in fake_redis.data.items() if k.startswith("tile:")]
+    assert len(blobs) == 1
+    irradiance_tiles._memo.clear()  # another worker: empty memo, warm Redis
+    misses = _count("miss")
+    _arrays(52.5244, 13.4011)
+    assert _count("miss") == misses
+    assert Geometry.from_bytes(blobs[0]).ghi.max() > 0
+
+
+def test_audit_records_error(tiled, monkeypatch):
+    monkeypatch.setattr(settings, "irradiance_tile_audit_rate", 1.0)
+    before = irradiance_tile_error_wm2._sum.get()
+    _arrays(52.5213, 13.4049)
+    assert irradiance_tile_error_wm2._sum.get() > before
@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+
+from app.core.metrics import OVERFLOW_PATH, UNMATCHED_PATH, _PathLabels
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def test_metrics_use_route_template_not_raw_path():
+    client.get("/clearsky/54.32/10.12/30/0/5")
+    client.get("/clearsky/48.1/11.5/30/0/5")
+    text = client.get("/metrics").text
+    assert 'path="/clearsky/{lat}/{lon}/{declination}/{azimuth}/{kwp}"' in text
+    assert 'path="/clearsky/54.32/10.12/30/0/5"' not in text
+
+
+def test_multi_plane_requests_use_route_template():
+    assert client.get("/clearsky/52.0/13.4/30/0/5/30/90/3/30/-90/3").status_code == 200
+    text = client.get("/metrics").text
+    assert 'path="/clearsky/{lat}/{lon}/{declination}/{azimuth}/{kwp}/{planes:path}"' in text
+    assert "52.0" not in text and "13.4/" not in text
+
+
+def test_unknown_paths_share_one_label():
+    client.get("/does-not-exist/1")
+    client.get("/does-not-exist/2")
+    text = client.get("/metrics").text
+    assert f'path="{UNMATCHED_PATH}"' in text
+    assert "/does-not-exist" not in text
+
+
+def test_path_labels_overflow_bucket():
+    labels = _PathLabels(max_paths=2)
+    assert labels.label("/a") == "/a"
+    assert labels.label("/b") == "/b"
+    assert labels.label("/c") == OVERFLOW_PATH
+    # already-seen templates keep their own label
+    assert labels.label("/a") == "/a"
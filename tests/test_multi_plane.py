@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+
+from app.models.site import parse_planes
+from app.main import app
+from app.services.forecast_engine import compute_forecast
+
+
+client = TestClient(app)
+
+
+def test_parse_planes_triples():
+    assert parse_planes("30/90/4/45/-90/2.5") == [(30.0, 90.0, 4.0), (45.0, -90.0, 2.5)]
+    assert parse_planes("") == []
+
+
+def test_multi_plane_is_sum_of_single_planes():
+    east = compute_forecast(lat=48.1, lon=11.5, tilt=30, azimuth_convention=90, kwp=4, resolution="60m")
+    west = compute_forecast(lat=48.1, lon=11.5, tilt=30, azimuth_convention=-90, kwp=4, resolution="60m")
+    both = compute_forecast(
+        lat=48.1, lon=11.5, tilt=30, azimuth_convention=90, kwp=4, resolution="60m",
+        planes=[(30, -90, 4)], per_plane=True,
+    )
+    for ts, w in both["watts"].items():
+        assert abs(w - (east["watts"][ts] + west["watts"][ts])) < 0.01
+    assert [p["watts"] for p in both["planes"]] == [east["watts"], west["watts"]]
+
+
+def test_multi_plane_route():
+    r = client.get("/clearsky/48.1/11.5/30/90/4/30/-90/4?per_plane=true")
+    assert r.status_code == 200
+    data = r.json()
+    assert data["message"]["type"] == "success"
+    assert len(data["result"]["planes"]) == 2
+
+
+def test_multi_plane_route_rejects_incomplete_triple():
+    r = client.get("/estimate/48.1/11.5/30/90/4/30/-90")
+    assert r.json()["message"]["code"] == 400
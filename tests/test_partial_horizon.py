@@ -0,0 +1,116 @@
+"""Partial-horizon requests: `?days=` and `?start=`/`?end=`."""
+
+from datetime import datetime
+
+import pytest
+import pytz
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import forecast_engine as fe
+from app.util import timeindex
+from app.util.timeindex import horizon_dates
+
+
+client = TestClient(app)
+URL = "/clearsky/54.32/10.12/30/0/5"
+TZ = "Europe/Berlin"
+
+
+@pytest.fixture
+def fixed_now(monkeypatch):
+    now = pytz.timezone(TZ).localize(datetime(2024, 6, 21, 7, 0, 0))
+    monkeypatch.setattr(timeindex, "now_local", lambda tz: now)
+    return now
+
+
+def test_horizon_dates(fixed_now):
+    assert horizon_dates(TZ, 6) is None
+    assert horizon_dates(TZ, 6, days=2) == ("2024-06-21", "2024-06-22")
+    assert horizon_dates(TZ, 6, days=7) is None
+    assert horizon_dates(TZ, 6, days=30) is None
+    assert horizon_dates(TZ, 6, start="2024-06-23", end="2024-06-24") == ("2024-06-23", "2024-06-24")
+    # clamped to the horizon
+    assert horizon_dates(TZ, 6, start="2024-06-01", end="2024-06-21") == ("2024-06-21", "2024-06-21")
+    assert horizon_dates(TZ, 6, start="2024-06-26") == ("2024-06-26", "2024-06-27")
+    for kwargs in (
+        {"days": 2, "start": "2024-06-21"},
+        {"days": 0},
+        {"start": "2024-06-24", "end": "2024-06-23"},
+        {"start": "2024-07-01"},
+        {"end": "2024-06-31"},
+    ):
+        with pytest.raises(ValueError):
+            horizon_dates(TZ, 6, **kwargs)
+
+
+@pytest.mark.parametrize("dates", [("2024-06-21", "2024-06-22"), ("2024-06-23", "2024-06-24")])
+def test_slice_of_full_forecast_equals_partial_computation(fixed_now, dates):
+    kwargs = dict(
+        lat=48.1, lon=11.5, tilt=45, azimuth_convention=-90, kwp=7.5, resolution="15m",
+        planes=[(20, 90, 2.0)], per_plane=True,
+    )
+    full = fe.to_payload(fe.forecast_arrays(**kwargs))
+    partial_arrays = fe.forecast_arrays(**kwargs, dates=dates)
+    partial = fe.to_payload(partial_arrays)
+
+    assert len(partial_arrays.index) < len(fe._build_index("15m")) / 2
+    sliced = fe.slice_payload(full, dates)
+    assert sliced["watts"] == partial["watts"]
+    assert sliced["watt_hours_day"] == partial["watt_hours_day"] == {
+        d: full["watt_hours_day"][d] for d in partial["watt_hours_day"]
+    }
+    assert sliced["planes"] == partial["planes"]
+    assert sliced["watt_hours"].keys() == partial["watt_hours"].keys()
+    assert max(abs(sliced["watt_hours"][k] - v) for k, v in partial["watt_hours"].items()) < 0.01
+
+
+@pytest.mark.parametrize("resolution", ["60m", "15m"])
+def test_slice_recomputes_first_day_under_midnight_sun(fixed_now, resolution):
+    kwargs = dict(
+        lat=78.22, lon=15.65, tilt=60, azimuth_convention=0, kwp=3, resolution=resolution,
+        planes=[(30, 90, 1.0)], per_plane=True,
+    )
+    dates = ("2024-06-22", "2024-06-23")
+    full = fe.to_payload(fe.forecast_arrays(**kwargs))
+    partial = fe.to_payload(fe.forecast_arrays(**kwargs, dates=dates))
+    assert full["watts"]["2024-06-22 00:00:00"] > 0
+    sliced = fe.slice_payload(full, dates)
+    assert sliced["watt_hours_day"] == partial["watt_hours_day"]
+    assert sliced["watt_hours_day"]["2024-06-22"] < full["watt_hours_day"]["2024-06-22"]
+    assert sliced["watt_hours_day"]["2024-06-23"] == full["watt_hours_day"]["2024-06-23"]
+    assert [p["watt_hours_day"] for p in sliced["planes"]] == [p["watt_hours_day"] for p in partial["planes"]]
+
+
+def test_out_of_horizon_start_names_the_horizon(fixed_now):
+    with pytest.raises(ValueError, match="outside the forecast horizon"):
+        horizon_dates(TZ, 6, start="2024-07-01")
+    with pytest.raises(ValueError, match="start must not be after end"):
+        horizon_dates(TZ, 6, start="2024-06-24", end="2024-06-23")
+
+
+def test_partial_request_served_from_cached_full_forecast(fake_redis):
+    full = client.get(URL).json()["result"]
+    r = client.get(URL, params={"days": 2})
+    assert r.status_code == 200 and r.headers["X-Cache"] == "HIT"
+    days = list(r.json()["result"]["watt_hours_day"])
+    assert days == list(full["watt_hours_day"])[:2]
+    assert r.json()["result"]["watts"] == {k: v for k, v in full["watts"].items() if k[:10] in days}
+
+    r2 = client.get(URL, params={"days": 2}, headers={"If-None-Match": r.headers["ETag"]})
+    assert r2.status_code == 304
+
+
+def test_partial_request_computed_without_full_forecast(fake_redis):
+    r = client.get(URL, params={"days": 1})
+    assert r.headers["X-Cache"] == "MISS"
+    assert len(r.json()["result"]["watt_hours_day"]) == 1
+    # a range covering the whole horizon is the full forecast
+    assert client.get(URL, params={"days": 30}).headers["ETag"] == client.get(URL).headers["ETag"]
+
+
+def test_invalid_range_rejected():
+    r = client.get(URL, params={"days": 2, "start": "2020-01-01"})
+    assert r.status_code == 200
+    assert r.json()["message"]["code"] == 400
+    assert client.get(URL, params={"start": "tomorrow"}).status_code == 422
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pvlib
+
+from app.services.power_kernel import ac_power
+
+
+def _reference(poa_global: pd.Series, kwp: float, system_loss: float) -> pd.Series:
+    # The pandas chain the kernel replaces
+    index = poa_global.index
+    temp_cell = pvlib.temperature.sapm_cell(
+        poa_global=poa_global,
+        temp_air=pd.Series(20.0, index=index),
+        wind_speed=pd.Series(1.0, index=index),
+        a=-3.56,
+        b=-0.075,
+        deltaT=3,
+    )
+    pdc0 = kwp * 1000.0
+    poa_kw = poa_global.clip(lower=0) / 1000.0
+    pdc = (pdc0 * poa_kw * (1 + -0.004 * (temp_cell - 25.0))).clip(lower=0)
+    return (pdc * (1.0 - system_loss)).clip(lower=0, upper=pdc0)
+
+
+def test_kernel_is_bit_identical_to_pandas_chain():
+    rng = np.random.default_rng(0)
+    poa = rng.uniform(-50, 1400, size=2000)
+    poa[::97] = 0.0
+    poa[5] = np.nan
+    index = pd.date_range("2024-06-21", periods=len(poa), freq="5min", tz="Europe/Berlin")
+    for kwp in (0.3, 5.0, 999.0):
+        expected = _reference(pd.Series(poa, index=index), kwp, 0.14).to_numpy()
+        got = ac_power(poa[None, :], np.array([[kwp * 1000.0]]), 0.14)[0]
+        np.testing.assert_array_equal(got, expected)
+
+
+def test_kernel_planes_and_out_buffer():
+    poa = np.vstack([np.linspace(0, 1200, 50), np.linspace(1200, 0, 50)])
+    pdc0 = np.array([[4000.0], [2500.0]])
+    out = np.empty_like(poa)
+    res = ac_power(poa, pdc0, 0.14, out=out)
+    assert res is out
+    assert (res[0] <= 4000.0).all() and (res[1] <= 2500.0).all()
+    np.testing.assert_array_equal(res[1], ac_power(poa[1], 2500.0, 0.14))
@@ -0,0 +1,131 @@
+"""Redis outage handling: fail fast, back off, recover."""
+
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import cache, redis_conn
+
+from tests.conftest import FakeRedis
+
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    # Nothing listens on port 1: connects are refused immediately
+    monkeypatch.setattr(settings, "redis_url", "redis://127.0.0.1:1/0")
+    redis_conn.reset()
+    yield
+    redis_conn.reset()
+
+
+def test_outage_fails_open_without_retrying_every_call(unreachable):
+    assert redis_conn.client() is None
+    health = redis_conn.health()
+    assert health["state"] == "down" and health["failures"] == 1
+    assert health["retry_in_seconds"] > 0 and "ConnectionError" in health["last_error"]
+
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        assert cache.get_cached("resp:x") is None
+        cache.set_cached("resp:x", {"a": 1})
+    assert time.perf_counter() - t0 < 0.5
+    assert redis_conn.health()["failures"] == 1
+
+
+def test_backoff_grows_and_is_capped(unreachable, monkeypatch):
+    monkeypatch.setattr(settings, "redis_backoff_min_seconds", 1.0)
+    monkeypatch.setattr(settings, "redis_backoff_max_seconds", 8.0)
+    delays = []
+    for _ in range(6):
+        monkeypatch.setattr(redis_conn.primary(), "retry_at", 0.0)
+        assert redis_conn.client() is None
+        delays.append(redis_conn.primary().retry_at - time.monotonic())
+    assert redis_conn.health()["failures"] == 6
+    assert 0.4 < delays[0] <= 1.0
+    assert 1.9 < delays[2] <= 4.0
+    assert all(3.9 < d <= 8.0 for d in delays[4:])
+
+
+def test_error_on_live_client_marks_down_then_recovers(unreachable, monkeypatch):
+    # Pretend Redis was up when the connection breaks
+    monkeypatch.setattr(redis_conn.primary(), "state", "up")
+    assert cache.get_cached("resp:x") is None
+    assert redis_conn.health()["state"] == "down"
+    assert redis_conn.client() is None
+
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_conn.primary(), "_client", lambda decode: fake)
+    monkeypatch.setattr(redis_conn.primary(), "retry_at", 0.0)
+    assert redis_conn.client() is fake
+    assert redis_conn.health() == {"state": "up", "failures": 0}
+
+
+def test_health_reports_redis_state(fake_redis):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    body = TestClient(app).get("/health").json()
+    assert body == {"status": "ok", "redis": {"state": "up", "failures": 0}}
+
+
+@pytest.fixture
+def shards(fake_redis, monkeypatch):
+    """Three cache nodes backed by separate fakes; the primary is ``fake_redis``."""
+    urls = [f"redis://cache-{i}:6379/0" for i in range(3)]
+    monkeypatch.setattr(settings, "redis_cache_urls", ",".join(urls))
+    monkeypatch.setattr(redis_conn, "_ring", None)
+    fakes = {}
+    for node in redis_conn.ring().nodes:
+        fakes[node.name] = fake = FakeRedis()
+        node.clients = {True: fake, False: fake}
+        node.state = "up"
+    return fakes
+
+
+def test_ring_remaps_only_the_failed_nodes_keys(shards):
+    ring = redis_conn.ring()
+    keys = [f"resp:{i}" for i in range(3000)]
+    owners = {k: ring.owner(k).name for k in keys}
+    counts = {name: list(owners.values()).count(name) for name in shards}
+    assert all(600 < n < 1400 for n in counts.values())
+
+    down = ring.nodes[1]
+    down.state, down.retry_at = "down", time.monotonic() + 60
+    for k in keys:
+        moved = redis_conn.shard_client(k)
+        if owners[k] == down.name:
+            assert moved is not shards[down.name]
+        else:
+            assert moved is shards[owners[k]]
+
+
+def test_sharded_cache_reads_and_writes(shards, fake_redis):
+    ring = redis_conn.ring()
+    keys = [f"resp:{i}" for i in range(30)]
+    for k in keys:
+        cache.set_cached(k, {"k": k}, topic="t", fingerprint=f"fp-{k}", stale_key=f"stale:{k}")
+    for k in keys:
+        owner = shards[ring.owner(k).name]
+        assert k in owner.data and f"{k}:etag" in owner.data and f"{k}:fp" in owner.data
+        assert f"stale:{k}" in shards[ring.owner(f"stale:{k}").name].data
+        assert cache.get_cached(k) == {"k": k}
+        # derived values follow their base key's node
+        cache.set_cached(f"{k}:bw:x", {"d": k}, base_key=k)
+        assert f"{k}:bw:x" in owner.data and cache.get_cached(f"{k}:bw:x", base_key=k) == {"d": k}
+    # Stream notifications always go through the primary
+    assert len(fake_redis.published) == len(keys) and not any(f.published for f in shards.values())
+
+    calls = []
+    for fake in shards.values():
+        mget = fake.mget
+        fake.mget = lambda names, mget=mget: calls.append(len(names)) or mget(names)
+    assert cache.get_fingerprints(keys + ["resp:missing"]) == [f"fp-{k}" for k in keys] + [None]
+    assert len(calls) == len(shards) and sum(calls) == len(keys) + 1
+
+
+def test_health_lists_shards(shards):
+    health = redis_conn.health()
+    assert set(health["shards"]) == set(shards)
+    assert all(s["state"] == "up" for s in health["shards"].values())
@@ -0,0 +1,109 @@
+"""Refresher change detection: unchanged inputs only extend the cache TTL."""
+
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import refresh
+from app.core.metrics import registry
+from app.main import app
+from app.models.spec import ForecastSpec
+from app.services import cache, forecast_engine as fe, warmup
+from app.services import weather_open_meteo as wom
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _count(result):
+    return registry.get_sample_value("forecast_refresh_total", {"result": result}) or 0.0
+
+
+@pytest.fixture
+def tracked(monkeypatch):
+    monkeypatch.setattr(warmup, "_specs", {})
+    monkeypatch.setattr(warmup, "_timestamps", {})
+
+    def track(**fields):
+        spec = ForecastSpec(
+            endpoint="estimate", lat=54.32, lon=10.12, tilt=30, azimuth=0, kwp=5, resolution="60m", **fields
+        )
+        key = cache.make_key(**spec.model_dump())
+        warmup.track_spec(key, spec)
+        return key
+
+    return track
+
+
+@pytest.fixture
+def weather(monkeypatch):
+    level = {"value": 0.5}
+
+    def fake_cmf(lat, lon, tz, start_date, end_date, alpha, weather=None):
+        return {
+            freq: np.full(len(wom._canonical_index(tz, start_date, end_date, freq)), level["value"])
+            for freq in wom.CADENCES
+        }
+
+    monkeypatch.setattr(fe, "weather_cmf", fake_cmf)
+    return level
+
+
+def test_unchanged_inputs_extend_ttl(fake_redis, tracked):
+    key = tracked(source="clearsky")
+    before = _count("recomputed"), _count("skipped")
+
+    assert _run(refresh.refresh_once()) == 1
+    body = fake_redis.data[key]
+    assert fake_redis.get(f"{key}:fp") == fe.spec_fingerprint(warmup.list_specs()[0])
+
+    fake_redis.expiry[key] -= 1000
+    fake_redis.expiry[f"{key}:etag"] -= 1000
+    assert _run(refresh.refresh_once()) == 1
+    assert fake_redis.data[key] is body  # not rewritten
+    assert fake_redis.ttl(key) > 1000 - 5 and fake_redis.ttl(f"{key}:etag") > 1000 - 5
+    assert not fake_redis.published[1:]  # nothing pushed to streams for an unchanged forecast
+    assert (_count("recomputed"), _count("skipped")) == (before[0] + 1, before[1] + 1)
+
+
+def test_first_refresh_after_a_miss_skips(fake_redis, tracked):
+    r = TestClient(app).get("/estimate/54.32/10.12/30/0/5", params={"time": "30m"})
+    assert r.headers["X-Cache"] == "MISS"
+    (spec,) = warmup.list_specs()
+    key = cache.make_key(**spec.model_dump())
+    assert fake_redis.get(f"{key}:fp") == fe.spec_fingerprint(spec)
+    skipped = _count("skipped")
+    _run(refresh.refresh_once())
+    assert _count("skipped") == skipped + 1
+
+
+def test_changed_weather_recomputes(fake_redis, tracked, weather):
+    key = tracked(source="open-meteo")
+    _run(refresh.refresh_once())
+    first = fake_redis.data[key]
+
+    _run(refresh.refresh_once())
+    assert fake_redis.data[key] is first
+
+    weather["value"] = 0.9
+    recomputed = _count("recomputed")
+    _run(refresh.refresh_once())
+    assert fake_redis.data[key] != first
+    assert _count("recomputed") == recomputed + 1
+
+
+def test_evicted_value_recomputed(fake_redis, tracked):
+    key = tracked(source="clearsky", fmt="csv")
+    _run(refresh.refresh_once())
+    del fake_redis.data[key]
+    recomputed = _count("recomputed")
+    _run(refresh.refresh_once())
+    assert key in fake_redis.data
+    assert _count("recomputed") == recomputed + 1
@@ -0,0 +1,63 @@
+"""Error bounds of the fast solar-position backends against NREL SPA, in watts."""
+
+from datetime import datetime
+
+import numpy as np
+import pvlib
+import pytest
+import pytz
+
+from app.core.config import settings
+from app.services import forecast_engine
+from app.services.geometry import site_geometry
+from app.services.solar_position import solar_position
+from app.util import timeindex
+
+
+SITES = [(-45.0, 170.0), (-33.9, 18.4), (0.5, 32.0), (35.0, 139.0), (52.5, 13.4), (69.6, 18.9)]
+DATES = [
+    datetime(2024, 3, 20),  # equinox
+    datetime(2024, 3, 31),  # EU DST start
+    datetime(2024, 6, 21),  # solstice
+    datetime(2024, 10, 27),  # EU DST end
+    datetime(2024, 12, 21),  # solstice
+]
+# max |error| per kWp: (instantaneous W, daily Wh); the backend also drives the clear-sky model
+BOUNDS = {"ephemeris": (0.5, 1.0), "analytical": (8.0, 40.0)}
+
+
+def _arrays(monkeypatch, method, lat, lon, start):
+    fixed = pytz.timezone("Europe/Berlin").localize(start)
+    monkeypatch.setattr(timeindex, "now_local", lambda tz: fixed)
+    monkeypatch.setattr(settings, "max_horizon_days", 2)
+    monkeypatch.setattr(settings, "solar_position_method", method)
+    return forecast_engine.forecast_arrays(
+        lat=lat, lon=lon, tilt=30, azimuth_convention=0 if lat > 0 else 180, kwp=1, resolution="15m"
+    )
+
+
+@pytest.mark.parametrize("method", sorted(BOUNDS))
+@pytest.mark.parametrize("lat,lon", SITES)
+def test_watts_error_bounded_against_spa(monkeypatch, method, lat, lon):
+    max_w, max_wh = BOUNDS[method]
+    for start in DATES:
+        ref = _arrays(monkeypatch, "spa", lat, lon, start)
+        fast = _arrays(monkeypatch, method, lat, lon, start)
+        assert np.abs(fast.watts - ref.watts).max() <= max_w, start
+        assert np.abs(fast.watt_hours_day - ref.watt_hours_day).max() <= max_wh, start
+
+
+def test_unknown_method_rejected():
+    with pytest.raises(ValueError):
+        solar_position(forecast_engine._build_index("60m"), 50.0, 10.0, method="sundial")
+
+
+@pytest.mark.parametrize("method,spa_runs", [("spa", 1), ("ephemeris", 0), ("analytical", 0)])
+def test_clearsky_reuses_selected_solar_position(monkeypatch, method, spa_runs):
+    calls = []
+    spa = pvlib.solarposition.spa_python
+    monkeypatch.setattr(pvlib.solarposition, "spa_python", lambda *a, **kw: calls.append(1) or spa(*a, **kw))
+    monkeypatch.setattr(settings, "solar_position_method", method)
+    geom = site_geometry(52.5, 13.4, forecast_engine._build_index("60m"))
+    assert len(calls) == spa_runs
+    assert np.nanmax(geom.ghi) > 0
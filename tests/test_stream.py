@@ -0,0 +1,127 @@
+"""SSE push of rewritten forecasts, driven over raw ASGI (the stream never ends by itself)."""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.main import app
+from app.models.spec import ForecastSpec
+from app.services import pubsub
+from app.services.cache import set_cached
+
+
+PATH = "/stream/clearsky/52.52/13.405/30/0/5"
+SPEC = ForecastSpec(
+    endpoint="clearsky", lat=52.52, lon=13.405, tilt=30, azimuth=0, kwp=5, resolution="60m", source="clearsky"
+)
+
+
+def _run(coro):
+    # private loop, so the app's default event loop is left alone
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asyncio.wait_for(coro, timeout=30))
+    finally:
+        loop.close()
+
+
+class _Stream:
+    """Minimal ASGI client: feeds one GET, collects body chunks, disconnects on close()."""
+
+    def __init__(self, path, headers=()):
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.start: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._disconnect = asyncio.Event()
+        self._sent_request = False
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"testserver"), *headers], "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+        }
+        self.task = asyncio.ensure_future(app(scope, self._receive, self._send))
+
+    async def _receive(self):
+        if not self._sent_request:
+            self._sent_request = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.start.set_result(message)
+        elif message.get("body"):
+            await self.chunks.put(message["body"].decode())
+
+    async def event(self):
+        text = ""
+        while not text.endswith("\n\n"):
+            text += await self.chunks.get()
+        return text
+
+    async def close(self):
+        self._disconnect.set()
+        await asyncio.wait_for(self.task, timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def quick_keepalive(monkeypatch):
+    monkeypatch.setattr(settings, "stream_keepalive_seconds", 0.1)
+
+
+def test_initial_event_then_pushed_update():
+    async def scenario():
+        stream = _Stream(PATH)
+        start = await stream.start
+        assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+        first = await stream.event()
+        assert first.startswith("event: forecast\nid: ")
+        assert '"watts"' in first
+        assert pubsub.subscriber_count() == 1
+
+        # a refresh writing the same spec reaches the subscriber (no Redis: local dispatch)
+        await asyncio.to_thread(set_cached, "resp:test", {"watts": {"t": 1.0}}, None, pubsub.stream_topic(SPEC))
+        event = await stream.event()
+        while event.startswith(": keepalive"):
+            event = await stream.event()
+        assert 'data: {"watts": {"t": 1.0}}' in event
+        await stream.close()
+        assert pubsub.subscriber_count() == 0
+
+    _run(scenario())
+
+
+def test_last_event_id_skips_unchanged_initial():
+    async def scenario():
+        stream = _Stream(PATH)
+        first = await stream.event()
+        await stream.close()
+        etag = first.split("\n")[1][len("id: "):]
+
+        again = _Stream(PATH, headers=[(b"last-event-id", etag.encode())])
+        assert (await again.event()) == ": keepalive\n\n"
+        await again.close()
+
+    _run(scenario())
+
+
+def test_redis_write_publishes_notice_and_listener_fetches_body(fake_redis, monkeypatch):
+    etag = set_cached("resp:x", {"watts": {}}, topic="t1")
+    channel, message = fake_redis.published[-1]
+    assert channel == pubsub.CHANNEL
+    # only topic, ETag and key travel over pub/sub, never the body
+    assert message == pubsub.encode("t1", etag, "resp:x")
+
+    delivered = []
+    monkeypatch.setattr(pubsub, "dispatch", lambda *update: delivered.append(update))
+    pubsub._handle(message)
+    assert delivered == []  # no local subscriber of t1: the body is not even read
+    monkeypatch.setitem(pubsub._subscribers, "t1", {object()})
+    pubsub._handle(message.encode())
+    assert delivered == [("t1", etag, '{"watts": {}}')]
+
+
+def test_topic_ignores_format_and_horizon():
+    assert pubsub.stream_topic(SPEC) == pubsub.stream_topic(SPEC.model_copy(update={"fmt": "csv"}))
+    assert pubsub.stream_topic(SPEC) != pubsub.stream_topic(SPEC.model_copy(update={"kwp": 6}))
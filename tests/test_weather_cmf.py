@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pvlib
+
+from app.services import weather_open_meteo as wom
+
+
+TZ = "Europe/Berlin"
+
+
+def _weather(start="2024-06-21", days=2):
+    idx = pd.date_range(start, periods=24 * days, freq="60min", tz=TZ)
+    sw = np.clip(np.sin((idx.hour - 5) / 16 * np.pi), 0, None) * 500
+    return pd.DataFrame({"shortwave_radiation": sw, "cloudcover": np.linspace(0, 100, len(idx))}, index=idx)
+
+
+def test_sliced_factor_matches_per_request_alignment():
+    weather = _weather()
+    arrays = wom.cmf_arrays_from_weather(54.32, 10.12, TZ, "2024-06-21", "2024-06-22", weather, 0.75)
+    assert len(arrays["60min"]) == 48
+    assert len(arrays["15min"]) == 48 * 4
+
+    idx = pd.date_range(pd.Timestamp("2024-06-21 00:00").tz_localize(TZ), periods=96, freq="15min")
+    cs_ghi = pvlib.location.Location(54.32, 10.12, tz=TZ).get_clearsky(idx, model="ineichen")["ghi"]
+    expected = wom.cmf_factor_from_weather(idx, TZ, cs_ghi, weather, 0.75)
+    sliced = wom.cmf_factor_for_index(arrays, TZ, "2024-06-21", idx, "15min")
+    np.testing.assert_allclose(sliced, expected.to_numpy())
+
+
+def test_first_partial_hour_uses_clearsky_at_the_weather_timestamp():
+    weather = _weather()
+    arrays = wom.cmf_arrays_from_weather(40.0, 10.12, TZ, "2024-06-21", "2024-06-22", weather, 0.75)
+    idx = pd.date_range(pd.Timestamp("2024-06-21 13:15").tz_localize(TZ), periods=8, freq="15min")
+    sliced = wom.cmf_factor_for_index(arrays, TZ, "2024-06-21", idx, "15min")
+
+    hour = pd.DatetimeIndex([pd.Timestamp("2024-06-21 13:00").tz_localize(TZ)])
+    cs_hour = pvlib.location.Location(40.0, 10.12, tz=TZ).get_clearsky(hour, model="ineichen")["ghi"].iloc[0]
+    sw = weather.loc[hour[0], "shortwave_radiation"]
+    assert sliced[0] == min(1.0, sw / cs_hour)
+    # per-request alignment divides by clear sky at 13:15 instead: a deliberate change
+    cs_req = pvlib.location.Location(40.0, 10.12, tz=TZ).get_clearsky(idx, model="ineichen")["ghi"]
+    per_request = wom.cmf_factor_from_weather(idx, TZ, cs_req, weather, 0.75)
+    assert per_request.iloc[0] != sliced[0]
+
+
+def test_shortwave_factor_without_deprecated_pandas_options():
+    weather = _weather()
+    weather.iloc[3, 0] = np.inf
+    weather.iloc[4, 0] = np.nan
+    idx = pd.date_range(pd.Timestamp("2024-06-21 00:00").tz_localize(TZ), periods=48, freq="60min")
+    cs_ghi = pvlib.location.Location(54.32, 10.12, tz=TZ).get_clearsky(idx, model="ineichen")["ghi"]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        factor = wom.cmf_factor_from_weather(idx, TZ, cs_ghi, weather, 0.75)
+    # non-finite irradiance counts as no sun, like before
+    assert factor.iloc[3] == 0.0 and factor.iloc[4] == 0.0
+    assert factor.between(0.0, 1.0).all() and factor.max() > 0.5
+
+
+def test_slice_offsets_into_canonical_index():
+    arrays = wom.cmf_arrays_from_weather(54.32, 10.12, TZ, "2024-06-21", "2024-06-22", _weather(), 0.75)
+    idx = pd.date_range(pd.Timestamp("2024-06-21 10:30").tz_localize(TZ), periods=8, freq="30min")
+    sliced = wom.cmf_factor_for_index(arrays, TZ, "2024-06-21", idx, "30min")
+    np.testing.assert_array_equal(sliced, arrays["30min"][21:29])
+    # off-grid start cannot be sliced
+    assert wom.cmf_factor_for_index(arrays, TZ, "2024-06-21", idx + pd.Timedelta(minutes=7), "30min") is None
+
+
+def test_weather_payload_is_ingested_once(monkeypatch):
+    calls = []
+
+    def fake_fetch(lat, lon, tz, start_date, end_date):
+        calls.append(1)
+        return _weather()
+
+    monkeypatch.setattr(wom, "fetch_open_meteo", fake_fetch)
+    monkeypatch.setattr(wom, "_cmf_memo", type(wom._cmf_memo)())
+    first = wom.weather_cmf(1.0, 2.0, TZ, "2024-06-21", "2024-06-22", 0.75)
+    second = wom.weather_cmf(1.0, 2.0, TZ, "2024-06-21", "2024-06-22", 0.75)
+    assert first is second
+    assert len(calls) == 1
@@ -0,0 +1,163 @@
+"""Background weather prefetch: due times, jitter, window rollover and bounded concurrency."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+import redis
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services import weather_open_meteo as wom
+from app.services import weather_prefetch as wp
+
+from tests.test_weather_cmf import _weather
+
+
+TZ = "Europe/Berlin"
+
+
+def _run(coro):
+    # private loop, so the app's default event loop is left alone
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def prefetch(monkeypatch):
+    monkeypatch.setattr(wp, "_locations", {})
+    monkeypatch.setattr(wom, "_cmf_memo", type(wom._cmf_memo)())
+    monkeypatch.setattr(settings, "weather_prefetch_enabled", True)
+    calls = []
+    active = [0]
+    peak = [0]
+    lock = threading.Lock()
+
+    def fake_fetch(lat, lon, tz, start_date, end_date, refresh=False):
+        with lock:
+            calls.append((lat, lon, start_date, refresh))
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return _weather(start_date, days=7)
+
+    monkeypatch.setattr(wom, "fetch_open_meteo", fake_fetch)
+    return calls, peak
+
+
+def test_next_due_before_expiry_with_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "weather_model_cadence_minutes", 0)
+    dues = [wp.next_due(1000.0, 2800.0) for _ in range(200)]
+    lead, jitter = settings.weather_prefetch_lead_seconds, settings.weather_prefetch_jitter_seconds
+    assert all(2800 - lead - jitter <= d <= 2800 - lead for d in dues)
+    assert len(set(dues)) > 1
+
+
+def test_next_due_aligned_to_model_cadence(monkeypatch):
+    monkeypatch.setattr(settings, "weather_model_cadence_minutes", 60)
+    monkeypatch.setattr(settings, "weather_prefetch_jitter_seconds", 0)
+    # a long TTL would wait past the next hourly model run: refresh after it settles
+    assert wp.next_due(7200.0 + 100, 7200.0 + 100 + 4 * 3600) == 10800 + wp.MODEL_SETTLE_SECONDS
+
+
+def test_tracked_locations_refreshed_when_due(prefetch):
+    calls, peak = prefetch
+    start, end = wp.current_window(TZ)
+    for i in range(10):
+        wp.track(50.0 + i, 10.0, TZ, start, end, 0.75)
+    wp.track(50.0, 10.0, TZ, start, end, 0.75)  # touch only
+    assert len(wp._locations) == 10
+
+    # nothing due right after the (assumed) fetch
+    assert _run(wp.prefetch_due()) == 0
+    # all due at their expiry: refreshed with at most `concurrency` upstream calls in flight
+    later = time.time() + settings.weather_ttl_seconds
+    assert _run(wp.prefetch_due(now=later)) == 10
+    assert peak[0] <= settings.weather_prefetch_concurrency
+    assert all(refresh for *_, refresh in calls)
+    # the fresh CMF arrays are what requests will find
+    key = wom._cmf_key(50.0, 10.0, TZ, start, end, 0.75)
+    assert wom._memo_get(key) is not None
+    assert all(loc.due > time.time() for loc in wp._locations.values())
+
+
+def test_window_rollover_is_due_immediately(prefetch):
+    calls, _ = prefetch
+    wp.track(52.5, 13.4, TZ, "2000-01-01", "2000-01-07", 0.75)
+    assert _run(wp.prefetch_due()) == 1
+    assert calls[0][2] == wp.current_window(TZ)[0]
+
+
+def test_idle_locations_dropped(prefetch):
+    start, end = wp.current_window(TZ)
+    wp.track(52.5, 13.4, TZ, start, end, 0.75)
+    _run(wp.prefetch_due(now=time.time() + wp.IDLE_SECONDS + 1))
+    assert wp._locations == {}
+
+
+def test_cmf_expiry_from_shared_ttl_then_memo(prefetch, fake_redis):
+    start, end = wp.current_window(TZ)
+    assert wom.cmf_expires_at(52.5, 13.4, TZ, start, end, 0.75) is None
+    key = wom._cmf_key(52.5, 13.4, TZ, start, end, 0.75)
+    wom._memo_put(key, {})
+    memo = wom.cmf_expires_at(52.5, 13.4, TZ, start, end, 0.75)
+    assert abs(memo - (time.time() + settings.weather_ttl_seconds)) < 5
+    fake_redis.setex(f"{key}:{wom.CADENCES[-1]}", 600, b"")
+    assert abs(wom.cmf_expires_at(52.5, 13.4, TZ, start, end, 0.75) - (time.time() + 600)) < 5
+
+
+def test_one_worker_leads_until_its_key_expires(prefetch, fake_redis, monkeypatch):
+    monkeypatch.setattr(wp, "_worker_id", lambda: "a")
+    assert wp._lead(time.time())
+    assert wp._lead(time.time())  # renewed
+    monkeypatch.setattr(wp, "_worker_id", lambda: "b")
+    assert not wp._lead(time.time())
+    del fake_redis.data[wp.LEADER_KEY]
+    assert wp._lead(time.time())
+    # the old leader's renewal must not extend the new owner's key
+    monkeypatch.setattr(wp, "_worker_id", lambda: "a")
+    fake_redis.expire(wp.LEADER_KEY, 5)
+    assert not wp._lead(time.time())
+    assert fake_redis.ttl(wp.LEADER_KEY) <= 5
+
+
+def test_redis_error_stands_down(prefetch, fake_redis, monkeypatch):
+    def fail(*args, **kwargs):
+        raise redis.ConnectionError("blip")
+
+    monkeypatch.setattr(fake_redis, "set", fail)
+    assert not wp._lead(time.time())
+
+
+def test_leader_prefetches_locations_tracked_by_other_workers(prefetch, fake_redis, monkeypatch):
+    calls, _ = prefetch
+    start, end = wp.current_window(TZ)
+    # another worker serves the location; the leader has never seen it
+    wp.track(52.5, 13.4, TZ, start, end, 0.75)
+    monkeypatch.setattr(wp, "_locations", {})
+    monkeypatch.setattr(wp, "_worker_id", lambda: "leader")
+    assert wp._lead(time.time())
+    assert list(wp._locations) == [(52.5, 13.4, TZ, 0.75)]
+    assert _run(wp.prefetch_due(now=time.time() + settings.weather_ttl_seconds)) == 1
+    assert calls[0][:2] == (52.5, 13.4)
+
+
+def test_lifespan_starts_and_stops_background_loops(monkeypatch):
+    started = []
+
+    async def fake_loop():
+        started.append(1)
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr("app.main.refresher_loop", fake_loop)
+    monkeypatch.setattr("app.main.weather_prefetch_loop", fake_loop)
+    with TestClient(app) as client:
+        assert client.get("/health").json()["status"] == "ok"
+    assert len(started) == 2